@@ -0,0 +1,164 @@
+"""One shared, lazily computed analysis of a player message.
+
+The tone tracker, intent detector, action validator, roll heuristics, roll
+classifier and party director all read the same message. analyze(text) returns
+one ActionAnalysis per distinct input (LRU-cached, so "roll" and stock phrases
+are analysed once per process); each field is computed on first access and
+memoized, so a consumer only pays for what it reads.
+
+Usage:
+    analysis = analyze("If the goblin moves, I attack it")
+    analysis.tone, analysis.detection['status'], analysis.dc, analysis.ability
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
+
+from DcAnalyzer import DCAnalyzer
+from IntentAnalyzer import detect_intent, detect_phrase_context, find_matching_intents, parse_clauses
+from PlayerActionAnalyzer import PlayerActionAnalyzer
+from RuleTables import current as rule_tables
+from ToneAnalyzer import ToneAnalyzer, ToneType
+
+_WORD = re.compile(r"[a-z']+")
+
+
+class _lazy:
+    """functools.cached_property without the lock it takes on every first access before Python 3.12"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.name = fn.__name__
+        self.__doc__ = fn.__doc__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.fn(obj)
+        return value
+
+
+class ActionAnalysis:
+    """Local analyzer results for one player message; every field is lazy and memoized"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    @_lazy
+    def lower(self) -> str:
+        return self.text.lower()
+
+    @_lazy
+    def words(self) -> List[str]:
+        return _WORD.findall(self.lower)
+
+    @_lazy
+    def word_set(self) -> FrozenSet[str]:
+        return frozenset(self.words)
+
+    @_lazy
+    def tone_scores(self) -> Dict[ToneType, int]:
+        return ToneAnalyzer.score(self.text)
+
+    @_lazy
+    def tone(self) -> ToneType:
+        """Tone of this message alone (ToneTracker smooths across messages)"""
+        best = max(self.tone_scores, key=self.tone_scores.get)
+        return best if self.tone_scores[best] > 0 else ToneType.NEUTRAL
+
+    @_lazy
+    def clauses(self) -> Dict:
+        return parse_clauses(self.text)
+
+    @_lazy
+    def intents(self) -> List[Tuple[str, int]]:
+        return find_matching_intents(self.lower)
+
+    @_lazy
+    def detection(self) -> Dict:
+        """detect_intent() result; shared, so treat as read-only"""
+        return detect_intent(self.text, clauses=self.clauses, matches=self.intents, phrase_context=self.context)
+
+    @property
+    def intent(self) -> str:
+        """Primary intent: the detected one, or the first of several chained intents"""
+        detection = self.detection
+        return detection.get('intent') or detection['intents'][0]['intent']
+
+    @_lazy
+    def context(self) -> str:
+        return detect_phrase_context(self.text)
+
+    @_lazy
+    def suggested_dc(self) -> Tuple[int, str]:
+        return DCAnalyzer.suggest_dc(self.text)
+
+    @property
+    def dc(self) -> int:
+        return int(self.suggested_dc[0])
+
+    @_lazy
+    def action(self) -> Dict:
+        """PlayerActionAnalyzer heuristics: intent, ability, dc, requires_check"""
+        return PlayerActionAnalyzer.analyze_action(self.text, dc=self.dc)
+
+    @property
+    def ability(self) -> str:
+        return self.action['ability']
+
+    @property
+    def negated(self) -> bool:
+        return self.clauses['negated']
+
+    @property
+    def conditional(self) -> bool:
+        return self.clauses['is_conditional']
+
+
+@lru_cache(maxsize=2048)
+def _analysis(text: str, checksum: str) -> ActionAnalysis:
+    return ActionAnalysis(text)
+
+
+def analyze(text: str) -> ActionAnalysis:
+    """The shared ActionAnalysis for this exact input under the current rule tables"""
+    return _analysis(text, rule_tables().checksum)
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+
+    from ToneAnalyzer import ToneState, ToneTracker
+
+    session = ["I try to pick the lock", "roll", "hey Lyra, you coming?", "I attack the goblin",
+               "roll", "If the guard moves, I sneak past", "roll", "I search the room", "roll"] * 200
+
+    def separate(text):
+        # What a turn cost before: each consumer re-scans the raw text
+        ToneAnalyzer.score(text)                                     # tone tracker
+        detect_intent(text)                                          # action validator
+        PlayerActionAnalyzer.analyze_action(text)                    # local roll check
+        find_matching_intents(text.lower()), DCAnalyzer.suggest_dc(text)  # roll classifier
+        set(re.findall(r"[a-z']+", text.lower()))                    # party director
+
+    def shared(text):
+        a = analyze(text)
+        a.tone_scores, a.detection, a.action, a.intents, a.dc, a.word_set
+
+    # Recorded-session mix (mostly repeats), then every input distinct (no cache hits)
+    fresh = [f"{text} #{i}" for i, text in enumerate(session)]
+    for inputs, kind in ((session, "session"), (fresh, "all distinct")):
+        for label, fn in (("separate scans", separate), ("shared analysis", shared)):
+            start = time.perf_counter()
+            for text in inputs:
+                fn(text)
+            print(f"{kind:>12} {label:>15}: {(time.perf_counter() - start) / len(inputs) * 1e6:.1f} us/turn")
+    print(f"cache: {_analysis.cache_info()}")
+
+    # Tone from the analysis matches the tracker fed the same scores
+    tracker, tone_state = ToneTracker(), ToneState()
+    for text in session[:9]:
+        tracker.update(tone_state, text, analyze(text).tone_scores)
+    print(f"tracked tone after one pass: {tone_state.current.value}")
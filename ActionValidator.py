@@ -1,88 +1,54 @@
 # ============================================================================
 # TURN VALIDATOR: Final Validation Before Action Execution
 # ============================================================================
-from typing import Dict, List
-from IntentAnalyzer import detect_intent, INTENT_DEFINITIONS
+import threading
+from typing import Dict, List, Optional
+from ActionAnalysis import analyze
 from ContextManager import ContextManager
 
 class ActionValidator:
     """
     Validates player actions based on current context and turn limits.
+    One validator (and ContextManager) per session; the rule tables are shared read-only.
     """
-        
+
+    def __init__(self, context_manager: Optional[ContextManager] = None):
+        self.context_manager = context_manager or ContextManager()
+        self._lock = threading.Lock()
+
+    def check_intents(self, intents: List[str]) -> Optional[str]:
+        """
+        Check a batch of intents against context and turn limits, recording them only if all pass.
+        Returns None when valid, otherwise the reason the batch was rejected.
+        """
+        cm = self.context_manager
+        for intent in intents:
+            if not cm.is_allowed(intent):
+                return f"Cannot perform '{intent}' during {cm.current_context}."
+
+        with self._lock:
+            over_limit = cm.record_actions(intents)
+        if over_limit is not None:
+            return f"Cannot perform '{over_limit}' more than {cm.rules.limit(over_limit)} time(s) per turn."
+        return None
 
     def validate_action(self, action_text: str) -> Dict:
         """
         Complete validation pipeline: Intent detection + context checking + turn limits.
         Returns comprehensive response for DM engine.
         """
-        
-        # Step 1: Detect intent
-        detection = detect_intent(action_text, ContextManager.current_context)
-        
+
+        # Step 1: Detect intent (shared with the other analyzers via ActionAnalysis)
+        detection = analyze(action_text).detection
+
         # Handle unclear intents
-        if detection["status"] == "unclear":
+        if detection["status"] in ("unclear", "conditional_unclear"):
             return {
                 "valid": False,
                 "reason": "Intent unclear",
                 **detection,
             }
-        
-        # Handle conditionals
-        if detection["status"] == "conditional":
-            intent = detection["intent"]
-            allowed = ContextManager.get_allowed_intents()
-            
-            if intent not in allowed:
-                return {
-                    "valid": False,
-                    "reason": f"Cannot perform '{intent}' during {ContextManager.current_context}.",
-                    **detection,
-                }
-            
-            if not ContextManager.record_action(intent):
-                max_allowed = INTENT_DEFINITIONS[intent]["max_per_turn"]
-                return {
-                    "valid": False,
-                    "reason": f"Cannot perform '{intent}' more than {max_allowed} time(s) per turn.",
-                    **detection,
-                }
-            
-            return {
-                "valid": True,
-                "reason": "Conditional action valid and within turn limits.",
-                **detection,
-            }
-        
-        # Handle multi-intent
-        if detection["status"] == "multi_intent":
-            intents = detection["intents"]
-            allowed = ContextManager.get_allowed_intents()
-            
-            for intent_obj in intents:
-                intent = intent_obj["intent"]
-                
-                if intent not in allowed:
-                    return {
-                        "valid": False,
-                        "reason": f"Cannot perform '{intent}' during {ContextManager.current_context}.",
-                        **detection,
-                    }
 
-                if not ContextManager.record_action(intent):
-                    max_allowed = INTENT_DEFINITIONS[intent]["max_per_turn"]
-                    return {
-                        "valid": False,
-                        "reason": f"Cannot perform '{intent}' more than {max_allowed} time(s) per turn.",
-                        **detection,
-                    }
-            
-            return {
-                "valid": True,
-                "reason": "All intents valid and within turn limits.",
-                **detection,
-            }
-        
         # Handle single intent (status: "valid" or "negation_detected")
         if detection["status"] == "negation_detected":
             return {
@@ -90,27 +56,25 @@ class ActionValidator:
                 "reason": "Action is negated.",
                 **detection,
             }
-        
-        intent = detection["intent"]
-        allowed = ContextManager.get_allowed_intents()
-        
-        if intent not in allowed:
-            return {
-                "valid": False,
-                "reason": f"Cannot perform '{intent}' during {ContextManager.current_context}.",
-                **detection,
-            }
-        
-        if not ContextManager.record_action(intent):
-            max_allowed = INTENT_DEFINITIONS[intent]["max_per_turn"]
-            return {
-                "valid": False,
-                "reason": f"Cannot perform '{intent}' more than {max_allowed} time(s) per turn.",
-                **detection,
-            }
-        
+
+        # Handle multi-intent: the whole chain is validated as one batch
+        if detection["status"] == "multi_intent":
+            intents = [intent_obj["intent"] for intent_obj in detection["intents"]]
+            success_reason = "All intents valid and within turn limits."
+        elif detection["status"] == "conditional":
+            intents = [detection["intent"]]
+            success_reason = "Conditional action valid and within turn limits."
+        else:
+            intents = [detection["intent"]]
+            success_reason = "Action valid and within turn limits."
+
+        failure = self.check_intents(intents)
         return {
-            "valid": True,
-            "reason": "Action valid and within turn limits.",
+            "valid": failure is None,
+            "reason": failure or success_reason,
             **detection,
-        }
\ No newline at end of file
+        }
+
+    def validate_batch(self, action_texts: List[str]) -> List[Dict]:
+        """Validate several actions in order against the same turn limits."""
+        return [self.validate_action(text) for text in action_texts]
@@ -0,0 +1,359 @@
+"""Tactical grid for a Scene: terrain costs, positions and pathfinding.
+
+The `move` intent is pure narrative: with no spatial model the LLM guesses
+distances and ignores difficult terrain. A BattleMap is a grid of 5-foot
+squares backed by NumPy arrays (terrain codes and per-square movement cost)
+with creature positions on top. Movement follows the 5e grid rules: any of the
+8 neighbours costs 1 square (2 in difficult terrain), walls block, and a move
+may not cut a wall corner. Creatures don't block the way, only the square a
+move ends on, so cached fields stay valid as creatures move.
+
+  - reachable(): bounded Dijkstra from a creature over the squares within its
+    speed, cached per (square, budget) until the terrain changes
+  - path(): A* (octile heuristic) between two squares, cached the same way
+  - resolve_move(): legality, cost in feet and route for a move, answered from
+    the cached field
+
+Usage:
+    grid = BattleMap.from_ascii(["#########",
+                                 "#..~~...#",
+                                 "#..##...#",
+                                 "#########"])
+    grid.place("Theron", 1, 1)
+    scene.battle_map = grid
+    move = grid.resolve_move("Theron", (6, 2), speed_feet=30)   # move.legal, move.feet, move.path
+"""
+
+import copy
+import heapq
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FEET_PER_SQUARE = 5
+
+# terrain code -> (name, ascii, movement cost in squares; inf is impassable)
+TERRAIN = {
+    0: ('floor', '.', 1.0),
+    1: ('difficult', '~', 2.0),
+    2: ('wall', '#', np.inf),
+}
+FLOOR, DIFFICULT, WALL = 0, 1, 2
+_ASCII_CODES = {symbol: code for code, (_, symbol, _) in TERRAIN.items()}
+_COSTS = np.array([TERRAIN[code][2] for code in sorted(TERRAIN)], dtype=np.float64)
+
+# (dx, dy) for the 8 neighbours; diagonals are the last four
+_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+@dataclass
+class Reachable:
+    """Movement costs (in squares) from one square, within a budget"""
+    origin: Tuple[int, int]
+    budget: float
+    costs: Dict[int, float]          # flat square index -> cost to enter it
+    parents: Dict[int, int]          # flat square index -> previous square on the cheapest route
+    width: int
+
+    def cost(self, x: int, y: int) -> Optional[float]:
+        return self.costs.get(y * self.width + x)
+
+    def squares(self) -> List[Tuple[int, int]]:
+        return [(i % self.width, i // self.width) for i in self.costs]
+
+    def route(self, x: int, y: int) -> Optional[List[Tuple[int, int]]]:
+        index = y * self.width + x
+        if index not in self.costs:
+            return None
+        route = [index]
+        while route[-1] in self.parents:
+            route.append(self.parents[route[-1]])
+        return [(i % self.width, i // self.width) for i in reversed(route)]
+
+
+@dataclass
+class MoveResult:
+    legal: bool
+    feet: Optional[int] = None
+    path: List[Tuple[int, int]] = field(default_factory=list)
+    reason: str = ""
+
+
+class BattleMap:
+    """Terrain grid with creature positions and cached distance fields"""
+
+    def __init__(self, width: int, height: int, terrain: Optional[np.ndarray] = None, cache_size: int = 512):
+        self.width, self.height = width, height
+        self.terrain = np.zeros((height, width), dtype=np.uint8) if terrain is None else terrain.astype(np.uint8)
+        self.positions: Dict[str, Tuple[int, int]] = {}
+        self._occupants: Dict[Tuple[int, int], str] = {}
+        self.cache_size = cache_size
+        self.version = 0
+        self._fields: "OrderedDict[Tuple, Reachable]" = OrderedDict()
+        self._paths: "OrderedDict[Tuple, Optional[List[Tuple[int, int]]]]" = OrderedDict()
+        self._compile()
+
+    @classmethod
+    def from_ascii(cls, rows: List[str]) -> "BattleMap":
+        """'.' floor, '~' difficult terrain, '#' wall; unknown symbols are floor"""
+        width = max(len(row) for row in rows)
+        terrain = np.full((len(rows), width), FLOOR, dtype=np.uint8)
+        for y, row in enumerate(rows):
+            terrain[y, :len(row)] = [_ASCII_CODES.get(symbol, FLOOR) for symbol in row]
+        return cls(width, len(rows), terrain)
+
+    def fork(self) -> "BattleMap":
+        """Copy with its own positions; terrain and cached fields are shared until either side repaints"""
+        clone = copy.copy(self)
+        clone.positions = dict(self.positions)
+        clone._occupants = dict(self._occupants)
+        clone._fields = OrderedDict(self._fields)
+        clone._paths = OrderedDict(self._paths)
+        return clone
+
+    @property
+    def cost(self) -> np.ndarray:
+        """Movement cost per square (inf for walls)"""
+        return _COSTS[self.terrain]
+
+    def _compile(self):
+        """Flat Python lists for the search loops (NumPy element access is slow one square at a time)"""
+        cost = self.cost
+        self._cost_flat: List[float] = cost.ravel().tolist()
+        self._passable_flat: List[bool] = np.isfinite(cost).ravel().tolist()
+        self._fields.clear()
+        self._paths.clear()
+
+    def set_terrain(self, x0: int, y0: int, x1: int, y1: int, code: int):
+        """Paint a rectangle (inclusive); invalidates cached fields and paths"""
+        # Copy on write: a forked map may share the terrain array
+        self.terrain = self.terrain.copy()
+        self.terrain[y0:y1 + 1, x0:x1 + 1] = code
+        self.version += 1
+        self._compile()
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def passable(self, x: int, y: int) -> bool:
+        return self.in_bounds(x, y) and self._passable_flat[y * self.width + x]
+
+    # ========================================================================
+    # POSITIONS
+    # ========================================================================
+
+    def place(self, creature: str, x: int, y: int):
+        if not self.passable(x, y):
+            raise ValueError(f"({x}, {y}) is not an open square")
+        occupant = self._occupants.get((x, y))
+        if occupant not in (None, creature):
+            raise ValueError(f"({x}, {y}) is occupied by {occupant}")
+        self.remove(creature)
+        self.positions[creature] = (x, y)
+        self._occupants[(x, y)] = creature
+
+    def occupant(self, x: int, y: int) -> Optional[str]:
+        return self._occupants.get((x, y))
+
+    def remove(self, creature: str):
+        position = self.positions.pop(creature, None)
+        if position is not None:
+            del self._occupants[position]
+
+    # ========================================================================
+    # PATHFINDING
+    # ========================================================================
+
+    def _neighbours(self, index: int):
+        width, height, passable = self.width, self.height, self._passable_flat
+        x, y = index % width, index // width
+        for dx, dy in _STEPS:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < width and 0 <= ny < height):
+                continue
+            other = ny * width + nx
+            if not passable[other]:
+                continue
+            # No cutting a wall corner on a diagonal
+            if dx and dy and not (passable[y * width + nx] and passable[ny * width + x]):
+                continue
+            yield other
+
+    def _cache(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def reachable_from(self, x: int, y: int, budget: float) -> Reachable:
+        """Every square within `budget` squares of movement (bounded Dijkstra), cached"""
+        key = (x, y, budget)
+        found = self._fields.get(key)
+        if found is not None:
+            self._fields.move_to_end(key)
+            return found
+
+        start = y * self.width + x
+        cost, costs, parents = self._cost_flat, {start: 0.0}, {}
+        frontier = [(0.0, start)]
+        while frontier:
+            spent, index = heapq.heappop(frontier)
+            if spent > costs[index]:
+                continue
+            for other in self._neighbours(index):
+                total = spent + cost[other]
+                if total <= budget and total < costs.get(other, np.inf):
+                    costs[other] = total
+                    parents[other] = index
+                    heapq.heappush(frontier, (total, other))
+
+        found = Reachable((x, y), budget, costs, parents, self.width)
+        self._cache(self._fields, key, found)
+        return found
+
+    def reachable(self, creature: str, speed_feet: int) -> Reachable:
+        x, y = self.positions[creature]
+        return self.reachable_from(x, y, speed_feet / FEET_PER_SQUARE)
+
+    def path(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        """Cheapest route between two squares (A*), or None if there is none; cached"""
+        key = (start, goal)
+        if key in self._paths:
+            self._paths.move_to_end(key)
+            return self._paths[key]
+
+        route = None
+        if self.passable(*start) and self.passable(*goal):
+            width, cost = self.width, self._cost_flat
+            source, target = start[1] * width + start[0], goal[1] * width + goal[0]
+            gx, gy = goal
+
+            def estimate(index: int) -> float:
+                # Octile distance with diagonals costing one square: the Chebyshev distance
+                return max(abs(index % width - gx), abs(index // width - gy))
+
+            costs, parents = {source: 0.0}, {}
+            frontier = [(estimate(source), 0.0, source)]
+            while frontier:
+                _, spent, index = heapq.heappop(frontier)
+                if index == target:
+                    route = [index]
+                    while route[-1] in parents:
+                        route.append(parents[route[-1]])
+                    route = [(i % width, i // width) for i in reversed(route)]
+                    break
+                if spent > costs[index]:
+                    continue
+                for other in self._neighbours(index):
+                    total = spent + cost[other]
+                    if total < costs.get(other, np.inf):
+                        costs[other] = total
+                        parents[other] = index
+                        heapq.heappush(frontier, (total + estimate(other), total, other))
+
+        self._cache(self._paths, key, route)
+        return route
+
+    def path_cost(self, route: List[Tuple[int, int]]) -> float:
+        """Squares of movement spent walking a route (the starting square is free)"""
+        return sum(self._cost_flat[y * self.width + x] for x, y in route[1:])
+
+    # ========================================================================
+    # MOVES
+    # ========================================================================
+
+    def resolve_move(self, creature: str, target: Tuple[int, int], speed_feet: int,
+                     spent_feet: int = 0) -> MoveResult:
+        """Can the creature get to target this turn, and at what cost? (Does not move it.)"""
+        x, y = target
+        if not self.in_bounds(x, y):
+            return MoveResult(False, reason="off the map")
+        if not self.passable(x, y):
+            return MoveResult(False, reason="blocked")
+        occupant = self.occupant(x, y)
+        if occupant is not None and occupant != creature:
+            return MoveResult(False, reason=f"occupied by {occupant}")
+
+        field_ = self.reachable(creature, speed_feet - spent_feet)
+        squares = field_.cost(x, y)
+        if squares is None:
+            route = self.path(self.positions[creature], target)
+            if route is None:
+                return MoveResult(False, reason="no route")
+            feet = int(self.path_cost(route) * FEET_PER_SQUARE)
+            return MoveResult(False, feet, route, reason=f"needs {feet} ft, {speed_feet - spent_feet} ft left")
+        return MoveResult(True, int(squares * FEET_PER_SQUARE), field_.route(x, y))
+
+    def move(self, creature: str, target: Tuple[int, int], speed_feet: int, spent_feet: int = 0) -> MoveResult:
+        result = self.resolve_move(creature, target, speed_feet, spent_feet)
+        if result.legal:
+            self.place(creature, *target)
+        return result
+
+    def distance_feet(self, a: str, b: str) -> Optional[int]:
+        """Walking distance between two creatures, in feet"""
+        route = self.path(self.positions[a], self.positions[b])
+        return None if route is None else int(self.path_cost(route) * FEET_PER_SQUARE)
+
+    def to_context(self, viewpoint: Optional[str] = None, creatures: Optional[List[str]] = None) -> str:
+        """Positions (and walking distances from viewpoint) for the system prompt; only `creatures` if given"""
+        lines = [f"=== BATTLE MAP ({self.width}x{self.height} squares of {FEET_PER_SQUARE} ft) ==="]
+        for creature, (x, y) in self.positions.items():
+            if creatures is not None and creature not in creatures:
+                continue
+            line = f"- {creature} at ({x}, {y})"
+            if viewpoint is not None and creature != viewpoint and viewpoint in self.positions:
+                feet = self.distance_feet(viewpoint, creature)
+                line += f", {feet} ft away" if feet is not None else ", unreachable"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# Example usage / benchmark
+if __name__ == "__main__":
+    import time
+
+    grid = BattleMap.from_ascii([
+        "##########",
+        "#........#",
+        "#..~~~...#",
+        "#..####..#",
+        "#........#",
+        "##########",
+    ])
+    grid.place("Theron", 1, 1)
+    grid.place("Goblin", 8, 4)
+    print(grid.resolve_move("Theron", (5, 4), speed_feet=30))
+    print(grid.resolve_move("Theron", (8, 1), speed_feet=30))
+    print(grid.to_context(viewpoint="Theron"))
+
+    # 200x200 map, 30% difficult terrain, 10% walls
+    rng = np.random.default_rng(1)
+    terrain = rng.choice([FLOOR, DIFFICULT, WALL], size=(200, 200), p=[0.6, 0.3, 0.1]).astype(np.uint8)
+    big = BattleMap(200, 200, terrain)
+    open_squares = np.argwhere(np.isfinite(big.cost))
+    creatures = [f"c{i}" for i in range(50)]
+    for name, (y, x) in zip(creatures, open_squares[rng.choice(len(open_squares), 50, replace=False)]):
+        big.place(name, int(x), int(y))
+
+    def timed(fn, repeat):
+        start = time.perf_counter()
+        for i in range(repeat):
+            fn(i)
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    targets = [tuple(int(v) for v in open_squares[i][::-1]) for i in rng.choice(len(open_squares), 1000)]
+    cold = timed(lambda i: big.reachable(creatures[i], 30), len(creatures))
+    warm = timed(lambda i: big.resolve_move(creatures[i % 50], big.positions[creatures[i % 50]], 30), 1000)
+    nearby = [(big.positions[c][0] + 2, big.positions[c][1] + 1) for c in creatures]
+    legal = timed(lambda i: big.reachable(creatures[i % 50], 30).cost(*nearby[i % 50]), 1000)
+    print(f"200x200: reachable set (30 ft) cold {cold:.0f} us, cached move check {warm:.1f} us, "
+          f"cached cost lookup {legal:.2f} us")
+
+    pairs = [(big.positions[creatures[i % 50]], targets[i]) for i in range(200)]
+    astar = timed(lambda i: big.path(*pairs[i]), 200)
+    cached = timed(lambda i: big.path(*pairs[i % 200]), 1000)
+    full = timed(lambda i: big.reachable_from(*pairs[i][0], np.inf), 5)
+    print(f"200x200: A* across the map {astar / 1000:.1f} ms, cached {cached:.2f} us; "
+          f"unbounded Dijkstra {full / 1000:.0f} ms")
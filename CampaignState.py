@@ -1,10 +1,16 @@
 from SceneManager import Scene
-from ToneAnalyzer import ToneType
+from SceneStore import SceneStore
+from ToneAnalyzer import ToneType, ToneState
 from Player import Character
 from Party import PartyMember
-from dataclasses import dataclass, field
-from typing import List, Dict
+from PersistentCollections import PMap, PVector
+from Combat import Combat
+from Visibility import FogOfWar
+from NpcRegistry import NpcRegistry
+from dataclasses import dataclass, field, fields, replace
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
+import copy
 
 
 
@@ -19,21 +25,66 @@ class CampaignState:
     
     # State tracking
     player_tone: ToneType = ToneType.NEUTRAL
-    story_beats_completed: List[str] = field(default_factory=list)
-    decisions_made: List[Dict] = field(default_factory=list)
-    scenes_visited: List[str] = field(default_factory=list)
+    tone_state: ToneState = field(default_factory=ToneState)
+    # Growing histories are persistent (list/dict API, structurally shared) so fork() is O(1)
+    story_beats_completed: PVector = field(default_factory=PVector)   # [str]
+    decisions_made: PVector = field(default_factory=PVector)          # [Dict]
+    scenes_visited: PVector = field(default_factory=PVector)          # [scene id]
+    scenes: SceneStore = field(default_factory=SceneStore)  # Every scene seen, by id and location
     
     # Narrative tracking
     main_quest_progress: int = 0
-    side_quests: List[Dict] = field(default_factory=list)
-    npcs_met: Dict[str, Dict] = field(default_factory=dict)
-    world_state: Dict[str, any] = field(default_factory=dict)
+    side_quests: PVector = field(default_factory=PVector)             # [Dict]
+    npcs_met: PMap = field(default_factory=PMap)                      # name -> Dict
+    world_state: PMap = field(default_factory=PMap)                   # key -> any
+    npcs: NpcRegistry = field(default_factory=NpcRegistry)  # Indexed NPC records (aliases, descriptors, last seen)
     
     # Session info
     turn_count: int = 0
     scenes_generated: int = 0
     # Pending roll/check awaiting player to type "roll"
     pending_check: dict = None
+    # Initiative order and timed effects while a fight is on
+    combat: Optional[Combat] = None
+    # What the party has seen on each battle-map scene
+    fog: FogOfWar = field(default_factory=FogOfWar)
+
+    def __post_init__(self):
+        # Accept plain lists/dicts from callers
+        for name in ('story_beats_completed', 'decisions_made', 'scenes_visited', 'side_quests'):
+            if not isinstance(getattr(self, name), PVector):
+                setattr(self, name, PVector(getattr(self, name)))
+        for name in ('npcs_met', 'world_state'):
+            if not isinstance(getattr(self, name), PMap):
+                setattr(self, name, PMap(getattr(self, name)))
+        self.scenes.add(self.current_scene)
+        for name in self.current_scene.npcs_present:
+            self.npcs.seen(name, self.current_scene.id, self.turn_count)
+
+    def fork(self) -> "CampaignState":
+        """
+        Independent branch of this campaign (what-if play, speculation, undo) in O(1).
+        Histories and the scene store are shared until a branch writes to them; the small
+        fixed-size fields (character, party, tone, pending check) are deep-copied. Scene
+        objects are shared, so treat a stored Scene as read-only; the exception is the
+        current scene's battle map, whose creature positions each branch gets its own copy of.
+        """
+        clone = copy.copy(self)
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if hasattr(value, 'fork'):
+                setattr(clone, f.name, value.fork())
+            elif f.name != 'current_scene':
+                setattr(clone, f.name, copy.deepcopy(value))
+
+        grid = self.current_scene.battle_map
+        if grid is not None:
+            clone.current_scene = replace(self.current_scene, battle_map=grid.fork())
+            clone.scenes.add(clone.current_scene)
+            vision = clone.fog.get(self.current_scene.id)
+            if vision is not None and vision.grid is grid:
+                vision.grid = clone.current_scene.battle_map
+        return clone
     
     def add_story_beat(self, beat: str):
         """Track major story progression"""
@@ -50,45 +101,141 @@ class CampaignState:
         })
         
     def change_scene(self, new_scene: Scene):
-        """Transition to new scene"""
+        """Transition to new scene (a scene already in the store is a revisit, not a new one)"""
+        if new_scene.id not in self.scenes:
+            self.scenes.add(new_scene)
+            self.scenes_generated += 1
+        self.scenes.record_transition(self.current_scene.id, new_scene.id)
         self.scenes_visited.append(self.current_scene.id)
         self.current_scene = new_scene
-        self.scenes_generated += 1
+        for name in new_scene.npcs_present:
+            self.npcs.seen(name, new_scene.id, self.turn_count)
 
-    def set_pending_check(self, action: str, ability: str, dc: int):
+    def set_pending_check(self, action: str, ability: str, dc: int, intent: Optional[str] = None):
         """Register a pending mechanical check that the player must 'roll' to resolve."""
         self.pending_check = {
             'action': action,
             'ability': ability,
             'dc': dc,
             'turn': self.turn_count,
+            'intent': intent,
         }
 
     def clear_pending_check(self):
         self.pending_check = None
         
+    def context_sections(self) -> List[Tuple[str, str]]:
+        """Split the LLM context into named sections so prompts can be trimmed"""
+        party_context = "\n".join([p.to_context() for p in self.party_members])
+        npcs = ', '.join(self.current_scene.npcs_present) if self.current_scene.npcs_present else 'None'
+
+        sections = [
+            ('campaign', f"=== CAMPAIGN STATE ===\nCampaign: {self.campaign_name}\nTurn: {self.turn_count}"),
+            ('character', self.player_character.to_context(include_backstory=False).strip()),
+            ('backstory', f"Backstory: {self.player_character.backstory}"),
+            ('party', f"Party Members:\n{party_context if party_context else 'None'}"),
+            ('scene', f"Current Location: {self.current_scene.location}\n"
+                      f"Scene: {self.current_scene.title}\n"
+                      f"{self.current_scene.description}"),
+            ('npcs', f"NPCs Present: {npcs}"),
+            ('progress', f"Story Progress: {len(self.story_beats_completed)} major beats completed\n"
+                         f"Recent Decisions: {len(self.decisions_made)} choices made"),
+            ('tone', f"Player Tone: {self.player_tone} (adapt your language accordingly)"),
+        ]
+        if self.combat is not None:
+            sections.append(('combat', self.combat.to_context()))
+        grid = self.current_scene.battle_map
+        if grid is not None:
+            # With a fog of war for this scene, the DM is only told about creatures the party can see
+            vision = self.fog.get(self.current_scene.id)
+            shown = None
+            if vision is not None and vision.grid is grid:
+                vision.update()
+                shown = vision.visible_creatures()
+            sections.append(('battle_map', grid.to_context(viewpoint=self.player_character.name, creatures=shown)))
+        return sections
+
     def to_context(self) -> str:
         """Generate context for LLM"""
-        party_context = "\n".join([p.to_context() for p in self.party_members])
-        
-        return f"""
-            === CAMPAIGN STATE ===
-            Campaign: {self.campaign_name}
-            Turn: {self.turn_count}
+        return "\n\n".join(text for _, text in self.context_sections())
+
+
+# Example usage / benchmark
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+
+    from SceneManager import SceneType
+
+    def median_time(fn, runs):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return sorted(times)[runs // 2]
 
-            {self.player_character.to_context()}
+    def play(state: CampaignState, turns: int, tag: str = ""):
+        for _ in range(turns):
+            state.turn_count += 1
+            t = state.turn_count
+            state.record_decision(f"{tag}decision {t}", f"outcome {t}")
+            state.world_state[f"flag_{t % 1000}"] = f"{tag}{t}"
+            if t % 5 == 0:
+                state.change_scene(Scene(f"{tag}scene_{t}", f"Place {t % 200}", f"Somewhere {t}.",
+                                         SceneType.EXPLORATION, f"Place {t % 200}"))
+            if t % 20 == 0:
+                state.npcs_met[f"npc_{t % 500}"] = {"met_turn": t}
+            if t % 100 == 0:
+                state.add_story_beat(f"{tag}beat {t}")
 
-            Party Members:
-            {party_context if party_context else "None"}
+    player = Character("Theron", "Human", "Paladin", 3, "Noble", "LG",
+                       {'str': 16, 'dex': 10, 'con': 14, 'int': 10, 'wis': 12, 'cha': 15}, "A knight.", 28, 28)
+    state = CampaignState("c1", "Benchmark", Scene("scene_0", "Start", "The start.", SceneType.EXPLORATION, "Start"),
+                          player, [PartyMember("Lyra", "Elf", "Ranger", 3, "Cautious", "Trusted")])
+    play(state, 10000)
+    print(f"10k-turn state: {len(state.decisions_made)} decisions, {len(state.scenes)} scenes, "
+          f"{len(state.world_state)} world flags, {len(state.npcs_met)} npcs")
 
-            Current Location: {self.current_scene.location}
-            Scene: {self.current_scene.title}
-            {self.current_scene.description}
+    deep = median_time(lambda: copy.deepcopy(state), 3)
+    forked = median_time(state.fork, 101)
+    print(f"deepcopy {deep * 1000:.1f} ms | fork {forked * 1e6:.1f} us")
 
-            NPCs Present: {', '.join(self.current_scene.npcs_present) if self.current_scene.npcs_present else 'None'}
+    # Many simultaneous branches, each diverging by a few turns
+    for label, branch in (("fork", CampaignState.fork), ("deepcopy", copy.deepcopy)):
+        n_branches = 100 if label == "fork" else 10
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        branches = []
+        for i in range(n_branches):
+            b = branch(state)
+            play(b, 10, tag=f"b{i}:")
+            branches.append(b)
+        per_branch = (tracemalloc.get_traced_memory()[0] - base) / n_branches
+        tracemalloc.stop()
+        print(f"{label:>8}: {per_branch / 1024:8.1f} KiB per branch (10 divergent turns, {n_branches} branches)")
+        del branches
 
-            Story Progress: {len(self.story_beats_completed)} major beats completed
-            Recent Decisions: {len(self.decisions_made)} choices made
+    # Branches stay independent
+    a, b = state.fork(), state.fork()
+    play(a, 1, tag="a:")
+    assert len(a.decisions_made) == len(state.decisions_made) + 1 == len(b.decisions_made) + 1
+    assert a.world_state != b.world_state and b.world_state == state.world_state
 
-            Player Tone: {self.player_tone} (adapt your language accordingly)
-            """
\ No newline at end of file
+    # Battle-map positions and fog of war stay independent too
+    from BattleMap import BattleMap
+    grid = BattleMap.from_ascii(["#########", "#...#...#", "#.......#", "#########"])
+    grid.place("Theron", 1, 1)
+    grid.place("Goblin", 7, 1)
+    arena = Scene("arena", "Arena", "Sand and blood.", SceneType.COMBAT, "Arena", battle_map=grid)
+    state.change_scene(arena)
+    state.fog.for_scene(arena, ["Theron"]).update()
+    branch = state.fork()
+    assert branch.current_scene.battle_map.move('Theron', (5, 2), 30).legal
+    assert grid.positions['Theron'] == (1, 1) and branch.current_scene.battle_map.positions['Theron'] == (5, 2)
+    assert state.scenes.get("arena").battle_map is grid
+    branch.fog.get("arena").update()
+    state.fog.get("arena").update()
+    assert "Goblin" in branch.fog.get("arena").visible_creatures()
+    assert "Goblin" not in state.fog.get("arena").visible_creatures()
+    print("forks are independent (histories, world state, battle map, fog of war)")
@@ -0,0 +1,390 @@
+"""Precompiled campaign templates with an indexed branch table.
+
+Authored templates are JSON files (scenes, NPCs, story beats, branches and an
+opening) under campaigns/templates/. They compile into a compact binary artifact
+that is memory-mapped at load time:
+
+    header | scene records | scene id index | branch table | npc records | beat records | blob
+
+Records are (offset, length) pairs into the blob of pre-rendered JSON (scenes
+already carry their Sora prompt). The scene id index and the branch table are
+open-addressing hash tables, so starting a campaign or following a branch is a
+header read plus one probe, however many branches the template has.
+
+Usage:
+    library = TemplateLibrary()
+    template = library.find("The Missing Caravan")
+    scene = template.start_scene()
+    branch = template.match_branch(scene.id, "I accept the quest")
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from dataclasses import dataclass
+from string import Template
+from typing import Dict, List, Optional, Tuple
+
+from IntentAnalyzer import parse_clauses
+from SceneManager import Scene, SceneType
+
+MAGIC = b"DXDT"
+VERSION = 1
+ARTIFACT_SUFFIX = ".dxdt"
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "campaigns", "templates")
+
+# magic, version, start scene, counts (scenes, npcs, beats, branches),
+# hash table capacities (scene index, branch table), section offsets, opening/name spans
+_HEADER = struct.Struct("<4sHI4I2I6I4I")
+_RECORD = struct.Struct("<II")        # blob offset, blob length
+_SCENE_SLOT = struct.Struct("<QI")    # key hash, scene index
+_BRANCH_SLOT = struct.Struct("<QIIiII")  # key hash, from scene, target scene, beat index, choice offset/length
+_EMPTY = 0xFFFFFFFF
+
+
+class TemplateError(Exception):
+    """Raised when a template source or artifact is malformed"""
+
+
+@dataclass
+class Branch:
+    """A pre-authored transition out of a scene"""
+    scene_id: str
+    choice: str
+    target_scene: str
+    beat: Optional[str] = None
+
+
+def normalize_choice(text: str) -> str:
+    """Lowercase and strip punctuation so 'Accept the quest!' matches 'accept the quest'"""
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+def _key_hash(*parts: str) -> int:
+    digest = hashlib.blake2b("\x00".join(parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _capacity(n: int) -> int:
+    """Power of two with load factor <= 0.5"""
+    capacity = 8
+    while capacity < n * 2:
+        capacity *= 2
+    return capacity
+
+
+def _slug(campaign_name: str) -> str:
+    return "_".join(re.findall(r"[a-z0-9]+", campaign_name.lower()))
+
+
+# ============================================================================
+# COMPILER
+# ============================================================================
+
+def compile_template(source: Dict, out_path: str) -> str:
+    """Compile an authored template dict into a binary artifact at out_path"""
+    scenes = source.get("scenes", [])
+    if not scenes:
+        raise TemplateError("Template has no scenes")
+
+    scene_ids = {scene["id"]: i for i, scene in enumerate(scenes)}
+    beats = source.get("story_beats", [])
+    beat_ids = {beat["id"]: i for i, beat in enumerate(beats)}
+    branches = source.get("branches", [])
+    start = source.get("start_scene", scenes[0]["id"])
+    if start not in scene_ids:
+        raise TemplateError(f"Unknown start scene '{start}'")
+
+    blob = bytearray()
+
+    def put(data) -> Tuple[int, int]:
+        raw = data if isinstance(data, bytes) else json.dumps(data, separators=(",", ":")).encode("utf-8")
+        offset = len(blob)
+        blob.extend(raw)
+        return offset, len(raw)
+
+    choices_by_scene: Dict[str, List[str]] = {}
+    for branch in branches:
+        if branch["scene"] not in scene_ids or branch["target"] not in scene_ids:
+            raise TemplateError(f"Branch references unknown scene: {branch}")
+        choices_by_scene.setdefault(branch["scene"], []).append(normalize_choice(branch["choice"]))
+
+    # Scenes are pre-rendered: Scene fields plus Sora prompt and the choices out of the scene
+    scene_records = []
+    for data in scenes:
+        scene = _scene_from_dict(data)
+        rendered = {
+            "id": scene.id,
+            "title": scene.title,
+            "description": scene.description,
+            "scene_type": scene.scene_type.value,
+            "location": scene.location,
+            "npcs_present": scene.npcs_present,
+            "items_present": scene.items_present,
+            "exits": scene.exits,
+            "danger_level": scene.danger_level,
+            "sora_prompt": scene.generate_sora_prompt(),
+            "choices": choices_by_scene.get(scene.id, []),
+        }
+        scene_records.append(put(rendered))
+
+    scene_capacity = _capacity(len(scenes))
+    scene_table = [(0, _EMPTY)] * scene_capacity
+    for scene_id, idx in scene_ids.items():
+        h = _key_hash(scene_id)
+        slot = h & (scene_capacity - 1)
+        while scene_table[slot][1] != _EMPTY:
+            slot = (slot + 1) & (scene_capacity - 1)
+        scene_table[slot] = (h, idx)
+
+    branch_capacity = _capacity(len(branches))
+    branch_table = [(0, _EMPTY, _EMPTY, -1, 0, 0)] * branch_capacity
+    for branch in branches:
+        choice = normalize_choice(branch["choice"])
+        h = _key_hash(branch["scene"], choice)
+        slot = h & (branch_capacity - 1)
+        while branch_table[slot][1] != _EMPTY:
+            existing = branch_table[slot]
+            if existing[0] == h and existing[1] == scene_ids[branch["scene"]]:
+                raise TemplateError(f"Duplicate branch '{choice}' in scene '{branch['scene']}'")
+            slot = (slot + 1) & (branch_capacity - 1)
+        choice_off, choice_len = put(choice.encode("utf-8"))
+        branch_table[slot] = (h, scene_ids[branch["scene"]], scene_ids[branch["target"]],
+                              beat_ids.get(branch.get("beat"), -1), choice_off, choice_len)
+
+    npc_records = [put(npc) for npc in source.get("npcs", [])]
+    beat_records = [put(beat) for beat in beats]
+    opening_span = put(source.get("opening", "").encode("utf-8"))
+    name_span = put(source.get("campaign_name", "").encode("utf-8"))
+
+    # Lay out sections after the header
+    scenes_off = _HEADER.size
+    scene_index_off = scenes_off + _RECORD.size * len(scene_records)
+    branches_off = scene_index_off + _SCENE_SLOT.size * scene_capacity
+    npcs_off = branches_off + _BRANCH_SLOT.size * branch_capacity
+    beats_off = npcs_off + _RECORD.size * len(npc_records)
+    blob_off = beats_off + _RECORD.size * len(beat_records)
+
+    out = bytearray(_HEADER.pack(
+        MAGIC, VERSION, scene_ids[start],
+        len(scenes), len(npc_records), len(beat_records), len(branches),
+        scene_capacity, branch_capacity,
+        scenes_off, scene_index_off, branches_off, npcs_off, beats_off, blob_off,
+        *opening_span, *name_span,
+    ))
+    for record in scene_records:
+        out += _RECORD.pack(*record)
+    for entry in scene_table:
+        out += _SCENE_SLOT.pack(*entry)
+    for entry in branch_table:
+        out += _BRANCH_SLOT.pack(*entry)
+    for record in npc_records + beat_records:
+        out += _RECORD.pack(*record)
+    out += blob
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(out)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _scene_from_dict(data: Dict) -> Scene:
+    return Scene(
+        id=data["id"],
+        title=data["title"],
+        description=data["description"],
+        scene_type=SceneType(data.get("scene_type", SceneType.EXPLORATION.value)),
+        location=data["location"],
+        npcs_present=list(data.get("npcs_present", [])),
+        items_present=list(data.get("items_present", [])),
+        exits=list(data.get("exits", [])),
+        danger_level=data.get("danger_level", 0),
+        sora_prompt=data.get("sora_prompt"),
+    )
+
+
+# ============================================================================
+# LOADER
+# ============================================================================
+
+class CompiledTemplate:
+    """Read-only, memory-mapped view of a compiled template"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map.size() < _HEADER.size:
+            raise TemplateError(f"{path} is too small to be a template")
+
+        (magic, version, self._start, self.scene_count, self.npc_count, self.beat_count,
+         self.branch_count, self._scene_capacity, self._branch_capacity,
+         self._scenes_off, self._scene_index_off, self._branches_off, self._npcs_off,
+         self._beats_off, self._blob_off, *spans) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise TemplateError(f"{path} is not a version {VERSION} campaign template")
+        self._opening_span = spans[0:2]
+        self._name_span = spans[2:4]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _blob(self, offset: int, length: int) -> bytes:
+        start = self._blob_off + offset
+        return self._map[start:start + length]
+
+    def _record(self, table_off: int, idx: int) -> Dict:
+        offset, length = _RECORD.unpack_from(self._map, table_off + idx * _RECORD.size)
+        return json.loads(self._blob(offset, length))
+
+    @property
+    def name(self) -> str:
+        return self._blob(*self._name_span).decode("utf-8")
+
+    def opening(self, **fields) -> str:
+        """Pre-rendered opening narration; $name/$race/$char_class are filled from fields"""
+        return Template(self._blob(*self._opening_span).decode("utf-8")).safe_substitute(fields)
+
+    def scene_data(self, idx: int) -> Dict:
+        if not 0 <= idx < self.scene_count:
+            raise IndexError(idx)
+        return self._record(self._scenes_off, idx)
+
+    def scene(self, idx: int) -> Scene:
+        return _scene_from_dict(self.scene_data(idx))
+
+    def start_scene(self) -> Scene:
+        return self.scene(self._start)
+
+    def find_scene(self, scene_id: str) -> Optional[int]:
+        """Scene index for an id, via the hash index"""
+        h = _key_hash(scene_id)
+        mask = self._scene_capacity - 1
+        slot = h & mask
+        while True:
+            slot_hash, idx = _SCENE_SLOT.unpack_from(self._map, self._scene_index_off + slot * _SCENE_SLOT.size)
+            if idx == _EMPTY:
+                return None
+            if slot_hash == h:
+                return idx
+            slot = (slot + 1) & mask
+
+    def get_scene(self, scene_id: str) -> Optional[Scene]:
+        idx = self.find_scene(scene_id)
+        return None if idx is None else self.scene(idx)
+
+    def branch(self, scene_id: str, choice: str) -> Optional[Branch]:
+        """Exact branch lookup for a (scene, choice) pair"""
+        from_idx = self.find_scene(scene_id)
+        if from_idx is None:
+            return None
+        choice = normalize_choice(choice)
+        h = _key_hash(scene_id, choice)
+        mask = self._branch_capacity - 1
+        slot = h & mask
+        while True:
+            slot_hash, src, target, beat, choice_off, choice_len = _BRANCH_SLOT.unpack_from(
+                self._map, self._branches_off + slot * _BRANCH_SLOT.size)
+            if src == _EMPTY:
+                return None
+            if slot_hash == h and src == from_idx and self._blob(choice_off, choice_len).decode("utf-8") == choice:
+                target_data = self.scene_data(target)
+                beat_id = self._record(self._beats_off, beat)["id"] if beat >= 0 else None
+                return Branch(scene_id, choice, target_data["id"], beat_id)
+            slot = (slot + 1) & mask
+
+    def match_branch(self, scene_id: str, player_input: str) -> Optional[Branch]:
+        """Branch whose choice is the player's input or is contained in it (and not negated)"""
+        exact = self.branch(scene_id, player_input)
+        if exact is not None:
+            return exact
+        idx = self.find_scene(scene_id)
+        if idx is None:
+            return None
+        padded = f" {normalize_choice(player_input)} "
+        # "I refuse to accept the quest" must not follow the accept branch
+        clauses = parse_clauses(player_input)
+        negated = f" {normalize_choice(clauses['negated_action'])} " if clauses["negated"] else ""
+        for choice in self.scene_data(idx)["choices"]:
+            if f" {choice} " in padded and f" {choice} " not in negated:
+                return self.branch(scene_id, choice)
+        return None
+
+    def npcs(self) -> List[Dict]:
+        return [self._record(self._npcs_off, i) for i in range(self.npc_count)]
+
+    def story_beats(self) -> List[Dict]:
+        return [self._record(self._beats_off, i) for i in range(self.beat_count)]
+
+
+class TemplateLibrary:
+    """Finds templates by campaign name, compiling sources whose artifact is missing or stale"""
+
+    def __init__(self, directory: str = TEMPLATE_DIR):
+        self.directory = directory
+        self._loaded: Dict[str, CompiledTemplate] = {}
+
+    def find(self, campaign_name: str) -> Optional[CompiledTemplate]:
+        slug = _slug(campaign_name)
+        if slug in self._loaded:
+            return self._loaded[slug]
+
+        source_path = os.path.join(self.directory, slug + ".json")
+        artifact_path = os.path.join(self.directory, slug + ARTIFACT_SUFFIX)
+        if os.path.exists(source_path):
+            if (not os.path.exists(artifact_path)
+                    or os.path.getmtime(artifact_path) < os.path.getmtime(source_path)):
+                with open(source_path, encoding="utf-8") as f:
+                    compile_template(json.load(f), artifact_path)
+        elif not os.path.exists(artifact_path):
+            return None
+
+        template = CompiledTemplate(artifact_path)
+        self._loaded[slug] = template
+        return template
+
+
+# Example usage
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    # Synthetic template with thousands of branches: lookup cost should not grow with size
+    n_scenes, per_scene = 500, 10
+    source = {
+        "campaign_name": "Benchmark",
+        "opening": "The road forks, $name.",
+        "scenes": [{"id": f"s{i}", "title": f"Scene {i}", "description": f"Place number {i}.",
+                    "scene_type": "exploration", "location": f"Place {i}"} for i in range(n_scenes)],
+        "branches": [{"scene": f"s{i}", "choice": f"take path {j}", "target": f"s{(i + j + 1) % n_scenes}"}
+                     for i in range(n_scenes) for j in range(per_scene)],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "benchmark" + ARTIFACT_SUFFIX)
+        start = time.perf_counter()
+        compile_template(source, path)
+        print(f"compiled {n_scenes * per_scene} branches in {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"({os.path.getsize(path) / 1024:.0f} KiB)")
+
+        start = time.perf_counter()
+        template = CompiledTemplate(path)
+        scene = template.start_scene()
+        opening = template.opening(name="Theron")
+        print(f"open + start scene: {(time.perf_counter() - start) * 1e6:.0f} us -> {scene.title}: {opening}")
+
+        n = 10000
+        start = time.perf_counter()
+        for k in range(n):
+            template.branch(f"s{k % n_scenes}", f"take path {k % per_scene}")
+        print(f"branch lookup: {(time.perf_counter() - start) / n * 1e6:.1f} us")
+        template.close()
@@ -66,22 +66,27 @@ def main():
     print(f"\n[Scene Generated: {state.current_scene.sora_prompt}]")
     
     # Example gameplay loop
-    while True:
-        print("\n" + "="*60)
-        player_action = input("\nWhat do you do? > ")
+    try:
+        while True:
+            print("\n" + "="*60)
+            player_action = input("\nWhat do you do? > ")
         
-        if player_action.lower() in ['quit', 'exit']:
-            break
+            if player_action.lower() in ['quit', 'exit']:
+                break
         
-        dm_response, new_scene, sora_prompt = dm.process_turn(player_action, state)
+            dm_response, new_scene, sora_prompt = dm.process_turn(player_action, state)
         
-        print(f"\n{dm_response}")
+            print(f"\n{dm_response}")
         
-        if new_scene:
-            print(f"\n[NEW SCENE GENERATED]")
-            print(f"Sora Prompt: {sora_prompt}")
+            if new_scene:
+                print(f"\n[NEW SCENE GENERATED]")
+                print(f"Sora Prompt: {sora_prompt}")
         
-        print(f"\n[Turn {state.turn_count} | Tone: {state.player_tone.value}]")
+            turn_usage = dm.usage.last_turn
+            print(f"\n[Turn {state.turn_count} | Tone: {state.player_tone.value} | "
+                  f"Tokens: {turn_usage.total_tokens} | {turn_usage.wall_seconds:.2f}s]")
+    finally:
+        dm.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+"""Process-wide registry of shared LLM clients and other heavy per-agent resources.
+
+Building a ChatOpenAI per DungeonMasterAgent gives every session its own HTTP
+connection pool (and TLS handshakes), plus its own TTS engine and template
+library. The registry hands out one pooled client per (api key, model, settings)
+over a single bounded keep-alive httpx pool, one LLMGateway per client (so rate
+limits and the circuit breaker are process-wide), one LLMScheduler that orders
+every session's model calls, and shared TTS/templates. Only the conversation
+memory stays per agent.
+
+Usage:
+    registry = default_registry()
+    dm = DungeonMasterAgent(api_key, registry=registry)   # cheap: reuses pooled clients
+
+Run this module to benchmark agent construction and open connections against a
+local HTTP stand-in for the OpenAI API.
+"""
+
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from CampaignTemplate import TemplateLibrary
+from LLMGateway import LLMGateway
+from LLMScheduler import LLMScheduler
+from tts import TTS
+
+
+class ClientRegistry:
+    """Shared, lazily created clients keyed by their configuration"""
+
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 30.0, request_timeout: float = 60.0,
+                 gateway_options: Optional[Dict] = None, scheduler_options: Optional[Dict] = None):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.request_timeout = request_timeout
+        self.gateway_options = gateway_options or {}
+        self.scheduler_options = scheduler_options or {}
+        self._http_client = None
+        self._models: Dict[Tuple, object] = {}
+        self._gateways: Dict[Tuple, LLMGateway] = {}
+        self._scheduler: Optional[LLMScheduler] = None
+        self._tts: Optional[TTS] = None
+        self._templates: Optional[TemplateLibrary] = None
+        self._lock = threading.RLock()
+
+    def http_client(self):
+        """One bounded keep-alive connection pool for every model client"""
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                        keepalive_expiry=self.keepalive_expiry,
+                    ),
+                    timeout=self.request_timeout,
+                )
+            return self._http_client
+
+    @staticmethod
+    def _key(api_key: Optional[str], model: str, temperature: float, base_url: Optional[str]) -> Tuple:
+        # Never keep raw API keys around as dict keys
+        fingerprint = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        return (fingerprint, model, temperature, base_url)
+
+    def chat_model(self, api_key: Optional[str], model: str, temperature: float = 0.8,
+                   base_url: Optional[str] = None):
+        key = self._key(api_key, model, temperature, base_url)
+        with self._lock:
+            client = self._models.get(key)
+            if client is None:
+                options = {'base_url': base_url} if base_url else {}
+                client = ChatOpenAI(
+                    temperature=temperature,
+                    model=model,
+                    openai_api_key=api_key,
+                    http_client=self.http_client(),
+                    max_retries=0,  # LLMGateway owns retries
+                    **options
+                )
+                self._models[key] = client
+            return client
+
+    def gateway(self, api_key: Optional[str], model: str, temperature: float = 0.8,
+                base_url: Optional[str] = None) -> LLMGateway:
+        key = self._key(api_key, model, temperature, base_url)
+        with self._lock:
+            gateway = self._gateways.get(key)
+            if gateway is None:
+                gateway = LLMGateway(self.chat_model(api_key, model, temperature, base_url),
+                                     **self.gateway_options)
+                self._gateways[key] = gateway
+            return gateway
+
+    def scheduler(self) -> LLMScheduler:
+        """One scheduler for the shared model quota: every agent's calls queue here"""
+        with self._lock:
+            if self._scheduler is None:
+                self._scheduler = LLMScheduler(**self.scheduler_options)
+            return self._scheduler
+
+    def tts(self) -> TTS:
+        with self._lock:
+            if self._tts is None:
+                self._tts = TTS()
+            return self._tts
+
+    def templates(self) -> TemplateLibrary:
+        with self._lock:
+            if self._templates is None:
+                self._templates = TemplateLibrary()
+            return self._templates
+
+    def close(self):
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+            self._models.clear()
+            self._gateways.clear()
+            if self._scheduler is not None:
+                self._scheduler.shutdown()
+                self._scheduler = None
+
+
+_default_registry: Optional[ClientRegistry] = None
+_default_lock = threading.Lock()
+
+
+def default_registry() -> ClientRegistry:
+    """The process-wide registry used when an agent isn't given one"""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = ClientRegistry()
+        return _default_registry
+
+
+# Example usage / benchmark
+if __name__ == "__main__":
+    import json
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from langchain.schema import HumanMessage
+    from DungeonMasterAgent import DungeonMasterAgent
+
+    connections = set()
+
+    class FakeOpenAI(BaseHTTPRequestHandler):
+        """Minimal /chat/completions stand-in with HTTP/1.1 keep-alive"""
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.add(self.client_address)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = json.dumps({
+                "id": "chatcmpl-local", "object": "chat.completion", "created": int(time.time()),
+                "model": "stand-in",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "The door creaks open."}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    n_agents = 50
+
+    def run(label, registry_for_agent):
+        connections.clear()
+        start = time.perf_counter()
+        agents = [DungeonMasterAgent("sk-local", tts_enabled=False, openai_base_url=base_url,
+                                     registry=registry_for_agent())
+                  for _ in range(n_agents)]
+        built = time.perf_counter() - start
+        for agent in agents:
+            agent.gateway([HumanMessage(content="I open the door")])
+        print(f"{label:>9}: {built / n_agents * 1000:.2f} ms/agent construction, "
+              f"{len(connections)} connection(s) opened for {n_agents} sessions")
+
+    # Before: every agent builds its own client and pool. After: one shared registry.
+    run("per-agent", ClientRegistry)
+    shared = ClientRegistry()
+    run("pooled", lambda: shared)
+    shared.close()
+    server.shutdown()
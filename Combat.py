@@ -0,0 +1,393 @@
+"""Combat state: initiative order, rounds, and conditions/effects that expire.
+
+ContextManager knows when the game is in "battle" and caps actions per turn,
+but nothing tracked whose turn it is or when "stunned until the end of its next
+turn" runs out. Combat keeps two heaps:
+
+  - turns: (round, initiative rank) per combatant; each turn taken re-queues the
+    combatant for the next round, and combatants join or leave mid-fight
+  - effect events: expiries and recurring ticks (regeneration, ongoing damage)
+    keyed on (round, rank, start/end of turn)
+
+Advancing a turn pops only the events that are due, so its cost depends on what
+happens that turn, not on how many combatants or effects are in play.
+
+Usage:
+    combat = Combat()
+    combat.add(Combatant.from_character(player))
+    combat.add(Combatant("goblin_1", "Goblin", hp=7, dex=14))
+    combat.attach(player.name, validator.context_manager)   # reset_turn() on each of its turns
+    turn = combat.start()
+    combat.apply(Effect("Stunning Strike", "goblin_1", condition="stunned"), turns=1, ends=END)
+    turn = combat.next_turn()     # turn.expired, turn.ticks
+    state.combat = combat         # adds a 'combat' prompt section
+"""
+
+import heapq
+import itertools
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import dice
+from ContextManager import ContextManager
+from Player import Character
+
+# Phase of a combatant's turn at which an effect expires or ticks
+START, END = 0, 1
+
+# Heap event kinds
+_TICK, _EXPIRE = 0, 1
+
+
+@dataclass
+class Combatant:
+    """One participant in the initiative order"""
+    id: str
+    name: str
+    hp: int
+    hp_max: int = 0
+    dex: int = 10
+    con: int = 10
+    initiative: int = 0
+    rank: Tuple = ()                                          # sort key within a round, lowest acts first
+    conditions: Dict[str, int] = field(default_factory=dict)  # condition -> active effects imposing it
+    concentration: Optional[str] = None                        # effect name being concentrated on
+    active: bool = True                                        # False once removed from the fight
+
+    def __post_init__(self):
+        self.hp_max = self.hp_max or self.hp
+
+    @classmethod
+    def from_character(cls, character: Character, combatant_id: Optional[str] = None) -> "Combatant":
+        return cls(combatant_id or character.name, character.name, character.hp_current, character.hp_max,
+                   dex=character.stats.get('dex', 10), con=character.stats.get('con', 10))
+
+    @property
+    def down(self) -> bool:
+        return self.hp <= 0
+
+
+@dataclass
+class Effect:
+    """A condition or recurring change on one combatant"""
+    name: str
+    target: str
+    condition: Optional[str] = None       # imposed while the effect lasts (e.g. 'stunned')
+    source: Optional[str] = None
+    concentration: bool = False           # ends when the source's concentration breaks
+    tick: Union[int, str] = 0             # hp change per tick: int or dice notation ('1d6'); negative is damage
+    tick_phase: int = START
+    id: int = 0
+    expires: Optional[Tuple] = None       # (round, rank, phase); None lasts until ended
+    active: bool = True
+
+
+@dataclass
+class TurnReport:
+    """What happened when the turn passed: expiries and ticks since the previous turn"""
+    round: int
+    combatant: Combatant
+    expired: List[Effect] = field(default_factory=list)
+    ticks: List[Tuple[Effect, int]] = field(default_factory=list)   # (effect, hp change applied)
+
+
+class Combat:
+    """Initiative order plus a timeline of effect expiries and ticks"""
+
+    def __init__(self):
+        self.combatants: Dict[str, Combatant] = {}
+        self.effects: Dict[int, Effect] = {}
+        self.round = 0
+        self.current: Optional[Combatant] = None
+        self.context_managers: Dict[str, ContextManager] = {}
+        self._turns: List = []      # (round, rank, seq, combatant id)
+        self._events: List = []     # ((round, rank, phase), seq, kind, effect id)
+        self._by_target: Dict[str, Set[int]] = {}
+        self._concentrating: Dict[str, Set[int]] = {}   # source id -> effect ids of its concentration
+        self._seq = itertools.count()
+        self._effect_ids = itertools.count(1)
+
+    # ========================================================================
+    # COMBATANTS AND INITIATIVE
+    # ========================================================================
+
+    def add(self, combatant: Combatant, initiative: Optional[int] = None) -> Combatant:
+        """Roll (or set) initiative and join the order; mid-fight joiners act when their rank comes up"""
+        modifier = dice.ability_modifier(combatant.dex)
+        combatant.initiative = initiative if initiative is not None else dice.roll_d20() + modifier
+        # Ties go to the higher dexterity, then to chance
+        combatant.rank = (-combatant.initiative, -combatant.dex, random.random())
+        combatant.active = True
+        self.combatants[combatant.id] = combatant
+        self._by_target.setdefault(combatant.id, set())
+        if self.round:
+            self._queue_turn(combatant, self._next_turn_round(combatant.rank))
+        return combatant
+
+    def attach(self, combatant_id: str, context_manager: ContextManager):
+        """Reset this ContextManager's per-turn action counts at the start of the combatant's turns"""
+        self.context_managers[combatant_id] = context_manager
+        if self.round:
+            context_manager.set_context("battle")
+
+    def remove(self, combatant_id: str):
+        """Take a combatant out of the fight, ending its effects and concentration"""
+        combatant = self.combatants.pop(combatant_id, None)
+        if combatant is None:
+            return
+        combatant.active = False
+        self.break_concentration(combatant_id)
+        for effect_id in list(self._by_target.pop(combatant_id, ())):
+            self.end_effect(effect_id)
+        context_manager = self.context_managers.pop(combatant_id, None)
+        if context_manager is not None:
+            context_manager.set_context("exploration")
+
+    def order(self) -> List[Combatant]:
+        """Combatants in initiative order"""
+        return sorted(self.combatants.values(), key=lambda c: c.rank)
+
+    def _queue_turn(self, combatant: Combatant, round_number: int):
+        heapq.heappush(self._turns, (round_number, combatant.rank, next(self._seq), combatant.id))
+
+    def _now(self) -> Tuple:
+        return (self.round, self.current.rank) if self.current is not None else (self.round, ())
+
+    def _next_turn_round(self, rank: Tuple) -> int:
+        """Round of the next turn at this rank that has not started yet"""
+        if self.round == 0:
+            return 1
+        return self.round if (self.round, rank) > self._now() else self.round + 1
+
+    # ========================================================================
+    # TURNS
+    # ========================================================================
+
+    def start(self) -> TurnReport:
+        """Begin round 1 and return the first turn"""
+        for context_manager in self.context_managers.values():
+            context_manager.set_context("battle")
+        for combatant in self.combatants.values():
+            self._queue_turn(combatant, 1)
+        self.round = 1
+        return self.next_turn()
+
+    def next_turn(self) -> TurnReport:
+        """End the current turn, start the next one, and apply whatever fell due in between"""
+        if not self._turns:
+            raise ValueError("no combatants in the initiative order")
+        expired, ticks = [], []
+        if self.current is not None:
+            self._run_events((self.round, self.current.rank, END), expired, ticks)
+
+        while True:
+            round_number, rank, _, combatant_id = heapq.heappop(self._turns)
+            combatant = self.combatants.get(combatant_id)
+            # Entries for removed (or removed and re-added) combatants are skipped
+            if combatant is not None and combatant.rank == rank:
+                break
+            if not self._turns:
+                raise ValueError("no combatants in the initiative order")
+
+        self.round, self.current = round_number, combatant
+        self._queue_turn(combatant, round_number + 1)
+        self._run_events((round_number, rank, START), expired, ticks)
+        context_manager = self.context_managers.get(combatant.id)
+        if context_manager is not None:
+            context_manager.reset_turn()
+        return TurnReport(round_number, combatant, expired, ticks)
+
+    def end(self):
+        """Leave combat: context managers go back to exploration"""
+        for context_manager in self.context_managers.values():
+            context_manager.set_context("exploration")
+        self.current = None
+
+    # ========================================================================
+    # EFFECTS
+    # ========================================================================
+
+    def apply(self, effect: Effect, turns: Optional[int] = None, ends: int = END,
+              anchor: Optional[str] = None) -> Effect:
+        """
+        Put an effect on its target. It lasts until the start/end (`ends`) of the anchor's
+        (default: the target's) turns-th turn that hasn't begun yet; turns=None lasts until
+        ended. A concentration effect replaces whatever else its source was concentrating on.
+        """
+        target = self.combatants[effect.target]
+        effect.id, effect.active = next(self._effect_ids), True
+        if effect.concentration and effect.source is not None:
+            source = self.combatants[effect.source]
+            if source.concentration not in (None, effect.name):
+                self.break_concentration(source.id)
+            source.concentration = effect.name
+            self._concentrating.setdefault(source.id, set()).add(effect.id)
+
+        self.effects[effect.id] = effect
+        self._by_target[target.id].add(effect.id)
+        if effect.condition:
+            target.conditions[effect.condition] = target.conditions.get(effect.condition, 0) + 1
+
+        if turns is not None:
+            rank = self.combatants[anchor or effect.target].rank
+            effect.expires = (self._next_turn_round(rank) + turns - 1, rank, ends)
+            self._push_event(effect.expires, _EXPIRE, effect.id)
+        if effect.tick:
+            self._push_event((self._next_turn_round(target.rank), target.rank, effect.tick_phase), _TICK, effect.id)
+        return effect
+
+    def end_effect(self, effect_id: int) -> Optional[Effect]:
+        """End an effect early; its queued events are dropped when they come due"""
+        effect = self.effects.pop(effect_id, None)
+        if effect is None:
+            return None
+        effect.active = False
+        target = self.combatants.get(effect.target)
+        if target is not None:
+            self._by_target[target.id].discard(effect_id)
+            if effect.condition:
+                left = target.conditions.get(effect.condition, 1) - 1
+                if left:
+                    target.conditions[effect.condition] = left
+                else:
+                    target.conditions.pop(effect.condition, None)
+        if effect.concentration and effect.source is not None:
+            group = self._concentrating.get(effect.source)
+            if group is not None:
+                group.discard(effect_id)
+                if not group:
+                    del self._concentrating[effect.source]
+                    source = self.combatants.get(effect.source)
+                    if source is not None:
+                        source.concentration = None
+        return effect
+
+    def break_concentration(self, source_id: str) -> List[Effect]:
+        """End every effect the source is concentrating on"""
+        return [effect for effect_id in list(self._concentrating.get(source_id, ()))
+                if (effect := self.end_effect(effect_id)) is not None]
+
+    def effects_on(self, combatant_id: str) -> List[Effect]:
+        return [self.effects[i] for i in sorted(self._by_target.get(combatant_id, ()))]
+
+    def _push_event(self, key: Tuple, kind: int, effect_id: int):
+        heapq.heappush(self._events, (key, next(self._seq), kind, effect_id))
+
+    def _run_events(self, now: Tuple, expired: List[Effect], ticks: List[Tuple[Effect, int]]):
+        """Fire every event due at or before now"""
+        while self._events and self._events[0][0] <= now:
+            key, _, kind, effect_id = heapq.heappop(self._events)
+            effect = self.effects.get(effect_id)
+            if effect is None:
+                continue
+            if kind == _EXPIRE:
+                expired.append(self.end_effect(effect_id))
+                continue
+            amount = dice.roll(effect.tick) if isinstance(effect.tick, str) else effect.tick
+            if amount < 0:
+                self.damage(effect.target, -amount)
+            else:
+                self.heal(effect.target, amount)
+            ticks.append((effect, amount))
+            if effect.active:
+                self._push_event((key[0] + 1, key[1], key[2]), _TICK, effect_id)
+
+    # ========================================================================
+    # HIT POINTS
+    # ========================================================================
+
+    def damage(self, combatant_id: str, amount: int) -> Dict:
+        """Apply damage; a concentrating combatant makes a CON save (DC 10 or half the damage)"""
+        combatant = self.combatants[combatant_id]
+        combatant.hp = max(0, combatant.hp - amount)
+        result = {'hp': combatant.hp, 'down': combatant.down, 'concentration_check': None}
+        if combatant.concentration is not None and amount > 0:
+            dc = max(10, amount // 2)
+            roll, mod, success, _ = dice.resolve_check(combatant.con, dc)
+            result['concentration_check'] = {'dc': dc, 'roll': roll, 'modifier': mod, 'success': success}
+            if combatant.down or not success:
+                result['broken'] = [e.name for e in self.break_concentration(combatant_id)]
+        return result
+
+    def heal(self, combatant_id: str, amount: int) -> int:
+        combatant = self.combatants[combatant_id]
+        combatant.hp = min(combatant.hp_max, combatant.hp + amount)
+        return combatant.hp
+
+    def to_context(self) -> str:
+        """Initiative order, hit points and conditions for the system prompt"""
+        lines = [f"=== COMBAT (round {self.round}) ==="]
+        if self.current is not None:
+            lines.append(f"Acting now: {self.current.name}")
+        for combatant in self.order():
+            conditions = ", ".join(sorted(combatant.conditions))
+            line = f"- {combatant.name} (init {combatant.initiative}, HP {combatant.hp}/{combatant.hp_max})"
+            if conditions:
+                line += f" [{conditions}]"
+            if combatant.concentration:
+                line += f" concentrating on {combatant.concentration}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# Example usage / benchmark
+if __name__ == "__main__":
+    import time
+
+    random.seed(5)
+    player = Character("Theron", "Human", "Paladin", 3, "Noble", "LG",
+                       {'str': 16, 'dex': 10, 'con': 14, 'int': 10, 'wis': 12, 'cha': 15}, "A knight.", 28, 28)
+    combat = Combat()
+    manager = ContextManager()
+    combat.add(Combatant.from_character(player), initiative=15)
+    combat.add(Combatant("troll", "Troll", hp=84, dex=13), initiative=12)
+    combat.add(Combatant("goblin_1", "Goblin", hp=7, dex=14), initiative=18)
+    combat.attach("Theron", manager)
+
+    turn = combat.start()
+    print(f"round {turn.round}: {turn.combatant.name}; context {manager.current_context}")
+    combat.apply(Effect("Regeneration", "troll", tick=10), turns=None)
+    turn = combat.next_turn()   # Theron
+    combat.apply(Effect("Bless", "Theron", source="Theron", concentration=True), turns=10)
+    combat.apply(Effect("Stunning Smite", "goblin_1", condition="stunned", source="Theron"), turns=1, ends=END)
+    combat.damage("troll", 20)
+    print(combat.to_context())
+    for _ in range(4):
+        turn = combat.next_turn()
+        print(f"round {turn.round}: {turn.combatant.name} "
+              f"expired={[e.name for e in turn.expired]} ticks={[(e.name, n) for e, n in turn.ticks]}")
+    assert "stunned" not in combat.combatants["goblin_1"].conditions
+    assert combat.combatants["troll"].hp == 84
+
+    # Hundreds of combatants and thousands of effects: each turn only touches what is due
+    def naive_turn(effects: List[List]):
+        """The alternative: walk every effect on every turn and count its duration down"""
+        for entry in effects:
+            entry[1] -= 1
+        effects[:] = [entry for entry in effects if entry[1] > 0]
+
+    for n_combatants, n_effects in ((100, 1000), (500, 5000), (1000, 20000)):
+        combat = Combat()
+        for i in range(n_combatants):
+            combat.add(Combatant(f"c{i}", f"Creature {i}", hp=50, dex=random.randint(6, 18)))
+        combat.start()
+        for i in range(n_effects):
+            target = f"c{random.randrange(n_combatants)}"
+            if i % 10 == 0:
+                combat.apply(Effect("Regeneration", target, tick=1), turns=random.randint(1, 10))
+            else:
+                combat.apply(Effect("Hexed", target, condition="hexed"), turns=random.randint(1, 100))
+        turns = 5 * n_combatants
+        start = time.perf_counter()
+        for _ in range(turns):
+            combat.next_turn()
+        heap_us = (time.perf_counter() - start) / turns * 1e6
+
+        naive = [[i, random.randint(1, 100) * n_combatants] for i in range(n_effects)]
+        start = time.perf_counter()
+        for _ in range(min(turns, 500)):
+            naive_turn(naive)
+        naive_us = (time.perf_counter() - start) / min(turns, 500) * 1e6
+        print(f"{n_combatants:>5} combatants, {n_effects:>6} effects: "
+              f"{heap_us:6.1f} us/turn (heap) vs {naive_us:8.1f} us/turn (scan all effects)")
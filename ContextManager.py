@@ -1,46 +1,142 @@
 # ============================================================================
 # CONTEXT MANAGER: Validates Actions Against Game State
 # ============================================================================
+from array import array
 from collections import defaultdict
-from typing import Dict, List
-from IntentAnalyzer import INTENT_DEFINITIONS
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from IntentAnalyzer import INTENT_DEFINITIONS, intent_definitions
+
+VALID_CONTEXTS = ("battle", "exploration", "dialogue")
+
+# SceneType value -> game context (anything else is exploration)
+SCENE_CONTEXTS = {"combat": "battle", "dialogue": "dialogue"}
+
+
+def context_for_scene_type(scene_type: str) -> str:
+    """Game context implied by a SceneType value."""
+    return SCENE_CONTEXTS.get(scene_type, "exploration")
+
+# ============================================================================
+# PRECOMPILED RULE TABLES: Built once at load, shared read-only by sessions
+# ============================================================================
+
+@dataclass(frozen=True)
+class ContextRules:
+    """Intent rules flattened into lookup tables"""
+    intent_ids: Dict[str, int]                       # intent -> slot in max_per_turn
+    max_per_turn: array                              # flat per-intent turn limits
+    context_intents: Dict[str, FrozenSet[str]]       # context -> allowed intents
+    context_intent_lists: Dict[str, Tuple[str, ...]] # same, in definition order
+
+    @classmethod
+    def compile(cls, definitions: Dict[str, Dict]) -> "ContextRules":
+        intent_ids = {intent: i for i, intent in enumerate(definitions)}
+        max_per_turn = array('H', (data.get("max_per_turn", 1) for data in definitions.values()))
+
+        by_context = defaultdict(list)
+        for intent, data in definitions.items():
+            for context in data["contexts"]:
+                by_context[context].append(intent)
+
+        return cls(
+            intent_ids=intent_ids,
+            max_per_turn=max_per_turn,
+            context_intents={ctx: frozenset(intents) for ctx, intents in by_context.items()},
+            context_intent_lists={ctx: tuple(intents) for ctx, intents in by_context.items()},
+        )
+
+    def limit(self, intent: str) -> int:
+        slot = self.intent_ids.get(intent)
+        return 1 if slot is None else self.max_per_turn[slot]
+
+
+RULES = ContextRules.compile(INTENT_DEFINITIONS)  # rules/intents.json as loaded at import
+_NO_INTENTS: FrozenSet[str] = frozenset()
+_compiled = (INTENT_DEFINITIONS, RULES)
+
+
+def current_rules() -> ContextRules:
+    """ContextRules for the current rule tables; recompiled only after a rule reload"""
+    global _compiled
+    definitions = intent_definitions()
+    if definitions is not _compiled[0]:
+        _compiled = (definitions, ContextRules.compile(definitions))
+    return _compiled[1]
+
 
 class ContextManager:
-    def __init__(self, initial_context: str = "exploration"):
+    """Per-session game context and per-turn action counters"""
+
+    def __init__(self, initial_context: str = "exploration", rules: Optional[ContextRules] = None):
+        self._rules = rules  # None: follow the current (hot-reloaded) rule tables
+        self._active = rules or current_rules()
         self.current_context = initial_context
-        self.action_history = defaultdict(int)  # Track actions this turn
-        self.valid_contexts = ["battle", "exploration", "dialogue"]
-    
+        self.valid_contexts = list(VALID_CONTEXTS)
+        self._counts = array('H', bytes(2 * len(self._active.max_per_turn)))  # Track actions this turn
+
+    @property
+    def rules(self) -> ContextRules:
+        rules = self._rules or current_rules()
+        if rules is not self._active:
+            self._sync(rules)
+        return rules
+
+    def _sync(self, rules: ContextRules):
+        """Carry this turn's counts over to reloaded rules, by intent name"""
+        counts = array('H', bytes(2 * len(rules.max_per_turn)))
+        for intent, slot in self._active.intent_ids.items():
+            new_slot = rules.intent_ids.get(intent)
+            if new_slot is not None:
+                counts[new_slot] = self._counts[slot]
+        self._counts, self._active = counts, rules
+
+    @property
+    def action_history(self) -> Dict[str, int]:
+        """Actions recorded this turn, by intent"""
+        return {intent: self._counts[slot] for intent, slot in self.rules.intent_ids.items() if self._counts[slot]}
+
     def set_context(self, new_context: str) -> bool:
         """Set game context and reset action history."""
         if new_context in self.valid_contexts:
             self.current_context = new_context
-            self.action_history.clear()
+            self.reset_turn()
             return True
         return False
-    
+
     def get_allowed_intents(self) -> List[str]:
         """Return intents allowed in current context."""
-        allowed = []
-        for intent, data in INTENT_DEFINITIONS.items():
-            if self.current_context in data["contexts"]:
-                allowed.append(intent)
-        return allowed
-    
+        return list(self.rules.context_intent_lists.get(self.current_context, ()))
+
+    def is_allowed(self, intent: str) -> bool:
+        """Constant-time check that an intent is allowed in the current context."""
+        return intent in self.rules.context_intents.get(self.current_context, _NO_INTENTS)
+
     def record_action(self, intent: str) -> bool:
         """Record action attempt. Returns True if within limits, False if exceeded."""
-        if intent == "unclear":
-            return False
-        
-        max_allowed = INTENT_DEFINITIONS.get(intent, {}).get("max_per_turn", 1)
-        current_count = self.action_history[intent]
-        
-        if current_count < max_allowed:
-            self.action_history[intent] += 1
-            return True
-        
-        return False
-    
+        return self.record_actions([intent]) is None
+
+    def record_actions(self, intents: Iterable[str]) -> Optional[str]:
+        """
+        Record several actions at once, all or nothing.
+        Returns None if every action is within limits, otherwise the first intent over its limit.
+        """
+        needed = {}
+        for intent in intents:
+            if intent == "unclear":
+                return intent
+            needed[intent] = needed.get(intent, 0) + 1
+
+        slots = self.rules.intent_ids
+        for intent, count in needed.items():
+            slot = slots.get(intent)
+            if slot is None or self._counts[slot] + count > self.rules.max_per_turn[slot]:
+                return intent
+
+        for intent, count in needed.items():
+            self._counts[slots[intent]] += count
+        return None
+
     def reset_turn(self):
         """Reset action history for new turn."""
-        self.action_history.clear()
+        self._counts = array('H', bytes(2 * len(self.rules.max_per_turn)))
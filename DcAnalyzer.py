@@ -1,6 +1,8 @@
 from typing import Tuple
 from enum import IntEnum
 
+from RuleTables import current as rule_tables
+
 class DifficultyLevel(IntEnum):
     VERY_EASY = 5
     EASY = 10
@@ -22,69 +24,12 @@ class DCAnalyzer:
         'nearly_impossible': DifficultyLevel.NEARLY_IMPOSSIBLE,
     }
     
-    # Difficulty modifiers by environment/condition
-    ENVIRONMENT_MODIFIERS = {
-        'dark': 5,
-        'wet': 3,
-        'icy': 5,
-        'slick': 4,
-        'storm': 5,
-        'fog': 3,
-        'underground': 2,
-        'shallow': -3,
-        'calm': -2,
-        'ideal': -3,
-        'perfect': -4,
-    }
-    
-    # Task complexity keywords
-    TASK_KEYWORDS = {
-        'climb': {'base': 'moderate', 'skill': 'Athletics'},
-        'swim': {'base': 'moderate', 'skill': 'Athletics'},
-        'jump': {'base': 'easy', 'skill': 'Athletics'},
-        'persuade': {'base': 'moderate', 'skill': 'Persuasion'},
-        'deceive': {'base': 'moderate', 'skill': 'Deception'},
-        'sneak': {'base': 'moderate', 'skill': 'Stealth'},
-        'hide': {'base': 'moderate', 'skill': 'Stealth'},
-        'pick': {'base': 'moderate', 'skill': 'Sleight of Hand'},
-        'lock': {'base': 'hard', 'skill': 'Lockpicking'},
-        'trap': {'base': 'hard', 'skill': 'Investigation'},
-        'magic': {'base': 'hard', 'skill': 'Arcana'},
-        'ancient': {'base': 'hard', 'skill': 'History'},
-        'arcane': {'base': 'hard', 'skill': 'Arcana'},
-        'identify': {'base': 'moderate', 'skill': 'Investigation'},
-        'track': {'base': 'hard', 'skill': 'Survival'},
-        'recall': {'base': 'easy', 'skill': 'Knowledge'},
-    }
-    
-    # Intensity modifiers
-    INTENSITY_KEYWORDS = {
-        'trivial': -5,
-        'simple': -3,
-        'basic': -2,
-        'challenging': 3,
-        'difficult': 5,
-        'very difficult': 8,
-        'extremely': 7,
-        'nearly impossible': 10,
-        'masterwork': 4,
-        'ornate': 3,
-        'intricate': 5,
-        'elaborate': 4,
-    }
-    
-    # Danger/consequence keywords
-    CONSEQUENCE_KEYWORDS = {
-        'deadly': 8,
-        'lethal': 8,
-        'dangerous': 5,
-        'risky': 3,
-        'fail': 2,
-        'fall': 4,
-        'combat': 3,
-        'guarded': 4,
-        'watched': 3,
-    }
+    # Keyword tables from rules/dc.json, as loaded at import (suggest_dc() reads the current rules)
+    _RULES = rule_tables().dc
+    TASK_KEYWORDS = _RULES['task']                  # keyword -> {'base', 'skill'}
+    ENVIRONMENT_MODIFIERS = _RULES['environment']   # condition -> modifier
+    INTENSITY_KEYWORDS = _RULES['intensity']
+    CONSEQUENCE_KEYWORDS = _RULES['consequence']    # danger/consequence -> modifier
     
     @staticmethod
     def suggest_dc(text: str) -> Tuple[int, str]:
@@ -100,38 +45,38 @@ class DCAnalyzer:
         if not text or not isinstance(text, str):
             return DifficultyLevel.MODERATE, "No input provided; assuming moderate task."
         
-        t = text.lower()
+        rules = rule_tables()
+        tables = rules.dc
+        # Misspelled keywords are only corrected when no task keyword is written as such
+        hits = rules.scan_for(text.lower(), 'dc.task')
         base_dc = DifficultyLevel.MODERATE
         modifiers = []
         identified_skill = None
         
-        # Step 1: Identify task type from keywords
-        for keyword, task_info in DCAnalyzer.TASK_KEYWORDS.items():
-            if keyword in t:
-                base_dc = DCAnalyzer.BASE_DCS[task_info['base']]
-                identified_skill = task_info['skill']
-                modifiers.append(f"Task type: {keyword} ({task_info['skill']}) → base DC {base_dc}")
-                break
+        # Step 1: Identify task type from keywords (first in table order)
+        for keyword in rules.present(hits, 'dc.task')[:1]:
+            task_info = tables['task'][keyword]
+            base_dc = DCAnalyzer.BASE_DCS[task_info['base']]
+            identified_skill = task_info['skill']
+            modifiers.append(f"Task type: {keyword} ({task_info['skill']}) → base DC {base_dc}")
         
         # Step 2: Check environment/condition modifiers
-        for condition, modifier in DCAnalyzer.ENVIRONMENT_MODIFIERS.items():
-            if condition in t:
-                modifiers.append(f"Environment: {condition} ({modifier:+d})")
-                base_dc += modifier
+        for condition in rules.present(hits, 'dc.environment'):
+            modifier = tables['environment'][condition]
+            modifiers.append(f"Environment: {condition} ({modifier:+d})")
+            base_dc += modifier
         
         # Step 3: Check intensity modifiers
-        for intensity, modifier in DCAnalyzer.INTENSITY_KEYWORDS.items():
-            if intensity in t:
-                modifiers.append(f"Intensity: {intensity} ({modifier:+d})")
-                base_dc += modifier
-                break  # Use first matched intensity
+        for intensity in rules.present(hits, 'dc.intensity')[:1]:  # Use first matched intensity
+            modifier = tables['intensity'][intensity]
+            modifiers.append(f"Intensity: {intensity} ({modifier:+d})")
+            base_dc += modifier
         
         # Step 4: Check consequence modifiers
-        for consequence, modifier in DCAnalyzer.CONSEQUENCE_KEYWORDS.items():
-            if consequence in t:
-                modifiers.append(f"Consequence: {consequence} ({modifier:+d})")
-                base_dc += modifier
-                break  # Use first matched consequence
+        for consequence in rules.present(hits, 'dc.consequence')[:1]:  # Use first matched consequence
+            modifier = tables['consequence'][consequence]
+            modifiers.append(f"Consequence: {consequence} ({modifier:+d})")
+            base_dc += modifier
         
         # Step 5: Clamp DC to valid range
         final_dc = max(5, min(base_dc, 30))
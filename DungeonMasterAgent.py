@@ -1,28 +1,95 @@
-from typing import Optional, Tuple
-from langchain.chat_models import ChatOpenAI
-from langchain_openai import ChatOpenAI
+import atexit
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
 from langchain.memory import ConversationBufferMemory
 from langchain.schema import SystemMessage, HumanMessage
 
-from ToneAnalyzer import ToneAnalyzer, ToneType
+from ToneAnalyzer import ToneAnalyzer, ToneTracker, ToneType
+from ActionAnalysis import ActionAnalysis, analyze
 from CampaignState import CampaignState
-from SceneManager import SceneManager
+from SceneManager import Scene, SceneManager, SceneType
+from Player import Character
+from Party import PartyMember
 import dice
-from tts import TTS
-
-
-
+from TokenCounter import TokenCounter, PromptSection, SessionUsage, fit_sections, TOKENS_PER_MESSAGE
+from Speculator import RollSpeculator
+from CampaignTemplate import CompiledTemplate, TemplateLibrary
+from TranscriptStore import TranscriptStore
+from PartyActions import PartyDirector, PartyTurn
+from LLMGateway import LLMGateway
+from LLMScheduler import PLAYER_BLOCKING, LLMScheduler, priority_of
+from ClientRegistry import ClientRegistry, default_registry
+from ModelRouter import ModelRouter, build_router
+from RollClassifier import DecisionLog, RollClassifier
+from MemoryProfiler import MemoryProfiler
+from TurnAnalytics import TurnAnalytics
+from NpcRegistry import Npc
+
+logger = logging.getLogger(__name__)
 
 
 class DungeonMasterAgent:
     """Main LangChain agent that orchestrates the game"""
+
+    # (priority, required) for CampaignState.context_sections(); higher priority is trimmed last
+    SECTION_PRIORITIES = {
+        'campaign': (90, True),
+        'character': (85, True),
+        'players': (78, False),  # MultiplayerState
+        'combat': (80, False),  # Initiative order, HP and conditions while a fight is on
+        'battle_map': (70, False),  # Positions and walking distances on the scene's grid
+        'scene': (75, False),
+        'npcs': (60, False),
+        'progress': (45, False),
+        'party': (40, False),
+        'backstory': (30, False),
+        'tone': (5, False),  # Duplicated by the tone adaptation section
+    }
     
-    def __init__(self, openai_api_key: str, model: str = "gpt-3.5-turbo", tts_enabled: bool = True):
-        self.llm = ChatOpenAI(
+    def __init__(self, openai_api_key: str, model: str = "gpt-3.5-turbo", tts_enabled: bool = True,
+                 token_budget: Optional[int] = None, speculate_rolls: bool = False,
+                 speculation_token_budget: Optional[int] = None, speculation_workers: int = 2,
+                 templates: Optional[TemplateLibrary] = None, transcript_dir: Optional[str] = None,
+                 gateway: Optional[LLMGateway] = None, registry: Optional[ClientRegistry] = None,
+                 openai_base_url: Optional[str] = None, mechanics_model: Optional[str] = None,
+                 router: Optional[ModelRouter] = None, roll_classifier: Optional[RollClassifier] = None,
+                 decision_log: Optional[str] = None, profiler: Optional[MemoryProfiler] = None,
+                 analytics: Optional[TurnAnalytics] = None, scheduler: Optional[LLMScheduler] = None):
+        # Clients, connection pool, TTS engine and templates are shared process-wide;
+        # only the conversation memory below belongs to this agent
+        self.registry = registry or default_registry()
+        self.llm = self.registry.chat_model(
+            openai_api_key,
+            model,
             temperature=0.8,  # Creative but consistent
-            model=model,
-            openai_api_key=openai_api_key
+            base_url=openai_base_url
+        )
+        # Every call goes through the gateway: rate limiting, timeouts, retries, circuit breaker
+        self.gateway = gateway or self.registry.gateway(openai_api_key, model, 0.8, openai_base_url)
+        # Model calls from every session share one scheduler: player-blocking work first,
+        # fair share per campaign, stale speculative/background work shed
+        self.scheduler = scheduler or self.registry.scheduler()
+        # Mechanics (roll checks, consequences) can run on a cheaper model, with the
+        # local heuristics as the last resort for roll checks; narration stays on `model`
+        self.router = router or build_router(
+            narrative=self.gateway,
+            mechanics=self.registry.gateway(openai_api_key, mechanics_model or model, 0.8, openai_base_url),
+            classifier=roll_classifier,
+            scheduler=self.scheduler
         )
+        # LLM roll-check decisions, kept as training data for RollClassifier
+        self.decision_log = DecisionLog(decision_log) if decision_log else None
+        # Opt-in: tracemalloc snapshots and per-component sizes every few turns
+        self.profiler = profiler
+        if profiler is not None:
+            # Trace from the start, so the first sample covers the session's first turns
+            profiler.start()
+        # Opt-in: one columnar row per turn (intent, check, roll, tone, latency, tokens)
+        self.analytics = analytics
 
         # Initialize memory to keep track of conversation
         self.memory = ConversationBufferMemory(
@@ -31,11 +98,40 @@ class DungeonMasterAgent:
         )
         
         self.tone_analyzer = ToneAnalyzer()
+        self.tone_tracker = ToneTracker()
         self.scene_manager = SceneManager()
-        self.tts = TTS() if tts_enabled else None
+        self.party_director = PartyDirector()
+        self.last_party_turn: Optional[PartyTurn] = None
+        self.last_analysis: Optional[ActionAnalysis] = None
+        self.mentioned_npcs: List[Npc] = []  # NPCs the current input refers to; their dossiers go in the prompt
+        self.campaign_id: Optional[str] = None  # Fair-share key for scheduled calls
+        self.templates = templates or self.registry.templates()
+        self.template: Optional[CompiledTemplate] = None
+
+        # Append-only transcript of every turn, one store per campaign
+        self.transcript_dir = transcript_dir
+        self.transcript: Optional[TranscriptStore] = None
+        self._turn_roll: Optional[dict] = None
+        self.tts = self.registry.tts() if tts_enabled else None
+
+        # Token accounting: every prompt is counted and fitted to the per-turn budget
+        self.token_counter = TokenCounter(model)
+        self.token_budget = token_budget
+        self.usage = SessionUsage()
+
+        # Pre-generate both roll outcomes while a check is pending
+        self.speculator = None
+        if speculate_rolls:
+            self.speculator = RollSpeculator(
+                generate=lambda messages: self._call_llm(messages, 'speculation'),
+                counter=self.token_counter,
+                max_workers=speculation_workers,
+                token_budget=speculation_token_budget,
+                accepting=lambda: self.scheduler.accepting('speculation'),
+            )
         
-    def create_system_prompt(self, state: CampaignState) -> str:
-        """Generate dynamic system prompt based on campaign state"""
+    def system_prompt_sections(self, state: CampaignState) -> List[PromptSection]:
+        """Build the system prompt as prioritized sections (trimmed lowest priority first)"""
         
         tone_instructions = {
             ToneType.SERIOUS: "Use formal, dramatic language. Be descriptive and weighty.",
@@ -44,186 +140,348 @@ class DungeonMasterAgent:
             ToneType.DRAMATIC: "Use epic, sweeping language. Emphasize stakes and grandeur.",
             ToneType.NEUTRAL: "Use balanced, clear language. Adapt to player cues."
         }
-        
-        return f"""You are an expert Dungeon Master running a D&D 5e campaign. 
 
-{state.to_context()}
+        sections = [PromptSection('preamble', "You are an expert Dungeon Master running a D&D 5e campaign.",
+                                  priority=100, required=True)]
+        for name, text in state.context_sections():
+            sections.append(PromptSection(name, text, *self.SECTION_PRIORITIES.get(name, (50, False))))
+        if self.mentioned_npcs:
+            sections.append(PromptSection('npc_dossiers', state.npcs.dossiers(self.mentioned_npcs, state.scenes),
+                                          priority=62))
 
-=== YOUR ROLE ===
+        sections += [
+            PromptSection('role', """=== YOUR ROLE ===
 - Guide the story dynamically based on player choices
 - Maintain consistency with established lore and decisions
 - Create engaging NPCs with distinct personalities
 - Balance challenge with fun
 - ALWAYS respond to player actions with narrative consequences
-- Use the pre-defined campaign structure but allow procedural branching
-
-=== TONE ADAPTATION ===
+- Use the pre-defined campaign structure but allow procedural branching""", priority=20),
+            PromptSection('tone_rules', f"""=== TONE ADAPTATION ===
 Player's current tone: {state.player_tone}
-{tone_instructions[state.player_tone]}
-
-=== IMPORTANT RULES ===
+{tone_instructions[state.player_tone]}""", priority=95, required=True),
+            PromptSection('rules', """=== IMPORTANT RULES ===
 1. NEVER control the player character's actions - only describe consequences
 2. When combat occurs, ask for player's action before resolving
 3. Track resources (HP, spell slots, items) implicitly
 4. Weave in character backstory when relevant
 5. Party members should occasionally contribute to conversations
 6. End responses with a clear prompt for player action
-7. Keep responses under 300 words unless describing a major scene
-
-=== SCENE GENERATION ===
+7. Keep responses under 300 words unless describing a major scene""", priority=65),
+            PromptSection('scene_generation', """=== SCENE GENERATION ===
 When describing new locations or major events, include vivid sensory details.
-These moments may trigger cinematic video generation.
+These moments may trigger cinematic video generation.""", priority=10),
+            PromptSection('closing', "Continue the adventure based on the player's input.",
+                          priority=100, required=True),
+        ]
+        return sections
+
+    def create_system_prompt(self, state: CampaignState, budget: Optional[int] = None) -> str:
+        """Generate dynamic system prompt based on campaign state"""
+        prompt, trimmed = fit_sections(self.system_prompt_sections(state), budget, self.token_counter)
+        self.usage.record_trim(trimmed)
+        return prompt
+
+    def _build_messages(self, state: CampaignState, human_content: str) -> List:
+        """SystemMessage + HumanMessage pair, with the system prompt fitted to the token budget"""
+        budget = None
+        if self.token_budget is not None:
+            human_tokens = self.token_counter.count_messages([HumanMessage(content=human_content)])
+            budget = max(self.token_budget - human_tokens - TOKENS_PER_MESSAGE, 0)
+        return [
+            SystemMessage(content=self.create_system_prompt(state, budget)),
+            HumanMessage(content=human_content)
+        ]
+
+    def _call_llm(self, messages: List, call_type: str, payload: Optional[str] = None,
+                  campaign: Optional[str] = None):
+        """Single LLM call site: counts tokens and latency for every request.
+
+        Raises LLMShed when the scheduler drops optional (speculative/background) work.
+        """
+        prompt_tokens = self.token_counter.count_messages(messages)
+        start = time.perf_counter()
+        # payload is the raw input local tiers classify (see ModelRouter)
+        response = self.router(call_type, messages, payload, campaign=campaign or self.campaign_id)
+        elapsed = time.perf_counter() - start
+        # Speculative/background calls are not part of the turn that happens to be running
+        self.usage.record_call(call_type, prompt_tokens, self.token_counter.count(response.content), elapsed,
+                               in_turn=priority_of(call_type) == PLAYER_BLOCKING)
+        return response
+
+    def start_campaign(self, campaign_name: str, player_character: Character,
+                       party_members: List[PartyMember]) -> Tuple[CampaignState, str]:
+        """Create the campaign state and opening narration.
+
+        Campaigns with a compiled template start from its pre-rendered opening and scene
+        without an LLM call; anything else gets a generated opening.
+        """
+        self.template = self.templates.find(campaign_name)
+        if self.template is not None:
+            opening_scene = self.template.start_scene()
+        else:
+            opening_scene = Scene(
+                id="scene_0",
+                title=campaign_name,
+                description=f"The opening of {campaign_name}.",
+                scene_type=SceneType.EXPLORATION,
+                location="Unknown"
+            )
+            opening_scene.generate_sora_prompt()
+
+        state = CampaignState(
+            campaign_id=f"campaign_{uuid.uuid4().hex[:12]}",
+            campaign_name=campaign_name,
+            current_scene=opening_scene,
+            player_character=player_character,
+            party_members=party_members
+        )
+        self.campaign_id = state.campaign_id
+
+        if self.template is not None:
+            # The template's cast, indexed so "the scarred bandit" resolves before the party meets him
+            state.npcs.meet_cast(self.template.npcs())
+            opening = self.template.opening(
+                name=player_character.name,
+                race=player_character.race,
+                char_class=player_character.char_class
+            )
+        else:
+            messages = self._build_messages(state, (
+                "Begin the campaign. Introduce the setting, the hook for the adventure and the "
+                "party, then ask the player what they do."))
+            opening = self._call_llm(messages, 'narration').content
+
+        self.memory.chat_memory.add_ai_message(opening)
+        self._record_transcript(state, "", opening)
+
+        # Speak if TTS enabled
+        if getattr(self, 'tts', None):
+            try:
+                self.tts.speak(opening)
+            except Exception:
+                pass
 
-Continue the adventure based on the player's input."""
+        return state, opening
+
+    def _transcript_for(self, state: CampaignState) -> Optional[TranscriptStore]:
+        if self.transcript_dir is None:
+            return None
+        path = os.path.join(self.transcript_dir, state.campaign_id)
+        if self.transcript is None or self.transcript.path != path:
+            self._close_transcript()
+            self.transcript = TranscriptStore(path)
+            # Turns are buffered into blocks; make sure a session that ends without close() keeps them
+            atexit.register(self.transcript.close)
+        return self.transcript
+
+    def _close_transcript(self):
+        if self.transcript is not None:
+            atexit.unregister(self.transcript.close)
+            self.transcript.close()
+            self.transcript = None
+
+    def close(self):
+        """Write out buffered transcript and analytics rows; call when the session ends"""
+        self._close_transcript()
+        if self.analytics is not None:
+            self.analytics.flush()
+        if self.speculator is not None:
+            self.speculator.shutdown()
+
+    def _record_transcript(self, state: CampaignState, player_input: str, dm_response: str,
+                           new_scene: bool = False):
+        """Append the turn (input, response, roll, scene) to the campaign transcript"""
+        transcript = self._transcript_for(state)
+        if transcript is None:
+            return
+        scene = state.current_scene
+        transcript.append({
+            'turn': state.turn_count,
+            'input': player_input,
+            'response': dm_response,
+            'roll': self._turn_roll,
+            'pending_check': state.pending_check,
+            'scene': {'id': scene.id, 'title': scene.title, 'location': scene.location},
+            'new_scene': new_scene,
+            'sora_prompt': scene.sora_prompt if new_scene else None,
+            'tone': state.player_tone.value,
+            'timestamp': datetime.now().isoformat(),
+        })
+
+    def _log_decision(self, player_input: str, roll_info: dict, check_response, state: CampaignState):
+        """Keep LLM roll decisions as classifier training data; a logging failure never affects the turn"""
+        if (self.decision_log is None or getattr(check_response, 'local', False)
+                or getattr(check_response, 'fallback', False)):
+            return
+        try:
+            self.decision_log.record(player_input, roll_info, state.current_scene.scene_type.value)
+        except Exception:
+            logger.exception("Could not record roll decision")
+
+    def _record_analytics(self, state: CampaignState, new_scene: bool):
+        """Append this turn to the columnar analytics store"""
+        analysis, roll, usage = self.last_analysis, self._turn_roll, self.usage.last_turn
+        pending = state.pending_check
+        requested = pending is not None and pending['turn'] == state.turn_count and roll is None
+        check = roll or (pending if requested else None) or {}
+        seconds = usage.seconds_by_type if usage is not None else {}
+        self.analytics.append({
+            'campaign': state.campaign_id,
+            'turn': state.turn_count,
+            'timestamp': time.time(),
+            # A resolved roll is attributed to the action that asked for it, not to "roll"
+            'intent': check.get('intent') or analysis.intent,
+            'ability': check.get('ability'),
+            'suggested_dc': analysis.dc,
+            'dc': check.get('dc'),
+            'check_requested': None if roll is not None else int(requested),  # unset on roll turns
+            'roll': check.get('roll'),
+            'modifier': check.get('modifier'),
+            'success': None if roll is None else int(roll['success']),
+            'critical': None if roll is None else int(roll['critical']),
+            'tone': state.player_tone.value,
+            'new_scene': int(new_scene),
+            'wall_seconds': usage.wall_seconds if usage is not None else None,
+            'llm_seconds': usage.llm_seconds if usage is not None else None,
+            'roll_check_seconds': seconds.get('roll_check', 0.0),
+            'narration_seconds': seconds.get('narration', 0.0),
+            'consequence_seconds': seconds.get('consequence', 0.0),
+            'llm_calls': usage.calls if usage is not None else None,
+            'prompt_tokens': usage.prompt_tokens if usage is not None else None,
+            'completion_tokens': usage.completion_tokens if usage is not None else None,
+        })
 
     def _analyze_player_tone(self, player_input: str, state: CampaignState) -> str:
-        """Analyze player tone"""
-        new_tone = self.tone_analyzer.analyze(player_input)
+        """Analyze player tone (decayed over the conversation, so single lines don't flip it)"""
+        new_tone = self.tone_tracker.update(state.tone_state, player_input, analyze(player_input).tone_scores)
         if new_tone != state.player_tone:
             state.player_tone = new_tone
         return new_tone
 
+    @staticmethod
+    def _consequence_request(pending: dict, outcome: str) -> str:
+        return (f"Resolve the pending action: {pending['action']}. "
+                f"Mechanical result: {outcome}. "
+                "Return a short narrative consequence and any state changes.")
+
+    @staticmethod
+    def _speculation_key(state: CampaignState, pending: dict) -> Tuple:
+        return (state.campaign_id, pending['turn'], pending['action'])
+
+    def _speculate_pending(self, state: CampaignState):
+        """Start generating the success and failure narratives for the pending check"""
+        if self.speculator is None or state.pending_check is None:
+            return
+        pending = state.pending_check
+        branches = {
+            success: self._build_messages(state, self._consequence_request(
+                pending, f"DC={pending.get('dc', 10)}, success={success}"))
+            for success in (True, False)
+        }
+        self.speculator.speculate(self._speculation_key(state, pending), branches)
+
     def _process_pending_check(self, player_input: str, state: CampaignState) -> Tuple[str, bool, Optional[str]]:
         """Process a pending mechanical check"""
-        if state.pending_check is not None:
-            if player_input.strip().lower().startswith('roll'):
-                # Resolve the pending check using player's ability score
-                pending = state.pending_check
-                ability = pending.get('ability', 'str')
-                dc = pending.get('dc', 10)
-
-                # Map ability shorthand to player's stat (default to str)
-                stat_map = {
-                    'str': 'str', 'dex': 'dex', 'con': 'con',
-                    'int': 'int', 'wis': 'wis', 'cha': 'cha'
-                }
-                stat_key = stat_map.get(ability.lower(), 'str')
-                player_score = state.player_character.stats.get(stat_key, 10)
-
-                # Optional: allow "roll 15" to force a roll (for testing)
-                parts = player_input.strip().split()
-                roll_override = None
-                if len(parts) > 1 and parts[1].isdigit():
-                    roll_override = int(parts[1])
-
-                roll, mod, success, critical = dice.resolve_check(player_score, dc, roll_override)
-
-                # Build a small narrative result for the player
-                result_text = f"You rolled a {roll} + {mod} = {roll + mod} (DC {dc})."
-                if critical:
-                    result_text += " Critical success!" if roll == 20 else ""
-                elif roll == 1:
-                    result_text += " Critical failure!"
-
-                result_text += "\n"
-
-                # Ask the LLM to describe the consequence briefly, passing the mechanical result
-                system_prompt = self.create_system_prompt(state)
-                messages = [
-                    SystemMessage(content=system_prompt),
-                    HumanMessage(content=(f"Resolve the pending action: {pending['action']}. "
-                                               f"Mechanical result: roll={roll}, modifier={mod}, total={roll+mod}, "
-                                               f"DC={dc}, success={success}, critical={critical}. "
-                                               "Return a short narrative consequence and any state changes."))
-                ]
-
-                response = self.llm(messages)
-                dm_response = result_text + "\n" + response.content
-
-                # Clear pending check
-                state.clear_pending_check()
-                # Speak the DM response if TTS enabled
-                if getattr(self, 'tts', None):
-                    try:
-                        self.tts.speak(dm_response)
-                    except Exception:
-                        pass
-
-            else:
-                # Prompt the player to type 'roll' to resolve the pending check
-                dm_response = ("A mechanical check is pending: please type 'roll' to resolve the action "
-                                   f"(pending: {state.pending_check['action']}, DC {state.pending_check['dc']}).")
-
-                # Update memory and return early (no scene generation)
-                self.memory.chat_memory.add_user_message(player_input)
-                self.memory.chat_memory.add_ai_message(dm_response)
-
-                return dm_response, False, None
+        if player_input.strip().lower().startswith('roll'):
+            # Resolve the pending check using player's ability score
+            pending = state.pending_check
+            ability = pending.get('ability', 'str')
+            dc = pending.get('dc', 10)
+
+            # Map ability shorthand to player's stat (default to str)
+            stat_map = {
+                'str': 'str', 'dex': 'dex', 'con': 'con',
+                'int': 'int', 'wis': 'wis', 'cha': 'cha'
+            }
+            stat_key = stat_map.get(ability.lower(), 'str')
+            player_score = state.player_character.stats.get(stat_key, 10)
+
+            # Optional: allow "roll 15" to force a roll (for testing)
+            parts = player_input.strip().split()
+            roll_override = None
+            if len(parts) > 1 and parts[1].isdigit():
+                roll_override = int(parts[1])
+
+            roll, mod, success, critical = dice.resolve_check(player_score, dc, roll_override)
+            self._turn_roll = {
+                'action': pending['action'], 'ability': stat_key, 'dc': dc,
+                'roll': roll, 'modifier': mod, 'success': success, 'critical': critical,
+                'intent': pending.get('intent'),
+            }
+
+            # Build a small narrative result for the player
+            result_text = f"You rolled a {roll} + {mod} = {roll + mod} (DC {dc})."
+            if critical:
+                result_text += " Critical success!" if roll == 20 else ""
+            elif roll == 1:
+                result_text += " Critical failure!"
+
+            result_text += "\n"
+
+            # Use the pre-generated branch if one matches, otherwise ask the LLM to describe
+            # the consequence briefly, passing the mechanical result
+            consequence = None
+            if self.speculator is not None:
+                key = self._speculation_key(state, pending)
+                if critical or roll == 1:
+                    # The branches only know success/failure; a crit or fumble gets its own narrative
+                    self.speculator.discard(key)
+                else:
+                    consequence = self.speculator.resolve(key, success)
+            if consequence is None:
+                messages = self._build_messages(state, self._consequence_request(
+                    pending, f"roll={roll}, modifier={mod}, total={roll+mod}, "
+                             f"DC={dc}, success={success}, critical={critical}"))
+                consequence = self._call_llm(messages, 'consequence').content
+            dm_response = result_text + "\n" + consequence
+
+            # Clear pending check
+            state.clear_pending_check()
 
         else:
-            # First, check if the player's action requires a roll
-            system_prompt = self.create_system_prompt(state)
-            
-            # Ask LLM to determine if a roll is needed
-            check_messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=(
-                    f"Player action: '{player_input}'\n\n"
-                    "Determine if this action requires a mechanical check (dice roll). "
-                    "Respond with ONLY a JSON object in this exact format:\n"
-                    '{"requires_roll": true/false, "ability": "str/dex/con/int/wis/cha", '
-                    '"dc": 10-20, "action_description": "brief description"}\n\n'
-                    "Require rolls for: risky physical actions, attempts to persuade/receive, "
-                    "difficult knowledge checks, perception checks in important situations, "
-                    "anything with meaningful chance of failure.\n"
-                    "Don't require rolls for: simple conversation, looking around casually, "
-                    "walking to obvious places, trivial actions."
-                ))
-            ]
-            
-            check_response = self.llm(check_messages)
-            check_content = check_response.content.strip()
-            
-            # Parse the response to determine if roll is needed
-            requires_roll = False
+            # Prompt the player to type 'roll' to resolve the pending check
+            dm_response = ("A mechanical check is pending: please type 'roll' to resolve the action "
+                               f"(pending: {state.pending_check['action']}, DC {state.pending_check['dc']}).")
+
+        # Update memory and return early (no scene generation)
+        self.memory.chat_memory.add_user_message(player_input)
+        self.memory.chat_memory.add_ai_message(dm_response)
+
+        # Speak the DM response if TTS enabled
+        if getattr(self, 'tts', None):
             try:
-                # Try to extract JSON from the response
-                import json
-                import re
-                
-                # Look for JSON object in the response
-                json_match = re.search(r'\{[^}]+\}', check_content)
-                if json_match:
-                    roll_info = json.loads(json_match.group())
-                    requires_roll = roll_info.get('requires_roll', False)
-                    
-                    if requires_roll:
-                        # Set up a pending check
-                        state.set_pending_check(
-                            action=roll_info.get('action_description', player_input),
-                            ability=roll_info.get('ability', 'str'),
-                            dc=roll_info.get('dc', 10)
-                        )
-                        
-                        dm_response = (
-                            f"You attempt to {roll_info.get('action_description', player_input)}.\n"
-                            f"This requires a {roll_info.get('ability', 'STR').upper()} check "
-                            f"(DC {roll_info.get('dc', 10)}).\n"
-                            "Type 'roll' to make your attempt!"
-                        )
-                        
-                        # Update memory and return
-                        self.memory.chat_memory.add_user_message(player_input)
-                        self.memory.chat_memory.add_ai_message(dm_response)
-                        
-                        # Speak if TTS enabled
-                        if getattr(self, 'tts', None):
-                            try:
-                                self.tts.speak(dm_response)
-                            except Exception:
-                                pass
-                         
-                        return dm_response, False, None
-                        
-            except (json.JSONDecodeError, ValueError) as e:
-                # If parsing fails, assume no roll needed and continue normally
-                print(f"Failed to parse roll check response: {e}")
-                requires_roll = False
+                self.tts.speak(dm_response)
+            except Exception:
+                pass
+
+        return dm_response, False, None
 
     def process_turn(self, player_input: str, state: CampaignState) -> Tuple[str, bool, Optional[str]]:
         """Process a single turn of gameplay"""
         state.turn_count += 1
-
+        self.campaign_id = state.campaign_id
+        self.usage.start_turn(state.turn_count)
+        self._turn_roll = None
+        # Built once here; tone, roll heuristics, classifier and party director all read it
+        self.last_analysis = analyze(player_input)
+        self.mentioned_npcs = [npc for npc, _ in state.npcs.resolve(player_input, scene=state.current_scene)]
+        start = time.perf_counter()
+        try:
+            result = self._run_turn(player_input, state)
+        finally:
+            self.usage.end_turn(time.perf_counter() - start)
+
+        dm_response, new_scene, _ = result
+        self._record_transcript(state, player_input, dm_response, new_scene)
+        if self.analytics is not None:
+            self._record_analytics(state, new_scene)
+        if self.profiler is not None:
+            self.profiler.on_turn(self, state)
+        return result
+
+    def _run_turn(self, player_input: str, state: CampaignState) -> Tuple[str, bool, Optional[str]]:
+        """Turn body: roll check, narration, scene detection"""
         # Analyze player tone
         new_tone = self._analyze_player_tone(player_input, state)
         
@@ -234,26 +492,21 @@ Continue the adventure based on the player's input."""
         
         else:
             # First, check if the player's action requires a roll
-            system_prompt = self.create_system_prompt(state)
-            
             # Ask LLM to determine if a roll is needed
-            check_messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=(
-                    f"Player action: '{player_input}'\n\n"
-                    "Determine if this action requires a mechanical check (dice roll). "
-                    "Respond with ONLY a JSON object in this exact format:\n"
-                    '{"requires_roll": true/false, "ability": "str/dex/con/int/wis/cha", '
-                    '"dc": 10-20, "action_description": "brief description"}\n\n'
-                    "Require rolls for: risky physical actions, attempts to persuade/receive, "
-                    "difficult knowledge checks, perception checks in important situations, "
-                    "anything with meaningful chance of failure.\n"
-                    "Don't require rolls for: simple conversation, looking around casually, "
-                    " walking to obvious places, trivial actions."
-                ))
-            ]
+            check_messages = self._build_messages(state, (
+                f"Player action: '{player_input}'\n\n"
+                "Determine if this action requires a mechanical check (dice roll). "
+                "Respond with ONLY a JSON object in this exact format:\n"
+                '{"requires_roll": true/false, "ability": "str/dex/con/int/wis/cha", '
+                '"dc": 10-20, "action_description": "brief description"}\n\n'
+                "Require rolls for: risky physical actions, attempts to persuade/receive, "
+                "difficult knowledge checks, perception checks in important situations, "
+                "anything with meaningful chance of failure.\n"
+                "Don't require rolls for: simple conversation, looking around casually, "
+                " walking to obvious places, trivial actions."
+            ))
             
-            check_response = self.llm(check_messages)
+            check_response = self._call_llm(check_messages, 'roll_check', payload=player_input)
             check_content = check_response.content.strip()
             
             # Parse the response to determine if roll is needed
@@ -268,14 +521,20 @@ Continue the adventure based on the player's input."""
                 if json_match:
                     roll_info = json.loads(json_match.group())
                     requires_roll = roll_info.get('requires_roll', False)
-                    
                     if requires_roll:
+                        # Models answer "15", "DC 15" or "15 (moderate)"; the roll needs a number
+                        roll_info['dc'] = dice.parse_dc(roll_info.get('dc'))
                         # Set up a pending check
                         state.set_pending_check(
                             action=roll_info.get('action_description', player_input),
                             ability=roll_info.get('ability', 'str'),
-                            dc=roll_info.get('dc', 10)
+                            dc=roll_info['dc'],
+                            intent=self.last_analysis.intent if self.last_analysis is not None else None
                         )
+                    self._log_decision(player_input, roll_info, check_response, state)
+
+                    if requires_roll:
+                        self._speculate_pending(state)
                         
                         dm_response = (
                             f"You attempt to {roll_info.get('action_description', player_input)}.\n"
@@ -302,26 +561,44 @@ Continue the adventure based on the player's input."""
                 print(f"Failed to parse roll check response: {e}")
                 requires_roll = False
 
+        # Follow a pre-authored template branch if the player picked one; its scene is pre-rendered
+        branch_scene = None
+        if self.template is not None:
+            branch = self.template.match_branch(state.current_scene.id, player_input)
+            if branch is not None:
+                if branch.beat:
+                    state.add_story_beat(branch.beat)
+                if branch.target_scene != state.current_scene.id:
+                    branch_scene = (state.scenes.get(branch.target_scene)
+                                    or self.template.get_scene(branch.target_scene))
+                    state.change_scene(branch_scene)
+
+        # Companions who act this turn speak in the same generation as the narration
+        acting = self.party_director.select(player_input, state)
+
         # If no roll needed, proceed with normal LLM response
-        messages = [
-            SystemMessage(content=self.create_system_prompt(state)),
-            HumanMessage(content=player_input)
-        ]
+        messages = self._build_messages(state, player_input + self.party_director.instructions(acting))
 
         # Get DM response
-        response = self.llm(messages)
-        dm_response = response.content
+        response = self._call_llm(messages, 'narration')
+        self.last_party_turn = self.party_director.parse(response.content, acting)
+        dm_response = self.last_party_turn.render()
 
         # Determine if new scene needed
-        should_generate = self.scene_manager.should_trigger_new_scene(
+        should_generate = branch_scene is not None or self.scene_manager.should_trigger_new_scene(
             dm_response,
             state
         )
 
         sora_prompt = None
-        if should_generate:
-            new_location = state.current_scene.location
-            new_scene = self.scene_manager.create_scene_from_narrative(dm_response, new_location)
+        if branch_scene is not None:
+            sora_prompt = branch_scene.sora_prompt
+        elif should_generate:
+            # Back somewhere already described: reuse its description, fields and Sora prompt
+            new_scene = self.scene_manager.revisit_scene(dm_response, state)
+            if new_scene is None:
+                new_location = state.current_scene.location
+                new_scene = self.scene_manager.create_scene_from_narrative(dm_response, new_location)
             state.change_scene(new_scene)
             sora_prompt = new_scene.sora_prompt
 
@@ -0,0 +1,253 @@
+"""Typo-tolerant lookup of rule keywords (SymSpell-style deletion index).
+
+"I attakc the goblin" or "serach the chest" contain no intent keyword, so
+detection says "unclear" and the turn falls back to the LLM or a clarifying
+question. The matcher maps such words onto the rule vocabulary (intent, tone
+and DC keywords); RuleSet.scan_for() uses it only when the text as written
+matches nothing in the table being looked up:
+
+  - at build time every vocabulary word is indexed under all its deletions up
+    to the edit distance allowed for its length
+  - a lookup generates the deletions of the input word and intersects them
+    with the index, so its cost depends on the word's length, not on the
+    vocabulary size; candidates are verified with optimal string alignment
+    distance (a swap of two neighbouring letters counts as one edit)
+  - candidates must share the input's first letter, and ties at the best
+    distance are left alone rather than guessed
+
+Only out-of-vocabulary words are rewritten: a word in the English word list
+("continue", "indicate", "listed"), in known_words (game terms the list lacks),
+shorter than min_length, or already containing a keyword is left alone. The word
+list comes from pyspellchecker (in requirements.txt); if it is missing, a warning
+is logged once and nothing is corrected, since keyword-shaped real words can't
+be told from typos. Jargon the list lacks can still be rewritten ("compat" reads
+as "combat"). Limits and known_words live in rules/fuzzy.json.
+
+Usage:
+    matcher = FuzzyMatcher(["attack", "search"], min_length=5)
+    matcher.lookup("attakc")                 # 'attack'
+    matcher.correct("serach the chest")      # 'search the chest'
+"""
+
+import logging
+import re
+from functools import lru_cache
+from typing import Callable, Container, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    from spellchecker import SpellChecker
+except ImportError:  # listed in requirements.txt; without a word list, typo correction is disabled
+    SpellChecker = None
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z]+")
+
+
+@lru_cache(maxsize=1)
+def english_words() -> Optional[Container[str]]:
+    """pyspellchecker's English frequency list (~160k words, loaded once), or None if not installed"""
+    if SpellChecker is None:
+        logger.warning("pyspellchecker is not installed: misspelled keywords will not be corrected")
+        return None
+    return SpellChecker(distance=1).word_frequency.dictionary
+
+
+def osa_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def deletions(word: str, distance: int) -> Set[str]:
+    """Every string reachable from word by deleting up to `distance` characters"""
+    found, frontier = set(), {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+class FuzzyMatcher:
+    """Deletion-neighbourhood index over a vocabulary of single words"""
+
+    def __init__(self, vocabulary: Iterable[str], min_length: int = 5,
+                 distances: Sequence[Tuple[int, int]] = ((5, 1), (8, 2)),
+                 known_words: Iterable[str] = (), same_first_letter: bool = True,
+                 dictionary: Optional[Container[str]] = None):
+        self.min_length = min_length
+        self.dictionary = dictionary if dictionary is not None else frozenset()   # real words, never corrected
+        self.same_first_letter = same_first_letter     # typos rarely hit the first letter; real words often differ there
+        self.distances = sorted(distances)                      # (from length, max edits)
+        self.vocabulary: Set[str] = {w for w in vocabulary if w.isalpha()}
+        self.known_words = frozenset(known_words) | self.vocabulary
+        # A word is indexed deep enough for the longest input allowed to reach it
+        widest = max((allowed for _, allowed in self.distances), default=0)
+        self._index: Dict[str, Tuple[str, ...]] = {}
+        for word in sorted(self.vocabulary):
+            for variant in deletions(word, self._max_edits(len(word) + widest)) | {word}:
+                self._index[variant] = self._index.get(variant, ()) + (word,)
+        self.lookup = lru_cache(maxsize=8192)(self._lookup)
+
+    def _max_edits(self, length: int) -> int:
+        edits = 0
+        for start, allowed in self.distances:
+            if length >= start:
+                edits = allowed
+        return edits
+
+    def _lookup(self, word: str) -> Optional[str]:
+        """The vocabulary word closest to word, or None if nothing (or more than one) is close"""
+        if word in self.vocabulary:
+            return word
+        if len(word) < self.min_length or word in self.known_words or word in self.dictionary:
+            return None
+        limit = self._max_edits(len(word))
+        candidates = set()
+        for variant in deletions(word, limit) | {word}:
+            candidates.update(self._index.get(variant, ()))
+        best, best_distance, tied = None, limit + 1, False
+        for candidate in candidates:
+            if self.same_first_letter and candidate[0] != word[0]:
+                continue
+            distance = osa_distance(word, candidate, limit)
+            if distance < best_distance:
+                best, best_distance, tied = candidate, distance, False
+            elif distance == best_distance:
+                tied = True
+        return None if tied else best
+
+    def correct(self, text: str, keep: Optional[Callable[[str], bool]] = None) -> str:
+        """text with misspelled words replaced by vocabulary words; keep(word) protects a word"""
+        def replace(match):
+            word = match.group()
+            if (word in self.known_words or len(word) < self.min_length or word in self.dictionary
+                    or (keep is not None and keep(word))):
+                return word
+            return self.lookup(word) or word
+        return _WORD.sub(replace, text)
+
+
+# Example usage / benchmark
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    from ActionAnalysis import ActionAnalysis
+    from RuleTables import current as rule_tables
+
+    rules = rule_tables()
+    matcher = rules.fuzzy
+    if matcher is None:
+        sys.exit("pyspellchecker is not installed: typo correction is disabled")
+    print(f"vocabulary {len(matcher.vocabulary)} words, index {len(matcher._index)} deletion keys")
+    for word in ("attakc", "serach", "perswade", "investgate", "intimdate", "clinb", "continue", "indicate", "goblin"):
+        print(f"  {word:>11} -> {matcher.lookup(word)}")
+
+    # Regression check: ordinary sentences should read exactly as without correction. A real
+    # English word is never rewritten; out-of-list jargon can be, and is reported as a false positive
+    ordinary = [
+        "I continue down the corridor", "I indicate the map to the guard", "The names listed on the door",
+        "My chars are all level three", "It runs in compat mode", "The gold is converted to silver",
+        "I wait for the others to catch up", "Lyra asks the innkeeper about the caravan",
+        "We follow the river north until nightfall", "I put the coins back in my purse",
+        "Grimble mutters something about the weather", "I stand guard while the others sleep",
+        "Can I buy some rations and a new cloak?", "I thank the merchant and leave the shop",
+        "The bridge looks old but sturdy enough", "We decide to camp near the ruined chapel",
+        "I hand the letter to the captain", "I tell the children a story about dragons",
+        "I eat my breakfast and check my equipment", "Theron prays quietly before the battle",
+        "I count the arrows left in my quiver", "I ride the horse towards the village",
+        "The stranger smiles and offers a handshake", "I carry the wounded soldier to safety",
+        "I write down everything the old woman said", "I change into dry clothes",
+        "Let's share the treasure equally", "I order another round of ale for the table",
+        "I remember the symbol from the temple", "I light a torch and hold it high",
+    ]
+    tables = ('intents', 'tone', 'dc.task', 'dc.environment', 'dc.intensity', 'dc.consequence')
+    changed = {}
+    for text in ordinary:
+        lower = text.lower()
+        exact = rules.scan(lower)
+        for table in ('intents', 'tone', 'dc.task'):
+            hits = rules.scan_for(lower, table)
+            if any(rules.present(hits, t) != rules.present(exact, t) for t in tables):
+                changed.setdefault(text, []).append(table)
+    print(f"ordinary sentences: {len(changed)} of {len(ordinary)} read differently")
+    dictionary = english_words()
+    for text, changed_tables in changed.items():
+        corrected = matcher.correct(text.lower())
+        rewritten = [w for w, c in zip(_WORD.findall(text.lower()), _WORD.findall(corrected)) if w != c]
+        print(f"  {text!r} -> {corrected!r} ({', '.join(changed_tables)})")
+        assert not any(word in dictionary for word in rewritten), f"real word rewritten in {text!r}"
+
+    # Corpus: actions built on every single-word intent keyword that is detected when spelled
+    # correctly, clean and with one typo in the keyword
+    rng = random.Random(11)
+    objects = ["the goblin", "the guard", "the chest", "the old door", "the merchant", "the wall", "the cliff",
+               "the captain", "the altar", "the dark tunnel", "the shadows", "the bandit leader"]
+    starts = ["I", "I try to", "I carefully", "We", "I quickly"]
+    verbs = [kw for d in rules.intents.values() for kw in d['keywords']
+             if kw.isalpha() and len(kw) >= 4 and ActionAnalysis(f"I {kw} the goblin").detection['intent'] != 'unclear']
+
+    def typo(word: str) -> str:
+        i = rng.randrange(1, len(word) - 1)
+        kind = rng.choice(("swap", "drop", "double", "replace"))
+        if kind == "swap":
+            return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        if kind == "drop":
+            return word[:i] + word[i + 1:]
+        if kind == "double":
+            return word[:i] + word[i] + word[i:]
+        return word[:i] + rng.choice("aeiourstnl") + word[i + 1:]
+
+    clean, misspelled, lengths = [], [], []
+    for _ in range(2000):
+        verb, obj, start = rng.choice(verbs), rng.choice(objects), rng.choice(starts)
+        clean.append(f"{start} {verb} {obj}")
+        misspelled.append(f"{start} {typo(verb)} {obj}")
+        lengths.append(len(verb))
+
+    def unclear_rate(texts: List[str], fuzzy: bool) -> float:
+        unclear = 0
+        for text in texts:
+            analysis = ActionAnalysis(text)
+            if not fuzzy:
+                analysis.intents = rules.first_positions(rules.scan(text.lower()), 'intents')
+            unclear += analysis.detection['intent'] == 'unclear'
+        return unclear / len(texts)
+
+    start = time.perf_counter()
+    after = unclear_rate(misspelled, fuzzy=True)
+    per_input = (time.perf_counter() - start) / len(misspelled) * 1e6
+    before = unclear_rate(misspelled, fuzzy=False)
+    print(f"misspelled actions: unclear {before:.1%} exact -> {after:.1%} typo-tolerant "
+          f"({per_input:.0f} us per analysis)")
+    for label, keep in ((f"keywords of {matcher.min_length}+ letters", lambda n: n >= matcher.min_length),
+                        (f"shorter keywords (typo must keep {matcher.min_length}+ letters)", lambda n: n < matcher.min_length)):
+        subset = [text for text, n in zip(misspelled, lengths) if keep(n)]
+        print(f"  {label}: {len(subset)} actions, {unclear_rate(subset, fuzzy=True):.1%} unclear")
+    print(f"clean actions: {unclear_rate(clean, fuzzy=False):.1%} unclear")
+
+    # Lookup cost does not grow with the vocabulary (synthetic words pad it out)
+    words = [typo(rng.choice(verbs)) for _ in range(5000)]
+    for extra in (0, 3000, 30000):
+        padding = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(5, 11)))
+                   for _ in range(extra)]
+        big = FuzzyMatcher(list(matcher.vocabulary) + padding)
+        start = time.perf_counter()
+        for word in words:
+            big._lookup(word)
+        print(f"vocabulary {len(big.vocabulary):>6}: {(time.perf_counter() - start) / len(words) * 1e6:.1f} us per lookup")
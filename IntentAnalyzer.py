@@ -1,80 +1,35 @@
 import re
 from collections import defaultdict
 from typing import List, Dict, Tuple, Optional
-from ActionValidator import ActionValidator
-from ContextManager import ContextManager
+
+from RuleTables import current as rule_tables
+
 # ============================================================================
-# SCALABLE KEYWORD STORAGE: Grouped by Intent Category
+# SCALABLE KEYWORD STORAGE: Grouped by Intent Category (rules/intents.json)
 # ============================================================================
+# Loaded through RuleTables, which hot-reloads edited rule files. INTENT_DEFINITIONS
+# is the table as loaded at import; intent_definitions() is always current.
+
+def intent_definitions() -> Dict[str, Dict]:
+    """Current intent table: keywords, requires_roll, category, max_per_turn, contexts"""
+    return rule_tables().intents
 
-INTENT_DEFINITIONS = {
-    "attack": {
-        "keywords": ["attack", "strike", "hit", "stab", "shoot", "slash", "cast", "punch", "kick", "swing"],
-        "requires_roll": True,
-        "category": "combat",
-        "max_per_turn": 1,
-        "contexts": ["battle", "combat"]
-    },
-    "persuade": {
-        "keywords": ["persuade", "convince", "negotiate", "deceive", "intimidate", "charm", "bribe", "threaten"],
-        "requires_roll": True,
-        "category": "social",
-        "max_per_turn": 2,
-        "contexts": ["dialogue", "exploration"]
-    },
-    "investigate": {
-        "keywords": ["search", "investigate", "look for", "examine", "inspect", "analyze", "study", "scan"],
-        "requires_roll": True,
-        "category": "exploration",
-        "max_per_turn": 3,
-        "contexts": ["exploration", "battle"]
-    },
-    "move": {
-        "keywords": ["walk", "run", "move", "approach", "go to", "travel", "step", "dash", "crawl", "climb"],
-        "requires_roll": False,
-        "category": "exploration",
-        "max_per_turn": 1,
-        "contexts": ["battle", "exploration"]
-    },
-    "interact": {
-        "keywords": ["talk", "ask", "speak", "listen", "greet", "communicate", "converse"],
-        "requires_roll": False,
-        "category": "social",
-        "max_per_turn": 3,
-        "contexts": ["dialogue", "exploration"]
-    },
-    "utility": {
-        "keywords": ["use", "equip", "drop", "pick", "grab", "draw", "sheathe", "open", "close"],
-        "requires_roll": False,
-        "category": "utility",
-        "max_per_turn": 2,
-        "contexts": ["battle", "exploration", "dialogue"]
-    },
-    "wait": {
-        "keywords": ["wait", "rest", "sleep", "think", "hold", "pause"],
-        "requires_roll": False,
-        "category": "utility",
-        "max_per_turn": 1,
-        "contexts": ["battle", "exploration", "dialogue"]
-    },
-}
+INTENT_DEFINITIONS = intent_definitions()
 
 # ============================================================================
-# CONDITIONAL & NEGATION PATTERNS
+# CONDITIONAL & NEGATION MARKERS
 # ============================================================================
+# Matched as whole tokens by parse_clauses(), so "know"/"notice" never read as "no"
 
-CONDITIONAL_PATTERNS = [
-    r"if\s+(.+?),\s*(?:then\s+)?(.+)",
-    r"when\s+(.+?),\s*(?:i\s+)?(.+)",
-    r"assuming\s+(.+?),\s*(?:i\s+)?(.+)",
-    r"(?:i\s+)?(.+?)\s+if\s+(.+)",
-]
+CONDITION_MARKERS = {"if", "when", "assuming"}
 
-NEGATION_PATTERNS = [
-    r"i\s+(?:don't|do not|won't|will not|can't|cannot)\s+(.+)",
-    r"don't\s+(.+)",
-    r"no\s+(.+)",
-]
+# Single-token negators, and two-token ones ("do not")
+NEGATORS = {"don't", "dont", "won't", "wont", "can't", "cant", "cannot", "never", "refuse", "refuses"}
+NEGATOR_PAIRS = {("do", "not"), ("will", "not")}
+
+# Tokens after which a new clause starts
+CLAUSE_BREAKS = {",", ";", ".", "!", "?", "and", "but", "then"}
+SUBJECTS = {"i", "we", "i'll", "we'll"}
 
 # ============================================================================
 # PHRASE CONTEXT DETECTION
@@ -88,52 +43,98 @@ PHRASE_CONTEXTS = [
 ]
 
 # ============================================================================
-# COMPILED REGEX FOR EFFICIENCY
+# CORE DETECTION FUNCTIONS
 # ============================================================================
 
-def build_compiled_patterns():
-    """Pre-compile regex patterns for fast matching."""
-    compiled = {}
-    for intent, data in INTENT_DEFINITIONS.items():
-        keywords = data["keywords"]
-        pattern = r"\b(" + "|".join(re.escape(kw) for kw in keywords) + r")\b"
-        compiled[intent] = re.compile(pattern, re.IGNORECASE)
-    return compiled
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[,;.!?]")
 
-COMPILED_PATTERNS = build_compiled_patterns()
 
-# ============================================================================
-# CORE DETECTION FUNCTIONS
-# ============================================================================
+def parse_clauses(text: str) -> Dict:
+    """
+    Split player text into condition, action and negation in one pass over its tokens.
+
+    Leading conditions ("If X, [then] [I] Y") end at the first comma or "then";
+    trailing ones ("[I] Y if X") run to the end. Negation only counts at the start of
+    a clause of the action (optionally after "I"/"we"), never inside the condition.
+    """
+    lower = text.lower().replace("\u2019", "'")
+    tokens = [(m.group(), m.start(), m.end()) for m in _TOKEN.finditer(lower)]
+
+    marker = split = None   # Condition marker index; ',' or 'then' ending a leading condition
+    leading = False
+    clause_begin = marker_clause = 0
+    negations = []          # (token index, index of the first negated token)
+    clause_start = True
+    for i, (tok, _, _) in enumerate(tokens):
+        if clause_start:
+            clause_begin = i
+        at_start = clause_start or (i > 0 and tokens[i - 1][0] in SUBJECTS and clause_begin == i - 1)
+
+        if marker is None and tok in CONDITION_MARKERS:
+            marker, leading, marker_clause = i, clause_start, clause_begin
+        elif marker is not None and leading and split is None and tok in (",", "then"):
+            split = i
+
+        if at_start:
+            nxt = tokens[i + 1][0] if i + 1 < len(tokens) else None
+            if tok in NEGATORS:
+                negations.append((i, i + 1))
+            elif (tok, nxt) in NEGATOR_PAIRS:
+                negations.append((i, i + 2))
+            elif tok == "no" and nxt is not None and nxt not in CLAUSE_BREAKS:
+                negations.append((i, i + 1))
+        clause_start = tok in CLAUSE_BREAKS
+
+    def span(first: int, stop: int) -> str:
+        if first >= stop:
+            return ""
+        return lower[tokens[first][1]:tokens[stop - 1][2]].strip()
+
+    condition = None
+    action_first, action_stop = 0, len(tokens)
+    if marker is not None and leading and split is not None:
+        condition = span(marker + 1, split)
+        action_first = split + 1
+        while action_first < len(tokens) and tokens[action_first][0] in ("then", ","):
+            action_first += 1
+    elif marker is not None and not leading:
+        condition = span(marker + 1, len(tokens))
+        action_first, action_stop = marker_clause, marker
+    if action_first < action_stop and tokens[action_first][0] in SUBJECTS and condition is not None:
+        action_first += 1
 
-def detect_conditionals(text: str) -> Optional[Dict]:
+    is_conditional = bool(condition) and action_first < action_stop
+    if not is_conditional:
+        condition, action_first, action_stop = None, 0, len(tokens)
+
+    negated_action = None
+    for index, first in negations:
+        if action_first <= index < action_stop and first < action_stop:
+            negated_action = span(first, action_stop)
+            break
+
+    return {
+        "is_conditional": is_conditional,
+        "condition": condition,
+        "action": span(action_first, action_stop) if is_conditional else text,
+        "negated": negated_action is not None,
+        "negated_action": negated_action,
+    }
+
+def detect_conditionals(text: str, clauses: Optional[Dict] = None) -> Optional[Dict]:
     """Detect if action is conditional. Returns condition and actual action if found."""
-    text_lower = text.lower()
-    
-    for pattern in CONDITIONAL_PATTERNS:
-        match = re.search(pattern, text_lower)
-        if match:
-            groups = match.groups()
-            if len(groups) == 2:
-                condition = groups[0].strip()
-                action = groups[1].strip()
-                return {
-                    "is_conditional": True,
-                    "condition": condition,
-                    "action": action
-                }
-    
-    return {"is_conditional": False, "condition": None, "action": text}
+    clauses = clauses or parse_clauses(text)
+    return {
+        "is_conditional": clauses["is_conditional"],
+        "condition": clauses["condition"],
+        "action": clauses["action"]
+    }
 
-def detect_negation(text: str) -> Tuple[bool, str]:
+def detect_negation(text: str, clauses: Optional[Dict] = None) -> Tuple[bool, str]:
     """Detect if action is negated."""
-    text_lower = text.lower()
-    
-    for pattern in NEGATION_PATTERNS:
-        match = re.search(pattern, text_lower)
-        if match:
-            return True, match.group(1).strip()
-    
+    clauses = clauses or parse_clauses(text)
+    if clauses["negated"]:
+        return True, clauses["negated_action"]
     return False, text
 
 def detect_phrase_context(text: str) -> str:
@@ -148,26 +149,25 @@ def detect_phrase_context(text: str) -> str:
 
 def find_matching_intents(text: str) -> List[Tuple[str, int]]:
     """Find all matching intents with match positions. Returns (intent, position) tuples."""
-    matches = []
-    text_lower = text.lower()
-    
-    for intent, compiled_pattern in COMPILED_PATTERNS.items():
-        match = compiled_pattern.search(text_lower)
-        if match:
-            matches.append((intent, match.start()))
-    
-    # Sort by position (first mention takes precedence)
-    matches.sort(key=lambda x: x[1])
-    return matches
+    # One automaton pass over the text (shared with tone/DC lookups), first mention first;
+    # if no intent keyword is written as such, misspelled ones ("attakc", "serach") are corrected
+    rules = rule_tables()
+    return rules.first_positions(rules.scan_for(text.lower(), 'intents'), 'intents')
 
-def detect_intent(action_text: str, current_context: str = "exploration") -> Dict:
+def detect_intent(action_text: str, current_context: str = "exploration",
+                  clauses: Optional[Dict] = None, matches: Optional[List[Tuple[str, int]]] = None,
+                  phrase_context: Optional[str] = None) -> Dict:
     """
     Enhanced intent detector with conditional handling, negation, and clarity checks.
     Returns a structured response for the DM engine to process.
+    clauses/matches/phrase_context may be passed in when already computed (see ActionAnalysis).
     """
     
+    definitions = intent_definitions()
+
     # Step 1: Check for negation
-    is_negated, effective_text = detect_negation(action_text)
+    clauses = clauses or parse_clauses(action_text)
+    is_negated, effective_text = detect_negation(action_text, clauses)
     
     if is_negated:
         return {
@@ -180,7 +180,7 @@ def detect_intent(action_text: str, current_context: str = "exploration") -> Dic
         }
     
     # Step 2: Check for conditionals
-    conditional_result = detect_conditionals(action_text)
+    conditional_result = detect_conditionals(action_text, clauses)
     
     if conditional_result["is_conditional"]:
         condition_text = conditional_result["condition"]
@@ -201,7 +201,7 @@ def detect_intent(action_text: str, current_context: str = "exploration") -> Dic
             }
         
         primary_intent = matches[0][0]
-        intent_data = INTENT_DEFINITIONS[primary_intent]
+        intent_data = definitions[primary_intent]
         
         return {
             "status": "conditional",
@@ -217,7 +217,8 @@ def detect_intent(action_text: str, current_context: str = "exploration") -> Dic
         }
     
     # Step 3: Find matching intents (no conditionals)
-    matches = find_matching_intents(action_text)
+    if matches is None:
+        matches = find_matching_intents(action_text)
     
     if not matches:
         return {
@@ -229,6 +230,7 @@ def detect_intent(action_text: str, current_context: str = "exploration") -> Dic
         }
     
     # Step 4: Check for multiple intents (action chaining)
+    phrase_context = phrase_context or detect_phrase_context(action_text)
     if len(matches) > 1:
         return {
             "status": "multi_intent",
@@ -236,9 +238,9 @@ def detect_intent(action_text: str, current_context: str = "exploration") -> Dic
             "intents": [
                 {
                     "intent": intent,
-                    "requires_roll": INTENT_DEFINITIONS[intent]["requires_roll"],
-                    "category": INTENT_DEFINITIONS[intent]["category"],
-                    "context": detect_phrase_context(action_text),
+                    "requires_roll": definitions[intent]["requires_roll"],
+                    "category": definitions[intent]["category"],
+                    "context": phrase_context,
                     "confidence": 1.0 / len(matches),
                 }
                 for intent, _ in matches
@@ -248,7 +250,7 @@ def detect_intent(action_text: str, current_context: str = "exploration") -> Dic
     
     # Step 5: Return single intent result
     intent = matches[0][0]
-    intent_data = INTENT_DEFINITIONS[intent]
+    intent_data = definitions[intent]
     
     return {
         "status": "valid",
@@ -256,7 +258,7 @@ def detect_intent(action_text: str, current_context: str = "exploration") -> Dic
         "intent": intent,
         "requires_roll": intent_data["requires_roll"],
         "category": intent_data["category"],
-        "context": detect_phrase_context(action_text),
+        "context": phrase_context,
         "confidence": 1.0,
         "message": f"Intent detected: {intent}",
     }
@@ -266,7 +268,11 @@ def detect_intent(action_text: str, current_context: str = "exploration") -> Dic
 # ============================================================================
 
 if __name__ == "__main__":
+    from ActionValidator import ActionValidator
+    from ContextManager import ContextManager
+
     cm = ContextManager("battle")
+    validator = ActionValidator(cm)
     
     test_cases = [
         "I swing my sword at the goblin!",
@@ -286,7 +292,7 @@ if __name__ == "__main__":
     
     for test in test_cases:
         print(f"\nInput: {test}")
-        result = ActionValidator.validate_action(test, cm)
+        result = validator.validate_action(test)
         print(f"Valid: {result['valid']}")
         print(f"Reason: {result['reason']}")
         print(f"Status: {result['status']}")
@@ -294,4 +300,65 @@ if __name__ == "__main__":
         print("-" * 80)
         
         if result["valid"]:
-            cm.reset_turn()  # Reset for next test
\ No newline at end of file
+            cm.reset_turn()  # Reset for next test
+
+    # ------------------------------------------------------------------------
+    # Adversarial latency: the old unanchored regexes vs the token parser
+    # ------------------------------------------------------------------------
+    import random
+    import time
+
+    LEGACY_PATTERNS = [
+        r"if\s+(.+?),\s*(?:then\s+)?(.+)",
+        r"when\s+(.+?),\s*(?:i\s+)?(.+)",
+        r"assuming\s+(.+?),\s*(?:i\s+)?(.+)",
+        r"(?:i\s+)?(.+?)\s+if\s+(.+)",
+        r"i\s+(?:don't|do not|won't|will not|can't|cannot)\s+(.+)",
+        r"don't\s+(.+)",
+        r"no\s+(.+)",
+    ]
+
+    def legacy(text):
+        lowered = text.lower()
+        for pattern in LEGACY_PATTERNS:
+            re.search(pattern, lowered)
+
+    def timed(fn, text, repeat=3):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(text)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    rng = random.Random(11)
+    vocab = ["if", "when", "i", "don't", "no", "not", "then", ",", "attack", "the", "goblin", "know", "."]
+    adversarial = {
+        "no-comma 'if' flood": lambda n: "if " * (n // 3),
+        "pasted prose": lambda n: ("the caravan rolled on through the long grey hills " * (n // 50 + 1))[:n],
+        "'when' without comma": lambda n: "when " + "a " * (n // 2),
+        "token soup": lambda n: " ".join(rng.choice(vocab) for _ in range(n // 4)),
+    }
+
+    print("\n" + "=" * 80)
+    print("CLAUSE PARSER: worst-case latency on pasted input (ms)")
+    print("=" * 80)
+    for name, make in adversarial.items():
+        row = []
+        for size in (1024, 4096, 16384):
+            text = make(size)
+            row.append(f"{size // 1024:>2}KB legacy {timed(legacy, text, repeat=1) * 1000:8.2f} / "
+                       f"parser {timed(parse_clauses, text) * 1000:6.2f}")
+        print(f"{name:<24} " + " | ".join(row))
+
+    # Fuzz: random marker/negator soup always parses, within a linear budget
+    for _ in range(2000):
+        text = " ".join(rng.choice(vocab) for _ in range(rng.randint(0, 60)))
+        clauses = parse_clauses(text)
+        assert clauses["is_conditional"] == (clauses["condition"] is not None)
+        assert clauses["negated"] == (clauses["negated_action"] is not None)
+    big = adversarial["token soup"](64 * 1024)
+    assert timed(parse_clauses, big) < 0.25, "parser should stay linear on 64KB input"
+    print("fuzz: 2000 random inputs parsed; 64KB token soup "
+          f"in {timed(parse_clauses, big) * 1000:.1f} ms")
+
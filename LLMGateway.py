@@ -0,0 +1,281 @@
+"""Resilient gateway for every LLM call made by the Dungeon Master agent.
+
+The gateway wraps any LangChain-style chat model (callable with a list of
+messages, returning an object with .content) and adds:
+
+  - token-bucket rate limiting
+  - a per-call timeout
+  - jittered exponential-backoff retries
+  - a circuit breaker that serves a fallback response while the provider is down
+  - single-flight coalescing: identical concurrent requests share one call
+
+FaultyLLMStub is a local stand-in model that injects latency, errors and hangs,
+for exercising the gateway without an API key.
+
+Usage:
+    gateway = LLMGateway(ChatOpenAI(...), rate_per_second=2, timeout=30)
+    response = gateway(messages)   # same call shape as self.llm(messages)
+"""
+
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+FALLBACK_TEXT = ("The Dungeon Master pauses, consulting their notes... "
+                 "(The story engine is briefly unavailable. Please try that again in a moment.)")
+
+
+@dataclass
+class GatewayResponse:
+    """Response object with the same .content shape as a LangChain message"""
+    content: str
+    fallback: bool = False
+    local: bool = False  # Answered in-process rather than by a model
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until tokens are available; False if that would exceed timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after reset_timeout"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+@dataclass
+class GatewayStats:
+    requests: int = 0
+    calls: int = 0
+    coalesced: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    fallbacks: int = 0
+    rate_limited: int = 0
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+
+class LLMGateway:
+    """Drop-in wrapper for self.llm(messages) with rate limiting, retries and a breaker"""
+
+    def __init__(self, llm: Callable, rate_per_second: float = 5.0, burst: Optional[float] = None,
+                 timeout: float = 60.0, retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, fallback_text: str = FALLBACK_TEXT,
+                 max_concurrency: int = 8):
+        self.llm = llm
+        # Newer LangChain models are invoked with .invoke(); plain callables (stubs) are called
+        self._call = getattr(llm, 'invoke', None) or llm
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.fallback_text = fallback_text
+        self.stats = GatewayStats()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-gateway")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def request_key(messages: List) -> str:
+        digest = hashlib.sha256()
+        for message in messages:
+            digest.update(type(message).__name__.encode())
+            digest.update(b"\x00")
+            digest.update(message.content.encode("utf-8"))
+            digest.update(b"\x01")
+        return digest.hexdigest()
+
+    def __call__(self, messages: List):
+        key = self.request_key(messages)
+        with self._lock:
+            self.stats.requests += 1
+            shared = self._inflight.get(key)
+            if shared is None:
+                leader = Future()
+                self._inflight[key] = leader
+            else:
+                self.stats.coalesced += 1
+        if shared is not None:
+            return shared.result()
+
+        try:
+            response = self._call_with_retries(messages)
+            leader.set_result(response)
+            return response
+        except BaseException as exc:
+            leader.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _fallback(self) -> GatewayResponse:
+        with self._lock:
+            self.stats.fallbacks += 1
+        return GatewayResponse(self.fallback_text, fallback=True)
+
+    def _call_with_retries(self, messages: List):
+        for attempt in range(self.retry.max_attempts):
+            if not self.breaker.allow():
+                return self._fallback()
+            if not self.bucket.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.stats.rate_limited += 1
+                return self._fallback()
+
+            with self._lock:
+                self.stats.calls += 1
+                if attempt:
+                    self.stats.retries += 1
+            future = self._executor.submit(self._call, messages)
+            try:
+                response = future.result(timeout=self.timeout)
+                self.breaker.record_success()
+                return response
+            except FutureTimeout:
+                with self._lock:
+                    self.stats.timeouts += 1
+            except Exception:
+                with self._lock:
+                    self.stats.errors += 1
+            self.breaker.record_failure()
+            if attempt + 1 < self.retry.max_attempts:
+                time.sleep(self.retry.delay(attempt))
+        return self._fallback()
+
+
+class FaultyLLMStub:
+    """Local model stand-in that injects latency, errors and hangs"""
+
+    def __init__(self, reply: str = "The torchlight flickers. What do you do?", latency: float = 0.01,
+                 error_rate: float = 0.0, hang_rate: float = 0.0, hang_seconds: float = 5.0,
+                 seed: Optional[int] = None):
+        self.reply = reply
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.calls = 0
+        self._fail_next = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fail_next(self, n: int):
+        """Force the next n calls to raise"""
+        self._fail_next = n
+
+    def __call__(self, messages: List) -> GatewayResponse:
+        with self._lock:
+            self.calls += 1
+            forced = self._fail_next > 0
+            if forced:
+                self._fail_next -= 1
+            roll = self._random.random()
+        if forced or roll < self.error_rate:
+            time.sleep(self.latency)
+            raise ConnectionError("injected provider error")
+        if roll < self.error_rate + self.hang_rate:
+            time.sleep(self.hang_seconds)
+        time.sleep(self.latency)
+        return GatewayResponse(self.reply)
+
+
+# Example usage
+if __name__ == "__main__":
+    from langchain.schema import HumanMessage
+
+    stub = FaultyLLMStub(error_rate=0.2, hang_rate=0.05, hang_seconds=0.5, seed=7)
+    gateway = LLMGateway(stub, rate_per_second=200, timeout=0.2,
+                         retry=RetryPolicy(max_attempts=4, base_delay=0.01, max_delay=0.05),
+                         breaker=CircuitBreaker(failure_threshold=10, reset_timeout=0.5))
+    served = sum(not getattr(gateway([HumanMessage(content=f"turn {i}")]), 'fallback', False)
+                 for i in range(200))
+    print(f"faulty provider: {served}/200 served without fallback; {gateway.stats.to_dict()}")
+
+    # Identical concurrent requests share one provider call
+    stub = FaultyLLMStub(latency=0.2)
+    gateway = LLMGateway(stub)
+    threads = [threading.Thread(target=gateway, args=([HumanMessage(content="roll")],)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"10 identical concurrent requests -> {stub.calls} provider call(s)")
+
+    # A dead provider trips the breaker and stops being called
+    stub = FaultyLLMStub()
+    stub.fail_next(10 ** 6)
+    gateway = LLMGateway(stub, retry=RetryPolicy(max_attempts=2, base_delay=0.001),
+                         breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    for i in range(20):
+        gateway([HumanMessage(content=f"turn {i}")])
+    print(f"dead provider: {stub.calls} provider calls for 20 requests, breaker {gateway.breaker.state}")
@@ -0,0 +1,349 @@
+"""Fair-share priority scheduler for every model-bound call.
+
+Once sessions share one model quota, a player waiting on narration competes
+with speculation, summarization, scene extraction and pre-rendering for the
+same few connections. The scheduler owns a fixed number of worker slots and
+decides what runs next:
+
+  - priority classes: player-blocking calls always go first, then speculation,
+    then background work
+  - per-campaign fair queuing inside a class (start-time fair queuing), so a
+    campaign with many requests in flight can't starve campaigns with one
+  - deadlines: speculative and background jobs that waited past theirs are shed
+    (LLMShed) instead of spending quota on stale work
+  - backpressure: accepting() says whether optional work should be started at
+    all; full optional queues reject new jobs
+  - queue depth, wait-time percentiles and shed counts per class in report()
+
+Usage:
+    scheduler = LLMScheduler(workers=8)
+    router = build_router(narrative=gateway, scheduler=scheduler)
+    router('narration', messages, campaign=state.campaign_id)
+    if scheduler.accepting('speculation'): ...
+    print(scheduler.report())
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+
+# Priority classes, served strictly in this order
+PLAYER_BLOCKING, SPECULATIVE, BACKGROUND = 0, 1, 2
+CLASS_NAMES = {PLAYER_BLOCKING: 'player_blocking', SPECULATIVE: 'speculative', BACKGROUND: 'background'}
+
+# call type -> priority class; anything unlisted is background
+CALL_PRIORITIES = {
+    'roll_check': PLAYER_BLOCKING,
+    'consequence': PLAYER_BLOCKING,
+    'narration': PLAYER_BLOCKING,
+    'speculation': SPECULATIVE,
+    'summarization': BACKGROUND,
+    'scene_extraction': BACKGROUND,
+    'prerender': BACKGROUND,
+}
+
+# class -> seconds a job may wait in the queue before it is shed (None: never)
+DEFAULT_DEADLINES = {PLAYER_BLOCKING: None, SPECULATIVE: 15.0, BACKGROUND: 120.0}
+
+# class -> queued jobs before new submissions are rejected (None: unbounded)
+DEFAULT_QUEUE_LIMITS = {PLAYER_BLOCKING: None, SPECULATIVE: 32, BACKGROUND: 256}
+
+
+class LLMShed(Exception):
+    """A job was dropped by the scheduler (deadline passed, queue full, or shut down)"""
+
+
+def priority_of(call_type: str) -> int:
+    return CALL_PRIORITIES.get(call_type, BACKGROUND)
+
+
+@dataclass
+class _Job:
+    call_type: str
+    campaign: str
+    fn: Callable
+    args: tuple
+    future: Future
+    submitted: float
+    deadline: Optional[float]
+
+
+@dataclass
+class ClassStats:
+    submitted: int = 0
+    dispatched: int = 0
+    shed_deadline: int = 0
+    rejected: int = 0
+    cancelled: int = 0
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def percentile(self, q: float) -> float:
+        if not self.waits:
+            return 0.0
+        ordered = sorted(self.waits)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> Dict:
+        return {
+            'submitted': self.submitted, 'dispatched': self.dispatched,
+            'shed_deadline': self.shed_deadline, 'rejected': self.rejected, 'cancelled': self.cancelled,
+            'p50_wait_seconds': round(self.percentile(0.5), 4),
+            'p95_wait_seconds': round(self.percentile(0.95), 4),
+        }
+
+
+class _FairQueue:
+    """One priority class: jobs ordered by start tag, tags advancing per campaign by cost"""
+
+    def __init__(self):
+        self.heap: List = []
+        self.vtime = 0.0                       # start tag of the last dispatched job
+        self.finish: Dict[str, float] = {}     # campaign -> finish tag of its last queued job
+        self.queued: Dict[str, int] = {}       # campaign -> jobs waiting
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, job: _Job, cost: float, weight: float, seq: int):
+        start = max(self.vtime, self.finish.get(job.campaign, 0.0))
+        self.finish[job.campaign] = start + cost / weight
+        self.queued[job.campaign] = self.queued.get(job.campaign, 0) + 1
+        heapq.heappush(self.heap, (start, seq, job))
+
+    def pop(self) -> _Job:
+        start, _, job = heapq.heappop(self.heap)
+        self.vtime = max(self.vtime, start)
+        self._forget(job.campaign)
+        return job
+
+    def remove_expired(self, now: float) -> List[_Job]:
+        expired = [entry[2] for entry in self.heap if entry[2].deadline is not None and entry[2].deadline < now]
+        if expired:
+            self.heap = [entry for entry in self.heap if entry[2].deadline is None or entry[2].deadline >= now]
+            heapq.heapify(self.heap)
+            for job in expired:
+                self._forget(job.campaign)
+        return expired
+
+    def _forget(self, campaign: str):
+        # An idle campaign keeps no credit or debt: it restarts at the current virtual time
+        left = self.queued[campaign] - 1
+        if left:
+            self.queued[campaign] = left
+        else:
+            del self.queued[campaign]
+            del self.finish[campaign]
+
+
+class LLMScheduler:
+    """Runs model calls on `workers` threads: by priority class, fair across campaigns, with deadlines"""
+
+    def __init__(self, workers: int = 8, deadlines: Optional[Dict[int, Optional[float]]] = None,
+                 queue_limits: Optional[Dict[int, Optional[int]]] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        self.workers = workers
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self.queue_limits = {**DEFAULT_QUEUE_LIMITS, **(queue_limits or {})}
+        self.weights = dict(weights or {})     # campaign -> share (default 1)
+        self.stats = {cls: ClassStats() for cls in CLASS_NAMES}
+        self.served: Dict[str, int] = {}
+        self.running = 0
+        self._queues = {cls: _FairQueue() for cls in CLASS_NAMES}
+        self._seq = itertools.count()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []   # Started on first submit
+
+    # ========================================================================
+    # SUBMISSION
+    # ========================================================================
+
+    def submit(self, call_type: str, fn: Callable, *args, campaign: Optional[str] = None,
+               cost: float = 1.0, deadline: Optional[float] = None) -> Future:
+        """Queue fn(*args); the future fails with LLMShed if the job is dropped.
+
+        cost is the job's share of the campaign's allowance (1 per request by default,
+        or e.g. estimated tokens); deadline overrides the class default, in seconds.
+        """
+        cls = priority_of(call_type)
+        now = time.monotonic()
+        wait_limit = self.deadlines[cls] if deadline is None else deadline
+        job = _Job(call_type, campaign or "", fn, args, Future(), now,
+                   None if wait_limit is None else now + wait_limit)
+        with self._cond:
+            stats = self.stats[cls]
+            stats.submitted += 1
+            queue = self._queues[cls]
+            limit = self.queue_limits[cls]
+            if limit is not None and len(queue) >= limit:
+                self._shed(cls, queue.remove_expired(now))
+            if self._closed or (limit is not None and len(queue) >= limit):
+                stats.rejected += 1
+                job.future.set_exception(LLMShed(f"{CLASS_NAMES[cls]} queue full"))
+                return job.future
+            queue.push(job, cost, self.weights.get(job.campaign, 1.0), next(self._seq))
+            if not self._threads:
+                self._threads = [threading.Thread(target=self._worker, name=f"llm-scheduler-{i}", daemon=True)
+                                 for i in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+            self._cond.notify()
+        return job.future
+
+    def run(self, call_type: str, fn: Callable, *args, campaign: Optional[str] = None,
+            cost: float = 1.0, timeout: Optional[float] = None):
+        """submit() and wait for the result"""
+        return self.submit(call_type, fn, *args, campaign=campaign, cost=cost).result(timeout=timeout)
+
+    def accepting(self, call_type: str) -> bool:
+        """Backpressure: False when optional work of this type should not be started now.
+
+        Player-blocking work is always accepted. Anything else is refused while players
+        are queued behind busy workers, or while its own class queue is full.
+        """
+        cls = priority_of(call_type)
+        if cls == PLAYER_BLOCKING:
+            return True
+        with self._cond:
+            if self._queues[PLAYER_BLOCKING]:
+                return False
+            limit = self.queue_limits[cls]
+            return limit is None or len(self._queues[cls]) < limit
+
+    def pressure(self) -> float:
+        """Jobs running or queued per worker (above 1.0 means work is waiting)"""
+        with self._cond:
+            return (self.running + sum(len(q) for q in self._queues.values())) / self.workers
+
+    def depth(self, call_type: Optional[str] = None) -> int:
+        with self._cond:
+            if call_type is not None:
+                return len(self._queues[priority_of(call_type)])
+            return sum(len(q) for q in self._queues.values())
+
+    # ========================================================================
+    # DISPATCH
+    # ========================================================================
+
+    def _shed(self, cls: int, jobs: List[_Job]):
+        self.stats[cls].shed_deadline += len(jobs)
+        for job in jobs:
+            job.future.set_exception(LLMShed(f"{job.call_type} waited past its deadline"))
+
+    def _next_job(self) -> Optional[_Job]:
+        """Highest-priority live job, shedding stale ones on the way (call with the lock held)"""
+        now = time.monotonic()
+        for cls, queue in self._queues.items():
+            while queue:
+                job = queue.pop()
+                if job.deadline is not None and job.deadline < now:
+                    self._shed(cls, [job])
+                    continue
+                if not job.future.set_running_or_notify_cancel():
+                    self.stats[cls].cancelled += 1    # e.g. abandoned by a router timeout
+                    continue
+                stats = self.stats[cls]
+                stats.dispatched += 1
+                stats.waits.append(now - job.submitted)
+                self.served[job.campaign] = self.served.get(job.campaign, 0) + 1
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    job = self._next_job()
+                self.running += 1
+            try:
+                job.future.set_result(job.fn(*job.args))
+            except BaseException as exc:
+                job.future.set_exception(exc)
+            finally:
+                with self._cond:
+                    self.running -= 1
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work; queued jobs are shed"""
+        with self._cond:
+            self._closed = True
+            for cls, queue in self._queues.items():
+                dropped = [queue.pop() for _ in range(len(queue))]
+                for job in dropped:
+                    if job.future.set_running_or_notify_cancel():
+                        job.future.set_exception(LLMShed("scheduler shut down"))
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def report(self) -> Dict:
+        """Queue depth and wait times per priority class, and calls served per campaign"""
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'running': self.running,
+                'pressure': round((self.running + sum(len(q) for q in self._queues.values())) / self.workers, 3),
+                'classes': {name: {'depth': len(self._queues[cls]), **self.stats[cls].to_dict()}
+                            for cls, name in CLASS_NAMES.items()},
+                'served_by_campaign': dict(self.served),
+            }
+
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    from concurrent.futures import ThreadPoolExecutor, wait as wait_all
+
+    from LLMGateway import FaultyLLMStub
+
+    model = FaultyLLMStub(latency=0.02)   # stands in for a gateway with 2 connections of quota
+
+    def player(campaign: str, submit, turns: int, waits: List[float]):
+        """A player who waits for each narration before typing the next action"""
+        for turn in range(turns):
+            start = time.perf_counter()
+            submit('narration', campaign, [f"{campaign} turn {turn}"]).result()
+            waits.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    def simulate(submit) -> Dict[str, List[float]]:
+        # One chatty campaign floods the quota with background and speculative jobs
+        # and its own burst of narration; three others just play
+        futures = [submit('summarization', 'chatty', [f"summary {i}"]) for i in range(120)]
+        futures += [submit('speculation', 'chatty', [f"branch {i}"]) for i in range(40)]
+        futures += [submit('narration', 'chatty', [f"burst {i}"]) for i in range(30)]
+        waits = {name: [] for name in ('quiet_a', 'quiet_b', 'quiet_c')}
+        players = [threading.Thread(target=player, args=(name, submit, 10, waits[name])) for name in waits]
+        for thread in players:
+            thread.start()
+        for thread in players:
+            thread.join()
+        wait_all(futures)
+        return waits
+
+    def summarize(label: str, waits: Dict[str, List[float]]):
+        flat = sorted(w for ws in waits.values() for w in ws)
+        print(f"{label:<10} quiet players' narration: p50 {flat[len(flat) // 2] * 1000:6.1f} ms, "
+              f"max {flat[-1] * 1000:6.1f} ms")
+
+    # Baseline: one shared FIFO pool with the same two slots
+    pool = ThreadPoolExecutor(max_workers=2)
+    summarize("fifo", simulate(lambda call_type, campaign, messages: pool.submit(model, messages)))
+    pool.shutdown()
+
+    scheduler = LLMScheduler(workers=2, deadlines={SPECULATIVE: 0.5, BACKGROUND: 2.0})
+    summarize("scheduled", simulate(lambda call_type, campaign, messages: scheduler.submit(
+        call_type, model, messages, campaign=campaign)))
+    print(f"accepting speculation while idle: {scheduler.accepting('speculation')}")
+    print(json.dumps(scheduler.report(), indent=2))
+    scheduler.shutdown(wait=True)
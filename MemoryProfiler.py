@@ -0,0 +1,272 @@
+"""Opt-in memory profiling and leak detection for long-running sessions.
+
+Every `interval` turns the profiler takes a tracemalloc snapshot and measures
+what each part of the session keeps alive: every CampaignState field, the
+agent's conversation memory, usage/transcript/speculation buffers and the
+process-wide caches (shared ActionAnalysis, rule-table scans). Sizes are deep
+sizes over the object graph; an object reachable from several components is
+charged to the first one measured. A component whose size rose at every one of
+the last `window` samples, by at least `min_growth` bytes, is flagged as
+growing. Reports are plain JSON so benchmarks can assert on them.
+
+Tracing starts with start() (the agent calls it when given a profiler), so the
+first sample covers the turns before it. Allocation growth is diffed against
+one process-wide snapshot, the previous sample of any session, so the
+profiler's own memory doesn't grow with the number of sessions.
+
+Usage:
+    profiler = MemoryProfiler(interval=10, report_path="memory.json")
+    agent = DungeonMasterAgent(api_key, profiler=profiler)
+    ...
+    report = profiler.report()   # report['sessions'][campaign_id]['growing']
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import types
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Callable, Dict, List, Optional
+
+# Shared program structure, not session data: never walked into
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+           types.MethodType, types.CodeType, types.FrameType)
+
+_IGNORED_FILES = (tracemalloc.__file__, __file__,
+                  "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>")
+
+
+def deep_size(obj, seen: Optional[set] = None) -> int:
+    """Bytes reachable from obj (sys.getsizeof over gc referents), skipping anything in seen"""
+    seen = set() if seen is None else seen
+    total, stack = 0, [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item, 0)
+        stack.extend(gc.get_referents(item))
+    return total
+
+
+def _cache_components() -> Dict[str, object]:
+    """Process-wide caches, measured in every sample"""
+    caches = {}
+    try:
+        from ActionAnalysis import _analysis
+        # The lru_cache wrapper's referents include its entry dict
+        caches['cache.analysis'] = _analysis
+    except ImportError:
+        pass
+    try:
+        from RuleTables import current
+        caches['cache.rule_scan'] = current().scan
+    except (ImportError, OSError, ValueError):
+        pass
+    return caches
+
+
+@dataclass
+class MemorySample:
+    turn: int
+    timestamp: float
+    traced_bytes: int
+    peak_bytes: int
+    components: Dict[str, int]
+    top_allocations: List[Dict]
+    top_growth: List[Dict]
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+
+@dataclass
+class SessionProfile:
+    campaign_id: str
+    samples: List[MemorySample] = field(default_factory=list)
+
+
+class MemoryProfiler:
+    """Per-session tracemalloc snapshots and component sizes every `interval` turns"""
+
+    def __init__(self, interval: int = 10, report_path: Optional[str] = None, window: int = 4,
+                 min_growth: int = 64 * 1024, top: int = 10, frames: int = 1):
+        self.interval = interval
+        self.report_path = report_path
+        self.window = window
+        self.min_growth = min_growth
+        self.top = top
+        self.frames = frames
+        self.sessions: Dict[str, SessionProfile] = {}
+        self._extra: Dict[str, Callable[[], object]] = {}
+        self._snapshot: Optional[tracemalloc.Snapshot] = None   # previous sample, any session
+        self._started_tracing = False
+
+    def start(self):
+        """Begin tracing allocations (sample() starts it too, but then misses the turns before)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._snapshot = None
+
+    def track(self, name: str, source: Callable[[], object]):
+        """Measure another component in every sample (source returns the object to size)"""
+        self._extra[name] = source
+
+    # ========================================================================
+    # SAMPLING
+    # ========================================================================
+
+    def on_turn(self, agent, state) -> Optional[MemorySample]:
+        """Called after every turn; samples on turns that are a multiple of interval"""
+        if state.turn_count % self.interval:
+            return None
+        return self.sample(agent, state)
+
+    def components(self, agent, state) -> Dict[str, object]:
+        found: Dict[str, object] = {}
+        if is_dataclass(state):
+            for f in fields(state):
+                found[f"state.{f.name}"] = getattr(state, f.name)
+        if agent is not None:
+            for name in ('memory', 'usage', 'transcript', 'speculator', 'router'):
+                value = getattr(agent, name, None)
+                if value is not None:
+                    found[f"agent.{name}"] = value
+        found.update(_cache_components())
+        for name, source in self._extra.items():
+            found[name] = source()
+        return found
+
+    def sample(self, agent, state) -> MemorySample:
+        self.start()
+        session = self.sessions.setdefault(state.campaign_id, SessionProfile(state.campaign_id))
+
+        seen: set = set()
+        sizes = {name: deep_size(obj, seen) for name, obj in self.components(agent, state).items()}
+
+        # (Snapshot.filter_traces is slow on large heaps; profiler sites are dropped from the stats instead)
+        snapshot = tracemalloc.take_snapshot()
+        top_allocations = [
+            {'site': str(stat.traceback[0]), 'bytes': stat.size, 'blocks': stat.count}
+            for stat in self._own_sites(snapshot.statistics('lineno'))
+        ]
+        # Growth since the previous sample, process-wide (one snapshot kept, however many sessions)
+        top_growth = []
+        if self._snapshot is not None:
+            top_growth = [
+                {'site': str(stat.traceback[0]), 'bytes_diff': stat.size_diff, 'bytes': stat.size}
+                for stat in self._own_sites(snapshot.compare_to(self._snapshot, 'lineno')) if stat.size_diff > 0
+            ]
+        self._snapshot = snapshot
+
+        traced, peak = tracemalloc.get_traced_memory()
+        sample = MemorySample(state.turn_count, time.time(), traced, peak, sizes, top_allocations, top_growth)
+        session.samples.append(sample)
+        if self.report_path:
+            self.dump(self.report_path)
+        return sample
+
+    def _own_sites(self, stats: List) -> List:
+        """Top statistics, excluding allocations made by tracemalloc, the import system and this module"""
+        kept = [stat for stat in stats if stat.traceback[0].filename not in _IGNORED_FILES]
+        return kept[:self.top]
+
+    # ========================================================================
+    # REPORTING
+    # ========================================================================
+
+    def growing(self, session: SessionProfile) -> List[Dict]:
+        """Components (and the traced total) that grew at each of the last `window` samples"""
+        recent = session.samples[-(self.window + 1):]
+        if len(recent) <= self.window:
+            return []
+        series = {name: [s.components.get(name, 0) for s in recent] for name in recent[-1].components}
+        series['traced'] = [s.traced_bytes for s in recent]
+        turns = recent[-1].turn - recent[0].turn
+        flagged = []
+        for name, sizes in series.items():
+            growth = sizes[-1] - sizes[0]
+            if growth >= self.min_growth and all(b > a for a, b in zip(sizes, sizes[1:])):
+                flagged.append({
+                    'component': name,
+                    'first_bytes': sizes[0],
+                    'last_bytes': sizes[-1],
+                    'bytes_per_turn': round(growth / max(turns, 1), 1),
+                })
+        return sorted(flagged, key=lambda item: -item['bytes_per_turn'])
+
+    def report(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'window': self.window,
+            'min_growth': self.min_growth,
+            'sessions': {
+                campaign_id: {
+                    'samples': [s.to_dict() for s in session.samples],
+                    'latest': session.samples[-1].components if session.samples else {},
+                    'growing': self.growing(session),
+                }
+                for campaign_id, session in self.sessions.items()
+            },
+        }
+
+    def dump(self, path: str) -> str:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+
+# Example usage
+if __name__ == "__main__":
+    import tempfile
+    from types import SimpleNamespace
+
+    from CampaignState import CampaignState
+    from Party import PartyMember
+    from Player import Character
+    from SceneManager import Scene, SceneType
+    from TokenCounter import SessionUsage
+
+    # A session shaped like the agent's: unbounded chat memory, bounded usage history
+    player = Character("Theron", "Human", "Paladin", 3, "Noble", "LG",
+                       {'str': 16, 'dex': 10, 'con': 14, 'int': 10, 'wis': 12, 'cha': 15}, "A knight.", 28, 28)
+    state = CampaignState("c1", "Profiled", Scene("scene_0", "Start", "The start.", SceneType.EXPLORATION, "Start"),
+                          player, [PartyMember("Lyra", "Elf", "Ranger", 3, "Cautious", "Trusted")])
+    agent = SimpleNamespace(memory=[], usage=SessionUsage(history=50))
+
+    path = os.path.join(tempfile.mkdtemp(), "memory.json")
+    profiler = MemoryProfiler(interval=25, report_path=path, min_growth=16 * 1024)
+    profiler.start()
+    start = time.perf_counter()
+    for turn in range(1, 501):
+        state.turn_count = turn
+        state.record_decision(f"decision {turn}", "outcome")
+        agent.memory.append(("human", f"I search the room, turn {turn} " * 8))
+        agent.memory.append(("ai", f"You find dust and old bones. " * 20))
+        agent.usage.start_turn(turn)
+        agent.usage.end_turn(0.01)
+        profiler.on_turn(agent, state)
+    elapsed = time.perf_counter() - start
+    profiler.stop()
+
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    session = report['sessions']['c1']
+    print(f"500 turns, {len(session['samples'])} samples in {elapsed:.2f}s -> {path}")
+    for item in session['growing']:
+        print(f"  growing: {item['component']:<22} {item['bytes_per_turn']:>8.1f} B/turn")
+    flagged = {item['component'] for item in session['growing']}
+    assert {'agent.memory', 'state.decisions_made'} <= flagged
+    assert 'agent.usage' not in flagged and 'state.tone_state' not in flagged
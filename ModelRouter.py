@@ -0,0 +1,266 @@
+"""Tiered model routing for the Dungeon Master's LLM calls.
+
+Every call type (roll classification, consequence, narration, summarization,
+scene extraction, speculation) is routed through an ordered list of tiers. A
+tier is either an LLM gateway for one model or a local function, and has its
+own latency budget: when a tier times out, errors, serves the gateway's
+fallback text or (local tiers) declines by returning None, the next tier in
+the route is tried. Per-tier latency and outcome counts show where traffic
+can be moved to faster models. With an LLMScheduler, model tiers run on its
+workers (priority class and per-campaign fair share) instead of the router's
+own thread pool; local tiers always run on the router's pool, so their budget
+is enforced the same way.
+
+A call that overruns its budget is cancelled if it is still queued. One that is
+already running cannot be stopped, so it is counted as abandoned until it
+finishes; while a tier's abandoned calls hold max_abandoned workers (by
+default all of them), the tier is skipped ('saturated') instead of queueing
+more work behind them.
+
+Usage:
+    router = build_router(narrative=registry.gateway(key, "gpt-4o"),
+                          mechanics=registry.gateway(key, "gpt-4o-mini"))
+    response = router('roll_check', messages, payload=player_input, campaign=state.campaign_id)
+    print(router.report())
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+
+from LLMGateway import FALLBACK_TEXT, GatewayResponse
+from LLMScheduler import LLMScheduler, LLMShed
+from ActionAnalysis import analyze
+from RollClassifier import describe_action
+
+CALL_TYPES = ('roll_check', 'consequence', 'narration', 'summarization', 'scene_extraction', 'speculation')
+
+# call type -> tiers tried in order
+DEFAULT_ROUTES = {
+    'roll_check': ['classifier', 'mechanics', 'local'],
+    'consequence': ['mechanics', 'narrative'],
+    'narration': ['narrative', 'mechanics'],
+    'summarization': ['mechanics', 'narrative'],
+    'scene_extraction': ['mechanics'],
+    'speculation': ['mechanics'],
+}
+
+# tier -> latency budget in seconds
+DEFAULT_BUDGETS = {
+    'mechanics': 8.0,
+    'narrative': 45.0,
+    'local': 1.0,
+    'classifier': 0.5,
+}
+
+
+def local_roll_check(player_input: str) -> str:
+    """Roll-check answer from the keyword heuristics, in the same JSON shape the LLM returns"""
+    analysis = analyze(player_input).action
+    return json.dumps({
+        'requires_roll': analysis['requires_check'],
+        'ability': analysis['ability'],
+        'dc': int(analysis['dc']),
+        'action_description': describe_action(player_input),
+    })
+
+
+@dataclass
+class Tier:
+    """One routing target: an LLM gateway (called with messages) or a local function (called with payload)"""
+    name: str
+    gateway: Optional[Callable] = None
+    local: Optional[Callable[[str], Optional[str]]] = None
+    timeout: float = 30.0
+    max_abandoned: Optional[int] = None   # timed-out calls still running before the tier is skipped
+                                          # (default: every worker of the pool it runs on)
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    served: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    fallbacks: int = 0
+    declined: int = 0
+    skipped: int = 0
+    shed: int = 0
+    saturated: int = 0
+    abandoned: int = 0         # timed-out calls still running now
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> Dict:
+        return {
+            'calls': self.calls, 'served': self.served, 'timeouts': self.timeouts,
+            'errors': self.errors, 'fallbacks': self.fallbacks, 'declined': self.declined,
+            'skipped': self.skipped, 'shed': self.shed, 'saturated': self.saturated,
+            'abandoned': self.abandoned,
+            'p50_seconds': round(self.percentile(0.5), 4),
+            'p95_seconds': round(self.percentile(0.95), 4),
+        }
+
+
+class ModelRouter:
+    """Routes each call type through its tiers, falling through on timeout or failure"""
+
+    def __init__(self, tiers: List[Tier], routes: Optional[Dict[str, List[str]]] = None,
+                 max_workers: int = 8, scheduler: Optional[LLMScheduler] = None):
+        self.tiers = {tier.name: tier for tier in tiers}
+        self.routes = {call_type: [name for name in route if name in self.tiers]
+                       for call_type, route in (routes or DEFAULT_ROUTES).items()}
+        self.stats = {name: TierStats() for name in self.tiers}
+        self.served_by: Dict[str, Dict[str, int]] = {}
+        self.scheduler = scheduler
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-router")
+        self._lock = threading.Lock()
+
+    def route(self, call_type: str) -> List[str]:
+        return self.routes.get(call_type) or self.routes.get('narration') or list(self.tiers)
+
+    def _count(self, name: str, outcome: str, elapsed: Optional[float] = None):
+        with self._lock:
+            stats = self.stats[name]
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            if elapsed is not None:
+                stats.latencies.append(elapsed)
+
+    def _submit(self, call_type: str, tier: Tier, messages: List, payload: Optional[str],
+                campaign: Optional[str]):
+        if tier.local is not None:
+            return self._executor.submit(tier.local, payload)
+        if self.scheduler is not None:
+            return self.scheduler.submit(call_type, tier.gateway, messages, campaign=campaign)
+        return self._executor.submit(tier.gateway, messages)
+
+    def _abandon(self, name: str, future):
+        """Drop a timed-out call if still queued; otherwise count it until its worker is free"""
+        if future.cancel():
+            return
+        with self._lock:
+            self.stats[name].abandoned += 1
+
+        def release(_):
+            with self._lock:
+                self.stats[name].abandoned -= 1
+
+        future.add_done_callback(release)
+
+    def __call__(self, call_type: str, messages: List, payload: Optional[str] = None,
+                 campaign: Optional[str] = None):
+        """Serve the request from the first tier that answers within its budget.
+
+        Raises LLMShed if the scheduler dropped the request (stale or refused optional work).
+        """
+        last_fallback = None
+        for name in self.route(call_type):
+            tier = self.tiers[name]
+            if tier.local is not None and payload is None:
+                self._count(name, 'skipped')
+                continue
+
+            limit = tier.max_abandoned
+            if limit is None:
+                limit = self.scheduler.workers if tier.gateway is not None and self.scheduler else self.max_workers
+            with self._lock:
+                saturated = self.stats[name].abandoned >= limit
+            if saturated:
+                self._count(name, 'saturated')
+                continue
+
+            self._count(name, 'calls')
+            start = time.perf_counter()
+            try:
+                # Abandon, rather than wait out, a tier that blows its budget (time queued counts)
+                future = self._submit(call_type, tier, messages, payload, campaign)
+                response = future.result(timeout=tier.timeout)
+                if tier.local is not None:
+                    if response is None:
+                        self._count(name, 'declined', time.perf_counter() - start)
+                        continue
+                    response = GatewayResponse(response, local=True)
+            except FutureTimeout:
+                self._abandon(name, future)
+                self._count(name, 'timeouts', time.perf_counter() - start)
+                continue
+            except LLMShed:
+                # A scheduling decision, not a provider failure: other tiers would be shed too
+                self._count(name, 'shed', time.perf_counter() - start)
+                raise
+            except Exception:
+                self._count(name, 'errors', time.perf_counter() - start)
+                continue
+
+            elapsed = time.perf_counter() - start
+            if getattr(response, 'fallback', False):
+                self._count(name, 'fallbacks', elapsed)
+                last_fallback = response
+                continue
+
+            self._count(name, 'served', elapsed)
+            with self._lock:
+                by_tier = self.served_by.setdefault(call_type, {})
+                by_tier[name] = by_tier.get(name, 0) + 1
+            return response
+        return last_fallback or GatewayResponse(FALLBACK_TEXT, fallback=True)
+
+    def report(self) -> Dict:
+        """Per-tier latency/outcomes and which tier served each call type"""
+        with self._lock:
+            return {
+                'tiers': {name: stats.to_dict() for name, stats in self.stats.items()},
+                'served_by': {call_type: dict(counts) for call_type, counts in self.served_by.items()},
+            }
+
+
+def build_router(narrative: Callable, mechanics: Optional[Callable] = None,
+                 classifier: Optional[Callable[[str], Optional[str]]] = None,
+                 budgets: Optional[Dict[str, float]] = None,
+                 routes: Optional[Dict[str, List[str]]] = None,
+                 scheduler: Optional[LLMScheduler] = None) -> ModelRouter:
+    """Standard router: big model, cheap model, keyword heuristics, and an optional trained classifier"""
+    budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+    tiers = [
+        Tier('narrative', gateway=narrative, timeout=budgets['narrative']),
+        Tier('mechanics', gateway=mechanics or narrative, timeout=budgets['mechanics']),
+        Tier('local', local=local_roll_check, timeout=budgets['local']),
+    ]
+    if classifier is not None:
+        # e.g. RollClassifier: answers confident roll checks, returns None to defer to the LLM
+        tiers.append(Tier('classifier', local=classifier, timeout=budgets['classifier']))
+    return ModelRouter(tiers, routes, scheduler=scheduler)
+
+
+# Example usage
+if __name__ == "__main__":
+    from langchain.schema import HumanMessage
+    from LLMGateway import FaultyLLMStub, LLMGateway, RetryPolicy
+
+    # Slow, occasionally hanging big model; fast cheap model
+    big = FaultyLLMStub("The vault door groans open...", latency=0.05, hang_rate=0.2, hang_seconds=1.0, seed=3)
+    small = FaultyLLMStub('{"requires_roll": true, "ability": "dex", "dc": 15, "action_description": "pick the lock"}',
+                          latency=0.005, error_rate=0.1, seed=4)
+    single = RetryPolicy(max_attempts=1)
+    router = build_router(narrative=LLMGateway(big, rate_per_second=1000, retry=single),
+                          mechanics=LLMGateway(small, rate_per_second=1000, retry=single),
+                          budgets={'narrative': 0.3, 'mechanics': 0.1})
+
+    start = time.perf_counter()
+    for i in range(50):
+        router('roll_check', [HumanMessage(content=f"turn {i}: check")], payload="I try to pick the lock")
+        router('narration', [HumanMessage(content=f"turn {i}: narrate")])
+    elapsed = time.perf_counter() - start
+    print(f"100 routed calls in {elapsed:.2f}s")
+    print(json.dumps(router.report(), indent=2))
+    print("local roll check:", local_roll_check("I try to climb the icy wall"))
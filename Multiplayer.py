@@ -0,0 +1,229 @@
+"""Multiplayer rounds: every player's action resolved with one LLM call.
+
+Players submit one action per round. Each action is validated by that player's own
+ActionValidator, dice are rolled locally (DCAnalyzer suggests the DC), and the DM
+narrates the whole round in a single request, so LLM calls per round stay constant
+as the party grows.
+
+RoundServer is a local asyncio stand-in for a WebSocket server: each connection
+gets a queue of JSON-ready messages pushed as rounds resolve.
+
+Usage:
+    state = MultiplayerState(..., players={'p1': theron, 'p2': lyra})
+    batcher = RoundBatcher(dm)
+    batcher.submit('p1', "I attack the goblin")
+    batcher.submit('p2', "I search the chest")
+    narration, actions = batcher.resolve_round(state)
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import dice
+from ActionAnalysis import analyze
+from ActionValidator import ActionValidator
+from CampaignState import CampaignState
+from ContextManager import ContextManager, context_for_scene_type
+from IntentAnalyzer import intent_definitions
+from Player import Character
+from PlayerActionAnalyzer import PlayerActionAnalyzer
+
+
+@dataclass
+class MultiplayerState(CampaignState):
+    """Campaign state shared by several player characters"""
+    players: Dict[str, Character] = field(default_factory=dict)
+    round_count: int = 0
+
+    def context_sections(self) -> List[Tuple[str, str]]:
+        sections = super().context_sections()
+        others = [c.to_context(include_backstory=False).strip()
+                  for c in self.players.values() if c is not self.player_character]
+        if others:
+            sections.insert(2, ('players', "Other Player Characters:\n" + "\n".join(others)))
+        return sections
+
+
+@dataclass
+class PlayerAction:
+    """One player's submission for a round and how it resolved"""
+    player_id: str
+    text: str
+    valid: bool = False
+    reason: str = ""
+    intent: Optional[str] = None
+    roll: Optional[Dict] = None
+
+    def summary(self, character: Character) -> str:
+        line = f"- {character.name}: \"{self.text}\""
+        if not self.valid:
+            return line + f" -> not possible ({self.reason})"
+        if self.roll:
+            r = self.roll
+            outcome = "SUCCESS" if r['success'] else "FAILURE"
+            line += (f" -> {r['ability'].upper()} check: rolled {r['roll']}{r['modifier']:+d} "
+                     f"= {r['roll'] + r['modifier']} vs DC {r['dc']} ({outcome}"
+                     f"{', critical' if r['critical'] else ''})")
+        return line
+
+
+class RoundBatcher:
+    """Collects one action per player and resolves the round in a single LLM call"""
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.validators: Dict[str, ActionValidator] = {}
+        self.actions: Dict[str, PlayerAction] = {}
+
+    def validator_for(self, player_id: str) -> ActionValidator:
+        if player_id not in self.validators:
+            self.validators[player_id] = ActionValidator(ContextManager())
+        return self.validators[player_id]
+
+    def submit(self, player_id: str, text: str) -> PlayerAction:
+        """Record (or replace) a player's action for the current round"""
+        action = PlayerAction(player_id, text)
+        self.actions[player_id] = action
+        return action
+
+    def ready(self, state: MultiplayerState) -> bool:
+        return all(pid in self.actions for pid in state.players)
+
+    def take_actions(self) -> Dict[str, PlayerAction]:
+        """This round's actions; submissions from now on go to the next round"""
+        actions, self.actions = self.actions, {}
+        return actions
+
+    def _resolve_locally(self, action: PlayerAction, character: Character, context: str):
+        validator = self.validator_for(action.player_id)
+        validator.context_manager.set_context(context)
+        result = validator.validate_action(action.text)
+        action.valid = result['valid']
+        action.reason = result['reason']
+        action.intent = result.get('intent')
+        if not action.valid:
+            return
+
+        intents = [i['intent'] for i in result['intents']] if result['status'] == 'multi_intent' else [action.intent]
+        definitions = intent_definitions()
+        rolling = [i for i in intents if definitions.get(i, {}).get('requires_roll')]
+        if not rolling:
+            return
+
+        ability = PlayerActionAnalyzer.INTENT_TO_ABILITY.get(rolling[0], 'str')
+        dc = analyze(action.text).dc
+        roll, mod, success, critical = dice.resolve_check(character.stats.get(ability, 10), dc)
+        action.roll = {'ability': ability, 'dc': dc, 'roll': roll, 'modifier': mod,
+                       'success': success, 'critical': critical}
+
+    def resolve_round(self, state: MultiplayerState,
+                      submitted: Optional[Dict[str, PlayerAction]] = None) -> Tuple[str, List[PlayerAction]]:
+        """Validate, roll and narrate every submitted action with one LLM call.
+
+        submitted is a snapshot from take_actions(); by default the pending actions are taken here.
+        """
+        if submitted is None:
+            submitted = self.take_actions()
+        state.round_count += 1
+        state.turn_count += 1
+        self.agent.usage.start_turn(state.turn_count)
+        start = time.perf_counter()
+        try:
+            context = context_for_scene_type(state.current_scene.scene_type.value)
+            actions = [submitted[pid] for pid in state.players if pid in submitted]
+            for action in actions:
+                self._resolve_locally(action, state.players[action.player_id], context)
+
+            round_summary = "\n".join(a.summary(state.players[a.player_id]) for a in actions)
+            messages = self.agent._build_messages(state, (
+                f"Round {state.round_count}. The players act simultaneously; dice are already resolved:\n"
+                f"{round_summary}\n\n"
+                "Narrate the whole round as one scene, giving each character's action its outcome "
+                "exactly as resolved above. End by asking the party what they do next."))
+            narration = self.agent._call_llm(messages, 'narration', campaign=state.campaign_id).content
+        finally:
+            self.agent.usage.end_turn(time.perf_counter() - start)
+
+        self.agent.memory.chat_memory.add_user_message(round_summary)
+        self.agent.memory.chat_memory.add_ai_message(narration)
+        if self.agent.profiler is not None:
+            self.agent.profiler.on_turn(self.agent, state)
+
+        for validator in self.validators.values():
+            validator.context_manager.reset_turn()
+        return narration, actions
+
+
+class Connection:
+    """Server-side handle for one connected player (WebSocket stand-in)"""
+
+    def __init__(self, player_id: str):
+        self.player_id = player_id
+        self.outbox: asyncio.Queue = asyncio.Queue()
+
+    async def recv(self) -> Dict:
+        return await self.outbox.get()
+
+
+class RoundServer:
+    """asyncio stand-in for the multiplayer WebSocket server"""
+
+    def __init__(self, batcher: RoundBatcher, state: MultiplayerState, round_timeout: float = 60.0):
+        self.batcher = batcher
+        self.state = state
+        self.round_timeout = round_timeout
+        self.connections: Dict[str, Connection] = {}
+        self._round_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    def connect(self, player_id: str) -> Connection:
+        if player_id not in self.state.players:
+            raise KeyError(f"Unknown player '{player_id}'")
+        connection = Connection(player_id)
+        self.connections[player_id] = connection
+        return connection
+
+    def disconnect(self, player_id: str):
+        self.connections.pop(player_id, None)
+
+    async def broadcast(self, message: Dict):
+        for connection in list(self.connections.values()):
+            await connection.outbox.put(message)
+
+    async def submit(self, player_id: str, text: str):
+        """Receive a player's action; the round resolves once everyone has acted or time runs out"""
+        self.batcher.submit(player_id, text)
+        await self.broadcast({'type': 'submitted', 'player': player_id, 'round': self.state.round_count + 1})
+
+        if self.batcher.ready(self.state):
+            await self.resolve()
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._resolve_after_timeout())
+
+    async def _resolve_after_timeout(self):
+        await asyncio.sleep(self.round_timeout)
+        self._timer = None
+        if self.batcher.actions:
+            await self.resolve()
+
+    async def resolve(self):
+        async with self._round_lock:
+            if not self.batcher.actions:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            # Snapshot the round here: actions submitted while it is narrated belong to the next one
+            submitted = self.batcher.take_actions()
+            loop = asyncio.get_running_loop()
+            # The LLM call is synchronous; keep it off the event loop
+            narration, actions = await loop.run_in_executor(None, self.batcher.resolve_round, self.state, submitted)
+            await self.broadcast({
+                'type': 'round',
+                'round': self.state.round_count,
+                'narration': narration,
+                'actions': [{'player': a.player_id, 'text': a.text, 'valid': a.valid,
+                             'reason': a.reason, 'roll': a.roll} for a in actions],
+            })
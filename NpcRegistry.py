@@ -0,0 +1,291 @@
+"""NPC records with an inverted index for resolving mentions in player input.
+
+CampaignState.npcs_met is a free-form dict and Scene.npcs_present a list of
+strings, so "I ask the old smith about the caravan" only reaches the right
+NPC if the LLM re-reads everything. The registry keeps one record per NPC
+(name, aliases, descriptors, role, last-seen scene) and indexes every term:
+
+  - token index: term -> NPC ids, for exact words ("bram", "smith", "old")
+  - trigram index: trigram -> terms, for misspellings ("innkeper", "Marrta")
+
+resolve() scores NPCs by the terms a text mentions: name/alias words weigh 2,
+descriptor and role words 1, an NPC in the current scene gets +1, and an NPC
+needs 2 to count as mentioned. Only the matching dossiers go into the prompt.
+Records and indexes are PMaps, so the registry forks in O(1) with the state.
+
+Usage:
+    state.npcs.meet("Innkeeper Bram", descriptors=["old", "bald"], role="innkeeper",
+                    scene_id=scene.id, turn=state.turn_count)
+    state.npcs.resolve("I ask the old innkeper about the caravan", scene=state.current_scene)
+"""
+
+import re
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from PersistentCollections import PMap
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+# Words that never identify anyone
+STOPWORDS = frozenset("""
+a an the and or but of to in on at by for with from into onto about over under near i me my we us our you your
+he him his she her they them their it its this that these those is are was were be been am do does did
+ask tell talk speak say look see go walk give take who what where when why how all any some one
+""".split())
+
+NAME_WEIGHT, DESCRIPTOR_WEIGHT, PRESENT_BONUS, THRESHOLD = 2, 1, 1, 2
+FUZZY_MIN_LENGTH, FUZZY_MIN_SIMILARITY = 4, 0.45
+
+
+def terms(text: str) -> List[str]:
+    """Lowercase words of a text, without stopwords and possessive 's"""
+    words = (word[:-2] if word.endswith("'s") else word.strip("'") for word in _WORD.findall(text.lower()))
+    return [word for word in words if word and word not in STOPWORDS]
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def npc_id(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+@dataclass(frozen=True)
+class Npc:
+    """One NPC; replaced (never edited) on update so forks can share records"""
+    name: str
+    aliases: Tuple[str, ...] = ()
+    descriptors: Tuple[str, ...] = ()
+    role: str = ""
+    disposition: str = ""
+    notes: str = ""
+    first_met_turn: int = 0
+    last_seen_scene: Optional[str] = None
+    last_seen_turn: int = 0
+
+    @property
+    def id(self) -> str:
+        return npc_id(self.name)
+
+    def weighted_terms(self) -> Dict[str, int]:
+        weights = {}
+        for text, weight in ([(self.role, DESCRIPTOR_WEIGHT)]
+                             + [(d, DESCRIPTOR_WEIGHT) for d in self.descriptors]
+                             + [(n, NAME_WEIGHT) for n in (self.name,) + self.aliases]):
+            for term in terms(text):
+                weights[term] = max(weights.get(term, 0), weight)
+        return weights
+
+    def dossier(self, scene_title: Optional[str] = None) -> str:
+        line = self.name
+        if self.aliases:
+            line += f" (aka {', '.join(self.aliases)})"
+        details = [d for d in (self.role, ", ".join(self.descriptors), self.disposition, self.notes) if d]
+        if details:
+            line += ": " + "; ".join(details)
+        if self.last_seen_scene is not None:
+            line += f". Last seen at {scene_title or self.last_seen_scene}, turn {self.last_seen_turn}"
+        return line
+
+
+class NpcRegistry:
+    """NPC records by id, with token and trigram indexes over their names and descriptors"""
+
+    def __init__(self):
+        self._npcs: PMap = PMap()        # id -> Npc
+        self._tokens: PMap = PMap()      # term -> ((npc id, weight), ...)
+        self._trigrams: PMap = PMap()    # trigram -> terms (tuple)
+
+    def fork(self) -> "NpcRegistry":
+        clone = NpcRegistry.__new__(NpcRegistry)
+        clone._npcs, clone._tokens, clone._trigrams = (
+            self._npcs.fork(), self._tokens.fork(), self._trigrams.fork())
+        return clone
+
+    def __len__(self) -> int:
+        return len(self._npcs)
+
+    def __contains__(self, name: str) -> bool:
+        return npc_id(name) in self._npcs
+
+    def __iter__(self):
+        return iter(self._npcs.values())
+
+    def get(self, name: str) -> Optional[Npc]:
+        return self._npcs.get(npc_id(name))
+
+    # ========================================================================
+    # RECORDS
+    # ========================================================================
+
+    def meet(self, name: str, aliases: Iterable[str] = (), descriptors: Iterable[str] = (), role: str = "",
+             disposition: str = "", notes: str = "", scene_id: Optional[str] = None, turn: int = 0) -> Npc:
+        """Add an NPC, or merge new aliases/descriptors/details into the existing record"""
+        existing = self.get(name)
+        if existing is None:
+            npc = Npc(name.strip(), tuple(aliases), tuple(descriptors), role, disposition, notes,
+                      first_met_turn=turn, last_seen_scene=scene_id, last_seen_turn=turn)
+        else:
+            npc = replace(
+                existing,
+                aliases=existing.aliases + tuple(a for a in aliases if a not in existing.aliases),
+                descriptors=existing.descriptors + tuple(d for d in descriptors if d not in existing.descriptors),
+                role=role or existing.role,
+                disposition=disposition or existing.disposition,
+                notes=notes or existing.notes,
+                last_seen_scene=scene_id or existing.last_seen_scene,
+                last_seen_turn=turn if scene_id else existing.last_seen_turn,
+            )
+        self._store(existing, npc)
+        return npc
+
+    def meet_cast(self, records: Iterable[Dict], turn: int = 0):
+        """Meet a campaign template's NPCs: {'name', 'role', 'descriptors', 'description', 'scene'} each"""
+        for record in records:
+            self.meet(record['name'], descriptors=record.get('descriptors', ()), role=record.get('role', ""),
+                      notes=record.get('description', ""), scene_id=record.get('scene'), turn=turn)
+
+    def seen(self, name: str, scene_id: str, turn: int) -> Npc:
+        """Record a sighting (meeting the NPC if new)"""
+        existing = self.get(name)
+        if existing is None:
+            return self.meet(name, scene_id=scene_id, turn=turn)
+        npc = replace(existing, last_seen_scene=scene_id, last_seen_turn=turn)
+        self._npcs[npc.id] = npc
+        return npc
+
+    def _store(self, previous: Optional[Npc], npc: Npc):
+        old_terms = previous.weighted_terms() if previous is not None else {}
+        new_terms = npc.weighted_terms()
+        for term in old_terms:
+            if term not in new_terms or new_terms[term] != old_terms[term]:
+                self._unindex(term, npc.id)
+        for term, weight in new_terms.items():
+            if old_terms.get(term) != weight:
+                self._index(term, npc.id, weight)
+        self._npcs[npc.id] = npc
+
+    def _index(self, term: str, ident: str, weight: int):
+        entries = self._tokens.get(term)
+        if entries is None:
+            for gram in trigrams(term):
+                self._trigrams[gram] = self._trigrams.get(gram, ()) + (term,)
+            entries = ()
+        self._tokens[term] = entries + ((ident, weight),)
+
+    def _unindex(self, term: str, ident: str):
+        entries = tuple(e for e in self._tokens.get(term, ()) if e[0] != ident)
+        if entries:
+            self._tokens[term] = entries
+            return
+        self._tokens.pop(term, None)
+        for gram in trigrams(term):
+            remaining = tuple(t for t in self._trigrams.get(gram, ()) if t != term)
+            if remaining:
+                self._trigrams[gram] = remaining
+            else:
+                self._trigrams.pop(gram, None)
+
+    # ========================================================================
+    # RESOLUTION
+    # ========================================================================
+
+    def _fuzzy(self, word: str) -> Optional[str]:
+        """Closest indexed term by trigram similarity (Jaccard), if close enough"""
+        grams = trigrams(word)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for term in self._trigrams.get(gram, ()):
+                shared[term] = shared.get(term, 0) + 1
+        best, best_score = None, FUZZY_MIN_SIMILARITY
+        for term, count in shared.items():
+            score = count / (len(grams) + len(term) + 1 - count)   # a term has len + 1 trigrams
+            if score >= best_score:
+                best, best_score = term, score
+        return best
+
+    def resolve(self, text: str, scene=None, limit: int = 5) -> List[Tuple[Npc, int]]:
+        """NPCs a text refers to, best first, as (record, score)"""
+        scores: Dict[str, int] = {}
+        for word in dict.fromkeys(terms(text)):
+            entries = self._tokens.get(word)
+            if entries is None and len(word) >= FUZZY_MIN_LENGTH:
+                match = self._fuzzy(word)
+                entries = self._tokens.get(match) if match is not None else None
+            for ident, weight in entries or ():
+                scores[ident] = scores.get(ident, 0) + weight
+        if not scores:
+            return []
+
+        if scene is not None:
+            for name in scene.npcs_present:
+                ident = npc_id(name)
+                if ident in scores:
+                    scores[ident] += PRESENT_BONUS
+        ranked = sorted((ident for ident, score in scores.items() if score >= THRESHOLD),
+                        key=lambda ident: -scores[ident])
+        return [(self._npcs[ident], scores[ident]) for ident in ranked[:limit]]
+
+    def dossiers(self, npcs: Iterable[Npc], scenes=None) -> str:
+        """Prompt section text for the given NPCs (scene titles from a SceneStore if given)"""
+        lines = []
+        for npc in npcs:
+            scene = scenes.get(npc.last_seen_scene) if scenes is not None and npc.last_seen_scene else None
+            lines.append("- " + npc.dossier(scene.title if scene is not None else None))
+        return "=== NPCS MENTIONED ===\n" + "\n".join(lines) if lines else ""
+
+
+# Example usage / benchmark
+if __name__ == "__main__":
+    import random
+    import time
+
+    registry = NpcRegistry()
+    registry.meet("Innkeeper Bram", descriptors=["old", "bald", "gruff"], role="innkeeper",
+                  disposition="friendly", notes="Knows the caravan route", scene_id="rusty_lantern", turn=3)
+    registry.meet("Hilda Stonearm", descriptors=["old", "one-eyed"], role="blacksmith", aliases=["the smith"],
+                  scene_id="forge", turn=5)
+    registry.meet("Captain Redmaw", role="bandit leader", descriptors=["scarred"], scene_id="camp", turn=9)
+    for text in ("I ask the old smith about the caravan", "I buy Bram a drink",
+                 "I ask the innkeper what he knows", "I threaten the scarred bandit", "I look around"):
+        print(f"{text!r:45} -> {[(npc.name, score) for npc, score in registry.resolve(text)]}")
+    print(registry.dossiers(npc for npc, _ in registry.resolve("the old smith")))
+
+    # A campaign template's cast, as start_campaign registers it
+    from CampaignTemplate import TemplateLibrary
+    cast = NpcRegistry()
+    cast.meet_cast(TemplateLibrary().find("The Missing Caravan").npcs())
+    for text in ("I threaten the scarred bandit", "I ask the gruff tavern owner for a room", "I follow the hooded scout"):
+        print(f"{text!r:45} -> {[(npc.name, score) for npc, score in cast.resolve(text)]}")
+
+    # A campaign with thousands of NPCs: resolution stays well under a millisecond
+    rng = random.Random(4)
+    syllables = ["bra", "mor", "el", "wyn", "tha", "dor", "ka", "ris", "val", "len", "gar", "ith", "os", "ur"]
+    roles = ["smith", "guard", "merchant", "priest", "farmer", "innkeeper", "sailor", "scholar", "hunter"]
+    looks = ["old", "young", "tall", "scarred", "bald", "red-haired", "one-eyed", "hooded", "limping"]
+    big = NpcRegistry()
+    names = []
+    for i in range(5000):
+        name = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).title() + f" {i}"
+        names.append(name)
+        big.meet(name, descriptors=rng.sample(looks, 2), role=rng.choice(roles), scene_id=f"s{i % 50}", turn=i)
+    inputs = [f"I ask {rng.choice(names).split()[0]} about the {rng.choice(roles)}" for _ in range(500)]
+    inputs += [f"I ask the {rng.choice(looks)} {rng.choice(roles)} about the road" for _ in range(500)]
+    start = time.perf_counter()
+    for text in inputs:
+        big.resolve(text)
+    elapsed = (time.perf_counter() - start) / len(inputs)
+
+    def scan(text: str):
+        """The alternative: check every NPC record against the input"""
+        words = set(terms(text))
+        return [npc for npc in big if words & set(npc.weighted_terms())]
+
+    start = time.perf_counter()
+    for text in inputs[:20]:
+        scan(text)
+    scanned = (time.perf_counter() - start) / 20
+    print(f"5000 NPCs: resolve {elapsed * 1e6:.0f} us per input (index) vs {scanned * 1e3:.1f} ms (scan)")
@@ -0,0 +1,168 @@
+"""AI party member interjections generated alongside the DM narrative.
+
+Which companions act this turn is decided by cheap local rules (named by the
+player, relevant to their class, combat, or quiet for too long). Their lines are
+requested in the same narration call using a tagged format, so adding companions
+adds a few prompt lines rather than extra LLM calls.
+
+Tagged output format (after the DM narration):
+    @Lyra Whisperwind: "Stay back, something's wrong." | nocks an arrow
+
+Usage:
+    director = PartyDirector()
+    acting = director.select(player_input, state)
+    prompt = player_input + director.instructions(acting)
+    turn = director.parse(llm_response, acting)
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from ActionAnalysis import analyze
+from Party import PartyMember
+
+# Class -> words in the player's input that make that companion want to chime in
+CLASS_INTERESTS = {
+    'wizard': ['magic', 'spell', 'arcane', 'rune', 'book', 'scroll', 'enchant', 'ritual'],
+    'sorcerer': ['magic', 'spell', 'arcane', 'power', 'enchant'],
+    'warlock': ['magic', 'pact', 'spell', 'curse', 'demon', 'fiend'],
+    'cleric': ['heal', 'wound', 'pray', 'god', 'undead', 'temple', 'bless'],
+    'paladin': ['oath', 'honor', 'justice', 'undead', 'protect', 'evil'],
+    'druid': ['nature', 'animal', 'forest', 'plant', 'beast'],
+    'ranger': ['track', 'trail', 'hunt', 'forest', 'search', 'scout', 'bow', 'beast'],
+    'rogue': ['lock', 'trap', 'sneak', 'steal', 'hide', 'pick', 'shadow', 'coin'],
+    'bard': ['persuade', 'convince', 'talk', 'song', 'story', 'charm', 'negotiate'],
+    'fighter': ['attack', 'fight', 'weapon', 'sword', 'guard', 'battle'],
+    'barbarian': ['attack', 'smash', 'break', 'fight', 'rage', 'charge'],
+    'monk': ['fight', 'balance', 'meditate', 'climb', 'jump'],
+}
+
+_TAG_PATTERN = re.compile(r'^\s*@\s*([^:]+?)\s*:\s*(.*)$')
+
+# What models write in the action slot when a companion only speaks
+_NO_ACTION = {"", "nothing", "none", "no action", "n/a", "-"}
+
+
+@dataclass
+class Interjection:
+    """One companion's line and/or action for the turn"""
+    name: str
+    line: str = ""
+    action: str = ""
+
+    def render(self) -> str:
+        if self.line and self.action:
+            return f"{self.name} {self.action}: \"{self.line}\""
+        if self.line:
+            return f"{self.name}: \"{self.line}\""
+        return f"{self.name} {self.action}."
+
+
+@dataclass
+class PartyTurn:
+    narration: str
+    interjections: List[Interjection] = field(default_factory=list)
+
+    def render(self) -> str:
+        if not self.interjections:
+            return self.narration
+        return self.narration + "\n\n" + "\n".join(i.render() for i in self.interjections)
+
+
+class PartyDirector:
+    """Chooses which PartyMembers act and folds their lines into the narration request"""
+
+    def __init__(self, max_speakers: int = 2, cooldown_turns: int = 2, quiet_turns: int = 4):
+        self.max_speakers = max_speakers
+        self.cooldown_turns = cooldown_turns
+        self.quiet_turns = quiet_turns
+        self.last_acted: Dict[str, int] = {}
+        self._fragments: Dict[Tuple[str, str, str, str, str], str] = {}
+
+    @staticmethod
+    def _first_name(member: PartyMember) -> str:
+        return member.name.split()[0].lower()
+
+    def select(self, player_input: str, state) -> List[PartyMember]:
+        """Pick this turn's speakers with local rules only"""
+        members = state.party_members
+        if not members:
+            return []
+
+        analysis = analyze(player_input)
+        text, words = analysis.lower, analysis.word_set
+        turn = state.turn_count
+        in_combat = state.current_scene.scene_type.value == 'combat'
+        scored = []
+        for order, member in enumerate(members):
+            last = self.last_acted.get(member.name, 0)
+            score = 0
+            if self._first_name(member) in words or member.name.lower() in text:
+                score += 100  # Addressed directly: always answers
+            elif turn - last <= self.cooldown_turns:
+                continue
+            if in_combat:
+                score += 10
+            interests = CLASS_INTERESTS.get(member.char_class.lower(), [])
+            score += 5 * sum(1 for word in interests if word in words)
+            if turn - last > self.quiet_turns:
+                score += 3
+            if score > 0:
+                # Quietest companion wins ties
+                scored.append((score, -last, -order, member))
+
+        scored.sort(key=lambda item: item[:3], reverse=True)
+        acting = [member for *_, member in scored[:self.max_speakers]]
+        for member in acting:
+            self.last_acted[member.name] = turn
+        return acting
+
+    def personality_fragment(self, member: PartyMember) -> str:
+        """Prompt fragment for one companion, cached until their sheet changes"""
+        key = (member.name, member.race, member.char_class, member.personality, member.relationship_with_player)
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            fragment = (f"- {member.name} ({member.race} {member.char_class}): {member.personality}. "
+                        f"Relationship with the player: {member.relationship_with_player}.")
+            self._fragments[key] = fragment
+        return fragment
+
+    def instructions(self, acting: List[PartyMember]) -> str:
+        """Extra request text asking for companion lines in the same generation"""
+        if not acting:
+            return ""
+        fragments = "\n".join(self.personality_fragment(m) for m in acting)
+        return ("\n\n=== PARTY MEMBERS ACTING THIS TURN ===\n"
+                f"{fragments}\n"
+                "After your narration, add one line per companion above, in character, exactly as:\n"
+                "@<Name>: \"<what they say>\" | <short action>\n"
+                "Leave out the \" | <short action>\" part if they only speak.\n"
+                "Do not include these lines inside the narration itself.")
+
+    def parse(self, response: str, acting: List[PartyMember]) -> PartyTurn:
+        """Split a tagged response into narration and companion interjections"""
+        if not acting:
+            return PartyTurn(response)
+
+        names = {m.name.lower(): m.name for m in acting}
+        names.update({self._first_name(m): m.name for m in acting})
+        narration_lines = []
+        interjections: Dict[str, Interjection] = {}
+        for raw in response.splitlines():
+            match = _TAG_PATTERN.match(raw)
+            name = names.get(match.group(1).lower()) if match else None
+            if name is None:
+                narration_lines.append(raw)
+                continue
+            line, _, action = match.group(2).partition("|")
+            action = action.strip().rstrip('.').strip()
+            if action.lower() in _NO_ACTION:
+                action = ""
+            line = line.strip().strip('"').strip()
+            if not line and not action:
+                continue   # "@Lyra: | nothing": the companion neither speaks nor acts
+            interjections[name] = Interjection(name, line, action)
+
+        ordered = [interjections[m.name] for m in acting if m.name in interjections]
+        return PartyTurn("\n".join(narration_lines).strip(), ordered)
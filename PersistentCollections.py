@@ -0,0 +1,399 @@
+"""Persistent (structurally shared) vector and map for forkable campaign state.
+
+PVector is a 32-way bit-partitioned trie with a tail buffer; PMap is a hash
+array mapped trie (HAMT). Both are mutable handles over an immutable-by-default
+tree: fork() hands out a second handle to the same tree in O(1), and a write
+copies only the nodes on its path (O(log32 n)), so a branch costs memory in
+proportion to how far it diverges. Nodes carry an owner token, so a handle that
+has not been forked appends and updates in place, as a list or dict would.
+
+PVector behaves like a list (indexing, slicing, iteration, `in`, append,
+extend, item assignment); PMap is a MutableMapping whose iteration order
+follows key hashes rather than insertion.
+
+Usage:
+    decisions = PVector()
+    decisions.append({"turn": 1})
+    what_if = decisions.fork()        # O(1); shares every node
+    what_if.append({"turn": 2})       # copies one tail node
+"""
+
+from collections.abc import MutableMapping, Sequence
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
+
+
+class _Node:
+    """Trie node: `items` is edited in place only by the handle that owns it"""
+    __slots__ = ('owner', 'items')
+
+    def __init__(self, owner, items: List):
+        self.owner = owner
+        self.items = items
+
+
+# ============================================================================
+# PERSISTENT VECTOR
+# ============================================================================
+
+class PVector(Sequence):
+    """List-like persistent vector with O(1) fork()"""
+
+    __slots__ = ('_owner', '_count', '_shift', '_root', '_tail')
+
+    def __init__(self, items: Iterable = ()):
+        self._owner = object()
+        self._count = 0
+        self._shift = _BITS
+        self._root = _Node(self._owner, [])
+        self._tail = _Node(self._owner, [])
+        self.extend(items)
+
+    def fork(self) -> "PVector":
+        """Second handle on the same contents; either side's later writes copy what they touch"""
+        clone = PVector.__new__(PVector)
+        clone._count, clone._shift, clone._root, clone._tail = self._count, self._shift, self._root, self._tail
+        # Nodes owned so far are now shared: neither handle may edit them in place
+        self._owner, clone._owner = object(), object()
+        return clone
+
+    def _editable(self, node: _Node) -> _Node:
+        return node if node.owner is self._owner else _Node(self._owner, list(node.items))
+
+    def _tail_offset(self) -> int:
+        return self._count - len(self._tail.items)
+
+    def _leaf(self, i: int) -> List:
+        if i >= self._tail_offset():
+            return self._tail.items
+        node = self._root
+        for level in range(self._shift, 0, -_BITS):
+            node = node.items[(i >> level) & _MASK]
+        return node.items
+
+    def _index(self, i: int) -> int:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("PVector index out of range")
+        return i
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        i = self._index(i)
+        return self._leaf(i)[i & _MASK]
+
+    def __iter__(self) -> Iterator:
+        tail_offset = self._tail_offset()
+        for start in range(0, tail_offset, _WIDTH):
+            yield from self._leaf(start)
+        yield from self._tail.items
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"PVector({list(self)!r})"
+
+    def append(self, value: Any):
+        if len(self._tail.items) < _WIDTH:
+            self._tail = self._editable(self._tail)
+            self._tail.items.append(value)
+            self._count += 1
+            return
+
+        # Tail is full: push it into the trie (growing a level if the root is full)
+        full_tail = self._tail
+        if (self._count >> _BITS) > (1 << self._shift):
+            self._root = _Node(self._owner, [self._root, self._new_path(self._shift, full_tail)])
+            self._shift += _BITS
+        else:
+            self._root = self._push_tail(self._shift, self._root, full_tail)
+        self._tail = _Node(self._owner, [value])
+        self._count += 1
+
+    def extend(self, values: Iterable):
+        for value in values:
+            self.append(value)
+
+    def _new_path(self, level: int, node: _Node) -> _Node:
+        while level:
+            node = _Node(self._owner, [node])
+            level -= _BITS
+        return node
+
+    def _push_tail(self, level: int, parent: _Node, tail: _Node) -> _Node:
+        parent = self._editable(parent)
+        sub = ((self._count - 1) >> level) & _MASK
+        if level == _BITS:
+            child = tail
+        elif sub < len(parent.items):
+            child = self._push_tail(level - _BITS, parent.items[sub], tail)
+        else:
+            child = self._new_path(level - _BITS, tail)
+        if sub < len(parent.items):
+            parent.items[sub] = child
+        else:
+            parent.items.append(child)
+        return parent
+
+    def __setitem__(self, i: int, value: Any):
+        i = self._index(i)
+        if i >= self._tail_offset():
+            self._tail = self._editable(self._tail)
+            self._tail.items[i & _MASK] = value
+            return
+        self._root = self._set(self._shift, self._root, i, value)
+
+    def _set(self, level: int, node: _Node, i: int, value: Any) -> _Node:
+        node = self._editable(node)
+        if level == 0:
+            node.items[i & _MASK] = value
+        else:
+            sub = (i >> level) & _MASK
+            node.items[sub] = self._set(level - _BITS, node.items[sub], i, value)
+        return node
+
+
+# ============================================================================
+# PERSISTENT MAP (HAMT)
+# ============================================================================
+
+class _Bitmap(_Node):
+    """HAMT branch: one item per set bit; an item is a (key, value) tuple or a child node"""
+    __slots__ = ('bitmap',)
+
+    def __init__(self, owner, bitmap: int, items: List):
+        super().__init__(owner, items)
+        self.bitmap = bitmap
+
+
+class _Collision(_Node):
+    """Keys whose full hashes are equal: a flat list of (key, value) tuples"""
+    __slots__ = ()
+
+
+def _hash(key) -> int:
+    return hash(key) & _HASH_MASK
+
+
+class PMap(MutableMapping):
+    """Dict-like persistent hash map with O(1) fork()"""
+
+    __slots__ = ('_owner', '_root', '_count')
+
+    def __init__(self, items=()):
+        self._owner = object()
+        self._root = _Bitmap(self._owner, 0, [])
+        self._count = 0
+        self.update(items)
+
+    def fork(self) -> "PMap":
+        """Second handle on the same contents; either side's later writes copy what they touch"""
+        clone = PMap.__new__(PMap)
+        clone._root, clone._count = self._root, self._count
+        self._owner, clone._owner = object(), object()
+        return clone
+
+    def _editable(self, node: _Node) -> _Node:
+        if node.owner is self._owner:
+            return node
+        if isinstance(node, _Bitmap):
+            return _Bitmap(self._owner, node.bitmap, list(node.items))
+        return _Collision(self._owner, list(node.items))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, key):
+        h, shift, node = _hash(key), 0, self._root
+        while True:
+            if isinstance(node, _Collision):
+                for k, v in node.items:
+                    if k is key or k == key:
+                        return v
+                raise KeyError(key)
+            bit = 1 << ((h >> shift) & _MASK)
+            if not node.bitmap & bit:
+                raise KeyError(key)
+            item = node.items[(node.bitmap & (bit - 1)).bit_count()]
+            if type(item) is tuple:
+                if item[0] is key or item[0] == key:
+                    return item[1]
+                raise KeyError(key)
+            node, shift = item, shift + _BITS
+
+    def __iter__(self) -> Iterator:
+        stack = [self._root]
+        while stack:
+            for item in stack.pop().items:
+                if type(item) is tuple:
+                    yield item[0]
+                else:
+                    stack.append(item)
+
+    def __repr__(self) -> str:
+        return f"PMap({dict(self.items())!r})"
+
+    def __setitem__(self, key, value):
+        self._root, added = self._assoc(self._root, 0, _hash(key), key, value)
+        self._count += added
+
+    def _assoc(self, node: _Node, shift: int, h: int, key, value) -> Tuple[_Node, bool]:
+        if isinstance(node, _Collision):
+            for idx, (k, v) in enumerate(node.items):
+                if k is key or k == key:
+                    node = self._editable(node)
+                    node.items[idx] = (key, value)
+                    return node, False
+            node = self._editable(node)
+            node.items.append((key, value))
+            return node, True
+
+        bit = 1 << ((h >> shift) & _MASK)
+        idx = (node.bitmap & (bit - 1)).bit_count()
+        if not node.bitmap & bit:
+            node = self._editable(node)
+            node.items.insert(idx, (key, value))
+            node.bitmap |= bit
+            return node, True
+
+        item = node.items[idx]
+        if type(item) is tuple:
+            if item[0] is key or item[0] == key:
+                if item[1] is value:
+                    return node, False
+                replacement, added = (key, value), False
+            else:
+                replacement, added = self._pair(shift + _BITS, item, h, key, value), True
+        else:
+            replacement, added = self._assoc(item, shift + _BITS, h, key, value)
+            if replacement is item:
+                return node, added
+        node = self._editable(node)
+        node.items[idx] = replacement
+        return node, added
+
+    def _pair(self, shift: int, existing: Tuple, h: int, key, value) -> _Node:
+        """Smallest subtree holding an existing entry and a new key"""
+        if shift >= _HASH_BITS:
+            return _Collision(self._owner, [existing, (key, value)])
+        node = _Bitmap(self._owner, 0, [])
+        node, _ = self._assoc(node, shift, _hash(existing[0]), *existing)
+        node, _ = self._assoc(node, shift, h, key, value)
+        return node
+
+    def __delitem__(self, key):
+        root, removed = self._dissoc(self._root, 0, _hash(key), key)
+        if not removed:
+            raise KeyError(key)
+        self._root = root if root is not None else _Bitmap(self._owner, 0, [])
+        self._count -= 1
+
+    def _dissoc(self, node: _Node, shift: int, h: int, key) -> Tuple[Optional[_Node], bool]:
+        if isinstance(node, _Collision):
+            for idx, (k, _) in enumerate(node.items):
+                if k is key or k == key:
+                    if len(node.items) == 1:
+                        return None, True
+                    node = self._editable(node)
+                    del node.items[idx]
+                    return node, True
+            return node, False
+
+        bit = 1 << ((h >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return node, False
+        idx = (node.bitmap & (bit - 1)).bit_count()
+        item = node.items[idx]
+        if type(item) is tuple:
+            if not (item[0] is key or item[0] == key):
+                return node, False
+            replacement = None
+        else:
+            replacement, removed = self._dissoc(item, shift + _BITS, h, key)
+            if not removed:
+                return node, False
+            # A child left holding a single entry is folded back into this node
+            if replacement is not None and len(replacement.items) == 1 and type(replacement.items[0]) is tuple:
+                replacement = replacement.items[0]
+
+        if replacement is None and len(node.items) == 1:
+            return None, True
+        node = self._editable(node)
+        if replacement is None:
+            del node.items[idx]
+            node.bitmap &= ~bit
+        else:
+            node.items[idx] = replacement
+        return node, True
+
+
+# Example usage
+if __name__ == "__main__":
+    import copy
+    import random
+    import time
+
+    # Randomised check against list/dict, with forks taken along the way
+    rng = random.Random(7)
+    vector, reference = PVector(), []
+    forks = []
+    for i in range(20000):
+        if rng.random() < 0.8 or not reference:
+            vector.append(i)
+            reference.append(i)
+        else:
+            j = rng.randrange(len(reference))
+            vector[j] = -i
+            reference[j] = -i
+        if i % 997 == 0:
+            forks.append((vector.fork(), list(reference)))
+    assert list(vector) == reference and vector[-1] == reference[-1] and vector[10:20] == reference[10:20]
+    assert all(list(f) == snapshot for f, snapshot in forks)
+
+    mapping, reference_map = PMap(), {}
+    map_forks = []
+    for i in range(20000):
+        key = rng.randrange(5000)
+        if rng.random() < 0.7:
+            mapping[key] = reference_map[key] = i
+        elif key in reference_map:
+            del mapping[key], reference_map[key]
+        if i % 997 == 0:
+            map_forks.append((mapping.fork(), dict(reference_map)))
+    assert mapping == reference_map and len(mapping) == len(reference_map)
+    assert all(f == snapshot for f, snapshot in map_forks)
+    print(f"checked {len(forks)} vector forks and {len(map_forks)} map forks against list/dict")
+
+    # Fork + small divergence vs deep copy, at growing history sizes (median of repeated runs)
+    def median_time(fn, runs):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return sorted(times)[runs // 2]
+
+    def diverge(history, n):
+        branch = history.fork()
+        branch.append({"turn": n})
+        branch[0] = {"turn": 0, "decision": "changed"}
+
+    for n in (1000, 10000, 100000):
+        history = PVector({"turn": t, "decision": f"choice {t}"} for t in range(n))
+        plain = list(history)
+        deep = median_time(lambda: copy.deepcopy(plain), 3)
+        forked = median_time(lambda: diverge(history, n), 101)
+        print(f"{n:>6} items: deepcopy {deep * 1000:8.2f} ms | fork + 2 writes {forked * 1e6:6.1f} us")
@@ -17,14 +17,16 @@ class Character:
     hp_current: int
     hp_max: int
     
-    def to_context(self) -> str:
+    def to_context(self, include_backstory: bool = True) -> str:
         """Convert character to context string for LLM"""
-        return f"""
+        context = f"""
             Character: {self.name}
             Race: {self.race} | Class: {self.char_class} | Level: {self.level}
             Background: {self.background} | Alignment: {self.alignment}
             Stats: STR {self.stats['str']}, DEX {self.stats['dex']}, CON {self.stats['con']}, 
                 INT {self.stats['int']}, WIS {self.stats['wis']}, CHA {self.stats['cha']}
             HP: {self.hp_current}/{self.hp_max}
-            Backstory: {self.backstory}
-            """
\ No newline at end of file
+            """
+        if include_backstory:
+            context += f"Backstory: {self.backstory}\n"
+        return context
\ No newline at end of file
@@ -64,10 +64,11 @@ class PlayerActionAnalyzer:
         return 'other'
 
     @staticmethod
-    def analyze_action(text: str) -> dict:
+    def analyze_action(text: str, dc: int = None) -> dict:
         intent = PlayerActionAnalyzer.find_intent(text)
         ability = PlayerActionAnalyzer.INTENT_TO_ABILITY.get(intent, 'str')
-        dc = DCAnalyzer.suggest_dc(text)
+        if dc is None:
+            dc, _ = DCAnalyzer.suggest_dc(text)
 
         # decide if this action should require a check
         requires_check = False
@@ -0,0 +1,284 @@
+"""Local roll-check classifier trained on the LLM's own recorded decisions.
+
+Every roll-check call answers "does this player input need a roll, which
+ability, what DC". DecisionLog appends those answers to a JSON-lines file;
+RollClassifier trains softmax regressions on them (hashed word n-grams plus
+IntentAnalyzer/DCAnalyzer features) and answers in-process in microseconds.
+Below the confidence threshold it declines and the roll check goes to the LLM
+as before (it is the first tier of the 'roll_check' route, see ModelRouter).
+
+Usage:
+    log = DecisionLog("logs/roll_decisions.jsonl")       # DungeonMasterAgent(decision_log=...)
+    clf = RollClassifier.train(log.read())
+    clf.save("models/roll_classifier.npz")
+    dm = DungeonMasterAgent(api_key, roll_classifier=RollClassifier.load("models/roll_classifier.npz"))
+
+Run this module with a decision log path to train and report held-out
+agreement with the LLM and the fraction of roll-check calls it eliminates.
+"""
+
+import json
+import os
+import re
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import dice
+from DcAnalyzer import DCAnalyzer
+from ActionAnalysis import analyze
+from IntentAnalyzer import INTENT_DEFINITIONS, intent_definitions
+
+ABILITIES = ('str', 'dex', 'con', 'int', 'wis', 'cha')
+HASH_BITS = 14
+_ATTEMPT = re.compile(r"\b(?:try|tries|trying|attempt|attempts)\b")
+_LEAD = re.compile(r"^\s*(?:i\s+)?(?:(?:try|attempt)\s+to\s+)?", re.IGNORECASE)
+# Feature layout is fixed by the intents known at import; intents added by a rule reload are not featurized
+_INTENTS = list(INTENT_DEFINITIONS)
+_INTENT_SLOTS = {intent: i for i, intent in enumerate(_INTENTS)}
+# Dense features after the hashed block: one flag per intent, roll-intent flag, DC hint, attempt flag, bias
+DENSE_FEATURES = len(_INTENTS) + 4
+
+
+class DecisionLog:
+    """Append-only JSON-lines log of roll-check decisions made by the LLM"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, player_input: str, decision: Dict, scene_type: str = ""):
+        requires_roll = bool(decision.get('requires_roll', False))
+        entry = {
+            'input': player_input,
+            'scene_type': scene_type,
+            'requires_roll': requires_roll,
+            'ability': str(decision.get('ability', '')).lower()[:3] if requires_roll else None,
+            'dc': dice.parse_dc(decision.get('dc')) if requires_roll else None,
+            'timestamp': datetime.now().isoformat(),
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def read(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def describe_action(player_input: str) -> str:
+    """'I try to pick the lock.' -> 'pick the lock' (fits "You attempt to ...")"""
+    return _LEAD.sub("", player_input.strip(), count=1).rstrip('.!?') or player_input.strip()
+
+
+def featurize(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Sparse feature vector (indices, values), L2-normalised"""
+    analysis = analyze(text)
+    words = analysis.words
+    grams = words + [a + " " + b for a, b in zip(words, words[1:])]
+    mask = (1 << HASH_BITS) - 1
+    indices = [zlib.crc32(g.encode()) & mask for g in grams]
+    values = [1.0] * len(indices)
+
+    dense = 1 << HASH_BITS
+    matched = analysis.intents
+    for intent, _ in matched:
+        if intent in _INTENT_SLOTS:
+            indices.append(dense + _INTENT_SLOTS[intent])
+            values.append(1.0)
+    definitions = intent_definitions()
+    if any(definitions.get(i, {}).get('requires_roll') for i, _ in matched):
+        indices.append(dense + len(_INTENTS))
+        values.append(1.0)
+    indices += [dense + len(_INTENTS) + 1, dense + len(_INTENTS) + 3]
+    values += [(analysis.dc - 15) / 10.0, 1.0]
+    if _ATTEMPT.search(analysis.lower):
+        indices.append(dense + len(_INTENTS) + 2)
+        values.append(1.0)
+
+    idx = np.asarray(indices, dtype=np.int64)
+    val = np.asarray(values, dtype=np.float64)
+    return idx, val / np.sqrt(np.dot(val, val))
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _fit_softmax(rows: List[Tuple[np.ndarray, np.ndarray]], labels: np.ndarray, n_classes: int,
+                 epochs: int = 200, lr: float = 2.0, l2: float = 1e-4) -> np.ndarray:
+    """Full-batch gradient descent for softmax regression over sparse rows"""
+    n_features = (1 << HASH_BITS) + DENSE_FEATURES
+    weights = np.zeros((n_features, n_classes))
+    if not rows:
+        return weights
+    indices = np.concatenate([r[0] for r in rows])
+    values = np.concatenate([r[1] for r in rows])
+    lengths = np.array([len(r[0]) for r in rows])
+    row_of = np.repeat(np.arange(len(rows)), lengths)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    targets = np.eye(n_classes)[labels]
+
+    for _ in range(epochs):
+        logits = np.add.reduceat(values[:, None] * weights[indices], starts, axis=0)
+        error = (_softmax(logits) - targets) / len(rows)
+        grad = np.zeros_like(weights)
+        np.add.at(grad, indices, values[:, None] * error[row_of])
+        weights -= lr * (grad + l2 * weights)
+    return weights
+
+
+class RollClassifier:
+    """Softmax-regression heads for requires_roll, ability and DC"""
+
+    def __init__(self, roll_weights: np.ndarray, ability_weights: np.ndarray, dc_weights: np.ndarray,
+                 dc_classes: np.ndarray, threshold: float = 0.9):
+        self.roll_weights = roll_weights
+        self.ability_weights = ability_weights
+        self.dc_weights = dc_weights
+        self.dc_classes = dc_classes
+        self.threshold = threshold
+
+    @classmethod
+    def train(cls, records: Iterable[Dict], threshold: float = 0.9, epochs: int = 200) -> "RollClassifier":
+        records = [r for r in records if r.get('input')]
+        rows = [featurize(r['input']) for r in records]
+        roll_labels = np.array([int(bool(r['requires_roll'])) for r in records], dtype=np.int64)
+
+        rolled = [i for i, r in enumerate(records) if r['requires_roll'] and r.get('ability') in ABILITIES]
+        ability_labels = np.array([ABILITIES.index(records[i]['ability']) for i in rolled], dtype=np.int64)
+        dc_classes = np.array(sorted({int(records[i]['dc']) for i in rolled}) or [15])
+        dc_labels = np.array([int(np.searchsorted(dc_classes, int(records[i]['dc']))) for i in rolled],
+                             dtype=np.int64)
+
+        return cls(
+            _fit_softmax(rows, roll_labels, 2, epochs),
+            _fit_softmax([rows[i] for i in rolled], ability_labels, len(ABILITIES), epochs),
+            _fit_softmax([rows[i] for i in rolled], dc_labels, len(dc_classes), epochs),
+            dc_classes,
+            threshold,
+        )
+
+    def predict(self, text: str) -> Tuple[Dict, float]:
+        """Decision in the roll-check JSON shape, and the model's confidence in it"""
+        indices, values = featurize(text)
+        p_roll = _softmax(values @ self.roll_weights[indices])[1]
+        decision = {'requires_roll': bool(p_roll >= 0.5),
+                    'action_description': describe_action(text)}
+        confidence = max(p_roll, 1.0 - p_roll)
+        if decision['requires_roll']:
+            p_ability = _softmax(values @ self.ability_weights[indices])
+            p_dc = _softmax(values @ self.dc_weights[indices])
+            decision['ability'] = ABILITIES[int(p_ability.argmax())]
+            decision['dc'] = int(self.dc_classes[int(p_dc.argmax())])
+            # DC is a judgement call even for the LLM; only the ability gates confidence
+            confidence *= p_ability.max()
+        return decision, float(confidence)
+
+    def __call__(self, player_input: str) -> Optional[str]:
+        """ModelRouter local tier: the JSON answer, or None to defer to the LLM"""
+        decision, confidence = self.predict(player_input)
+        if confidence < self.threshold:
+            return None
+        return json.dumps(decision)
+
+    def save(self, path: str):
+        np.savez_compressed(path, roll=self.roll_weights, ability=self.ability_weights, dc=self.dc_weights,
+                            dc_classes=self.dc_classes, threshold=np.array(self.threshold))
+
+    @classmethod
+    def load(cls, path: str) -> "RollClassifier":
+        with np.load(path) as data:
+            return cls(data['roll'], data['ability'], data['dc'], data['dc_classes'], float(data['threshold']))
+
+
+def split_records(records: List[Dict], holdout: float = 0.2) -> Tuple[List[Dict], List[Dict]]:
+    """Deterministic train/held-out split by input text, so repeats never straddle the split"""
+    train, test = [], []
+    for r in records:
+        bucket = zlib.crc32(r['input'].lower().encode()) % 1000
+        (test if bucket < holdout * 1000 else train).append(r)
+    return train, test
+
+
+def evaluate(classifier: RollClassifier, records: List[Dict]) -> Dict:
+    """Agreement with the LLM on confidently answered inputs, and the share of LLM calls eliminated"""
+    answered = roll_agree = full_agree = 0
+    for r in records:
+        decision, confidence = classifier.predict(r['input'])
+        if confidence < classifier.threshold:
+            continue
+        answered += 1
+        if decision['requires_roll'] == bool(r['requires_roll']):
+            roll_agree += 1
+            if not decision['requires_roll'] or decision['ability'] == r.get('ability'):
+                full_agree += 1
+    n = len(records)
+    return {
+        'held_out': n,
+        'threshold': classifier.threshold,
+        'calls_eliminated': round(answered / n, 3) if n else 0.0,
+        'roll_agreement': round(roll_agree / answered, 3) if answered else 0.0,
+        'roll_and_ability_agreement': round(full_agree / answered, 3) if answered else 0.0,
+    }
+
+
+# Example usage
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    if len(sys.argv) > 1:
+        records = DecisionLog(sys.argv[1]).read()
+    else:
+        # Stand-in for a recorded log: inputs labelled the way the roll-check prompt asks the LLM to
+        rng = random.Random(5)
+        risky = [("climb", "the crumbling wall", "str"), ("leap", "across the chasm", "dex"),
+                 ("pick the lock on", "the iron chest", "dex"), ("sneak past", "the guards", "dex"),
+                 ("persuade", "the captain to let us through", "cha"), ("attack", "the goblin", "str"),
+                 ("recall what I know about", "the ancient runes", "int"), ("search", "the room for traps", "wis"),
+                 ("intimidate", "the bandit", "cha"), ("swim across", "the icy river", "str"),
+                 ("disarm", "the trap", "dex"), ("track", "the wolves", "wis")]
+        safe = [("walk to", "the tavern"), ("talk to", "the innkeeper"), ("look around", "the camp"),
+                ("sit down by", "the fire"), ("ask Lyra about", "her home"), ("eat", "some bread"),
+                ("go to", "the market"), ("greet", "the merchant"), ("wait for", "the others"),
+                ("open", "the unlocked door"), ("draw", "my map")]
+        records = []
+        for _ in range(3000):
+            prefix = rng.choice(["I ", "I try to ", "I carefully ", "Let me ", "I attempt to ", ""])
+            if rng.random() < 0.5:
+                verb, obj, ability = rng.choice(risky)
+                text = f"{prefix}{verb} {obj}"
+                dc, _ = DCAnalyzer.suggest_dc(text)
+                records.append({'input': text, 'requires_roll': True, 'ability': ability, 'dc': int(dc)})
+            else:
+                verb, obj = rng.choice(safe)
+                records.append({'input': f"{prefix}{verb} {obj}", 'requires_roll': False,
+                                'ability': None, 'dc': None})
+
+    train, test = split_records(records)
+    start = time.perf_counter()
+    classifier = RollClassifier.train(train)
+    print(f"trained on {len(train)} decisions in {time.perf_counter() - start:.2f}s")
+
+    for threshold in (0.8, 0.9, 0.95):
+        classifier.threshold = threshold
+        print(evaluate(classifier, test))
+
+    n = 20000
+    start = time.perf_counter()
+    for i in range(n):
+        classifier(test[i % len(test)]['input'])
+    print(f"inference: {(time.perf_counter() - start) / n * 1e6:.1f} us/decision")
@@ -1,11 +1,15 @@
 
 from dataclasses import dataclass, field
-from sqlalchemy import Enum
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, TYPE_CHECKING
 from enum import Enum
 
+from RuleTables import current as rule_tables
+
+if TYPE_CHECKING:
+    from BattleMap import BattleMap
+
 class SceneType(Enum):
     """Types of scenes for Sora generation"""
     EXPLORATION = "exploration"
@@ -27,6 +31,7 @@ class Scene:
     exits: List[str] = field(default_factory=list)
     danger_level: int = 0
     sora_prompt: Optional[str] = None
+    battle_map: Optional["BattleMap"] = None  # Tactical grid, for scenes fought on one
     
     def generate_sora_prompt(self) -> str:
         """Generate visual prompt for Sora"""
@@ -53,18 +58,10 @@ class SceneManager:
     @staticmethod
     def should_trigger_new_scene(dm_response: str, state: "CampaignState") -> bool:
         """Determine if response warrants new Sora scene"""
-        trigger_phrases = [
-            'you enter', 'you arrive', 'you see', 'appears before you',
-            'the scene changes', 'you find yourself', 'reveals',
-            'emerges', 'you discover', 'landscape', 'chamber', 'room'
-        ]
-        
-        response_lower = dm_response.lower()
-        
-        # Check for trigger phrases
-        for phrase in trigger_phrases:
-            if phrase in response_lower:
-                return True
+        # Check for trigger phrases (rules/scenes.json)
+        rules = rule_tables()
+        if rules.present(rules.scan(dm_response.lower()), 'scenes.triggers'):
+            return True
                 
         # Check if significant state change
         if state.turn_count % 5 == 0:  # Every 5 turns, consider new scene
@@ -72,6 +69,12 @@ class SceneManager:
             
         return False
     
+    @staticmethod
+    def revisit_scene(narrative: str, state: "CampaignState") -> Optional[Scene]:
+        """Stored scene for a known location the narrative moves to, reused instead of regenerated"""
+        location = state.scenes.mentioned_location(narrative, exclude=state.current_scene.location)
+        return state.scenes.find_location(location) if location else None
+
     @staticmethod
     def create_scene_from_narrative(narrative: str, location: str) -> Scene:
         """Create scene object from DM narrative"""
@@ -81,13 +84,10 @@ class SceneManager:
         scene_id = f"scene_{datetime.now().timestamp()}"
         
         # Determine scene type from narrative
-        scene_type = SceneType.EXPLORATION
-        if any(word in narrative.lower() for word in ['attack', 'combat', 'fight', 'battle']):
-            scene_type = SceneType.COMBAT
-        elif any(word in narrative.lower() for word in ['talk', 'speak', 'conversation', 'asks']):
-            scene_type = SceneType.DIALOGUE
-        elif any(word in narrative.lower() for word in ['discover', 'reveal', 'ancient', 'secret']):
-            scene_type = SceneType.REVELATION
+        # (first matching type in rules/scenes.json order: combat, dialogue, revelation)
+        rules = rule_tables()
+        matched = rules.present(rules.scan(narrative.lower()), 'scenes.types')
+        scene_type = SceneType(matched[0]) if matched else SceneType.EXPLORATION
             
         scene = Scene(
             id=scene_id,
@@ -0,0 +1,182 @@
+"""Per-campaign scene store: every Scene seen, indexed by id and location.
+
+Scenes used to be dropped after CampaignState.change_scene, leaving only their
+ids, so returning somewhere meant a fresh description and Sora prompt. The
+store keeps the Scene objects and a graph over them (authored Scene.exits plus
+transitions actually taken), so a revisit reuses the cached description,
+structured fields (NPCs, items, exits) and render prompt.
+
+Usage:
+    store = SceneStore()
+    store.add(scene)
+    store.record_transition("millbrook_square", "north_road")
+    store.at_location("Millbrook")          # scenes set there, latest last
+    store.mentioned_location(dm_response)   # known location named in narration
+"""
+
+import re
+from collections import deque
+from typing import Iterator, List, Optional
+
+from PersistentCollections import PMap
+from SceneManager import Scene
+
+# Placeholder locations that never identify a place worth returning to
+UNKNOWN_LOCATIONS = frozenset({"", "unknown"})
+
+
+def normalize_location(location: str) -> str:
+    return " ".join(location.lower().split())
+
+
+class SceneStore:
+    """Scenes by id, scene ids by location, and an adjacency graph between scenes"""
+
+    def __init__(self):
+        # Persistent maps so fork() is O(1); the tuple/dict values are replaced, never edited
+        self._scenes: PMap = PMap()            # scene id -> Scene
+        self._by_location: PMap = PMap()       # normalized location -> scene ids (tuple), oldest first
+        self._edges: PMap = PMap()             # scene id -> {neighbour id: transitions taken}
+        self._mention_pattern: Optional[re.Pattern] = None
+
+    def fork(self) -> "SceneStore":
+        """Independent copy in O(1); Scene objects themselves are shared"""
+        clone = SceneStore.__new__(SceneStore)
+        clone._scenes, clone._by_location, clone._edges = (
+            self._scenes.fork(), self._by_location.fork(), self._edges.fork())
+        clone._mention_pattern = self._mention_pattern
+        return clone
+
+    def __len__(self) -> int:
+        return len(self._scenes)
+
+    def __contains__(self, scene_id: str) -> bool:
+        return scene_id in self._scenes
+
+    def __iter__(self) -> Iterator[Scene]:
+        return iter(self._scenes.values())
+
+    def add(self, scene: Scene) -> Scene:
+        """Store (or replace) a scene and link it to its authored exits"""
+        previous = self._scenes.get(scene.id)
+        if previous is not None and normalize_location(previous.location) != normalize_location(scene.location):
+            old_key = normalize_location(previous.location)
+            self._by_location[old_key] = tuple(i for i in self._by_location[old_key] if i != scene.id)
+        self._scenes[scene.id] = scene
+
+        key = normalize_location(scene.location)
+        ids = self._by_location.get(key, ())
+        if scene.id not in ids:
+            self._by_location[key] = ids + (scene.id,)
+            self._mention_pattern = None
+
+        edges = self._edges.get(scene.id, {})
+        if any(exit_id not in edges for exit_id in scene.exits) or scene.id not in self._edges:
+            edges = dict(edges)
+            for exit_id in scene.exits:
+                edges.setdefault(exit_id, 0)
+            self._edges[scene.id] = edges
+        return scene
+
+    def get(self, scene_id: str) -> Optional[Scene]:
+        return self._scenes.get(scene_id)
+
+    def record_transition(self, from_id: str, to_id: str):
+        """Count a move between two scenes (both directions are walkable)"""
+        if from_id == to_id:
+            return
+        forward = dict(self._edges.get(from_id, {}))
+        forward[to_id] = forward.get(to_id, 0) + 1
+        self._edges[from_id] = forward
+        backward = self._edges.get(to_id, {})
+        if from_id not in backward:
+            self._edges[to_id] = {**backward, from_id: 0}
+
+    def neighbors(self, scene_id: str) -> List[str]:
+        """Scene ids reachable in one step, most travelled first"""
+        edges = self._edges.get(scene_id, {})
+        return sorted(edges, key=lambda other: -edges[other])
+
+    def transitions(self, from_id: str, to_id: str) -> int:
+        return self._edges.get(from_id, {}).get(to_id, 0)
+
+    def path(self, from_id: str, to_id: str) -> Optional[List[str]]:
+        """Fewest-steps route between two scenes (breadth-first), or None if unconnected"""
+        if from_id == to_id:
+            return [from_id]
+        parents = {from_id: None}
+        queue = deque([from_id])
+        while queue:
+            node = queue.popleft()
+            for other in self._edges.get(node, ()):
+                if other in parents:
+                    continue
+                parents[other] = node
+                if other == to_id:
+                    route = [other]
+                    while parents[route[-1]] is not None:
+                        route.append(parents[route[-1]])
+                    return route[::-1]
+                queue.append(other)
+        return None
+
+    def at_location(self, location: str) -> List[Scene]:
+        """Scenes set at a location (case/whitespace-insensitive), oldest first"""
+        return [self._scenes[i] for i in self._by_location.get(normalize_location(location), ())]
+
+    def find_location(self, location: str) -> Optional[Scene]:
+        """The latest scene at a location, if it has been visited"""
+        ids = self._by_location.get(normalize_location(location))
+        return self._scenes[ids[-1]] if ids else None
+
+    def locations(self) -> List[str]:
+        return [self._scenes[ids[-1]].location for ids in self._by_location.values() if ids]
+
+    def mentioned_location(self, text: str, exclude: Optional[str] = None) -> Optional[str]:
+        """Known location named in text (earliest mention, longest name on ties), other than exclude"""
+        if self._mention_pattern is None:
+            names = sorted((key for key, ids in self._by_location.items()
+                            if ids and key not in UNKNOWN_LOCATIONS), key=len, reverse=True)
+            if not names:
+                return None
+            self._mention_pattern = re.compile(
+                r"\b(" + "|".join(re.escape(name).replace(r"\ ", r"\s+") for name in names) + r")\b")
+        excluded = normalize_location(exclude) if exclude else None
+        for match in self._mention_pattern.finditer(text.lower()):
+            key = normalize_location(match.group(1))
+            if key != excluded:
+                return self._scenes[self._by_location[key][-1]].location
+        return None
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+
+    from SceneManager import SceneManager, SceneType
+
+    store = SceneStore()
+    square = store.add(Scene("square", "Millbrook Square", "A muddy market square.", SceneType.EXPLORATION,
+                             "Millbrook", exits=["lantern", "road"]))
+    square.generate_sora_prompt()
+    lantern = store.add(SceneManager.create_scene_from_narrative(
+        "You enter the Rusty Lantern; the barkeep asks what you'll have.", "The Rusty Lantern"))
+    store.record_transition("square", lantern.id)
+    store.record_transition(lantern.id, "square")
+
+    narration = "You leave the tavern and walk back out into Millbrook, where the rain has stopped."
+    location = store.mentioned_location(narration, exclude=lantern.location)
+    revisit = store.find_location(location)
+    print(f"mentioned: {location} -> reuse {revisit.id}: {revisit.sora_prompt[:60]}...")
+    print(f"neighbours of square: {store.neighbors('square')}; path: {store.path(lantern.id, 'road')}")
+
+    # Lookups stay flat as the campaign grows
+    for n in (100, 1000, 10000):
+        big = SceneStore()
+        for i in range(n):
+            big.add(Scene(f"s{i}", f"Place {i}", f"Place number {i}.", SceneType.EXPLORATION, f"Place {i}",
+                          exits=[f"s{(i + 1) % n}"]))
+        start = time.perf_counter()
+        for i in range(1000):
+            big.get(f"s{i % n}"), big.find_location(f"place {i % n}")
+        print(f"{n:>6} scenes: id + location lookup {(time.perf_counter() - start) / 1000 * 1e6:.2f} us")
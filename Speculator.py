@@ -0,0 +1,173 @@
+"""Speculative pre-generation of roll outcomes.
+
+While a mechanical check is pending, the player still has to type 'roll'. The
+speculator uses that gap to generate both the success and the failure narrative
+in the background, so the roll resolves from whichever branch matches instead of
+waiting on a fresh LLM call.
+
+Usage:
+    spec = RollSpeculator(generate=lambda msgs: llm(msgs), counter=TokenCounter())
+    spec.speculate(key, {True: success_messages, False: failure_messages})
+    ...
+    narrative = spec.resolve(key, success)   # None on a miss -> make the live call
+
+generate may return text or a response object; a response flagged `fallback`
+(the gateway's canned reply while the provider is failing) is never used.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from TokenCounter import TokenCounter
+
+
+@dataclass
+class SpeculationStats:
+    """Counters reported by RollSpeculator"""
+    launched: int = 0
+    hits: int = 0
+    misses: int = 0
+    skipped_budget: int = 0
+    skipped_busy: int = 0
+    discarded: int = 0
+    spent_tokens: int = 0
+    wasted_tokens: int = 0
+    hit_wait_seconds: float = 0.0
+
+    @property
+    def avg_hit_latency(self) -> float:
+        """Average time a roll waited on its speculative branch"""
+        return self.hit_wait_seconds / self.hits if self.hits else 0.0
+
+    @property
+    def waste_ratio(self) -> float:
+        """Fraction of speculative tokens that went to the unused branch"""
+        return self.wasted_tokens / self.spent_tokens if self.spent_tokens else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'launched': self.launched,
+            'hits': self.hits,
+            'misses': self.misses,
+            'skipped_budget': self.skipped_budget,
+            'skipped_busy': self.skipped_busy,
+            'discarded': self.discarded,
+            'spent_tokens': self.spent_tokens,
+            'wasted_tokens': self.wasted_tokens,
+            'avg_hit_latency': round(self.avg_hit_latency, 4),
+            'waste_ratio': round(self.waste_ratio, 3),
+        }
+
+
+@dataclass
+class _Speculation:
+    futures: Dict[bool, Future]
+    reserved_tokens: int
+
+
+class RollSpeculator:
+    """Runs both outcome branches of a pending check within a concurrency and token budget"""
+
+    def __init__(self, generate: Callable[[List], Any], counter: TokenCounter,
+                 max_workers: int = 2, token_budget: Optional[int] = None,
+                 expected_completion_tokens: int = 150, accepting: Optional[Callable[[], bool]] = None):
+        self.generate = generate
+        self.counter = counter
+        self.token_budget = token_budget
+        self.expected_completion_tokens = expected_completion_tokens
+        # Backpressure from the shared scheduler: don't start optional work while players wait
+        self.accepting = accepting
+        self.stats = SpeculationStats()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculator")
+        self._pending: Dict[Hashable, _Speculation] = {}
+        self._lock = threading.Lock()
+
+    def _run_branch(self, messages: List) -> Tuple[str, int]:
+        response = self.generate(messages)
+        if getattr(response, 'fallback', False):
+            raise RuntimeError("speculative branch got the gateway fallback")
+        text = getattr(response, 'content', response)
+        return text, self.counter.count_messages(messages) + self.counter.count(text)
+
+    def speculate(self, key: Hashable, branches: Dict[bool, List]) -> bool:
+        """Start generating each outcome branch. Returns False if the budget or load doesn't allow it."""
+        estimate = sum(self.counter.count_messages(m) + self.expected_completion_tokens
+                       for m in branches.values())
+        with self._lock:
+            if key in self._pending:
+                return True
+            if self.accepting is not None and not self.accepting():
+                self.stats.skipped_busy += 1
+                return False
+            if self.token_budget is not None and self.stats.spent_tokens + estimate > self.token_budget:
+                self.stats.skipped_budget += 1
+                return False
+            # Reserve the estimate now so concurrent sessions can't overshoot the budget
+            self.stats.spent_tokens += estimate
+            self.stats.launched += 1
+            self._pending[key] = _Speculation(
+                futures={outcome: self._executor.submit(self._run_branch, messages)
+                         for outcome, messages in branches.items()},
+                reserved_tokens=estimate,
+            )
+        return True
+
+    def _settle(self, spec: _Speculation, used: Optional[bool]):
+        """Swap the reserved estimate for actual usage; unused branches count as waste"""
+        with self._lock:
+            self.stats.spent_tokens -= spec.reserved_tokens
+
+        def account(future: Future, wasted: bool):
+            try:
+                _, tokens = future.result()
+            except Exception:
+                return
+            with self._lock:
+                self.stats.spent_tokens += tokens
+                if wasted:
+                    self.stats.wasted_tokens += tokens
+
+        for outcome, future in spec.futures.items():
+            if not future.cancel():
+                future.add_done_callback(lambda f, wasted=(outcome != used): account(f, wasted))
+
+    def resolve(self, key: Hashable, success: bool, timeout: Optional[float] = None) -> Optional[str]:
+        """Return the speculative narrative for this outcome, or None on a miss"""
+        with self._lock:
+            spec = self._pending.pop(key, None)
+        if spec is None or success not in spec.futures:
+            with self._lock:
+                self.stats.misses += 1
+            return None
+
+        start = time.perf_counter()
+        try:
+            text, _ = spec.futures[success].result(timeout=timeout)
+        except Exception:
+            text = None
+        waited = time.perf_counter() - start
+
+        # The losing branch settles when it finishes so the roll isn't held up
+        self._settle(spec, success if text is not None else None)
+        with self._lock:
+            if text is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+                self.stats.hit_wait_seconds += waited
+        return text
+
+    def discard(self, key: Hashable):
+        """Drop a speculation whose check was cancelled"""
+        with self._lock:
+            spec = self._pending.pop(key, None)
+            if spec is not None:
+                self.stats.discarded += 1
+        if spec is not None:
+            self._settle(spec, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,242 @@
+"""Token accounting and prompt budgeting for the Dungeon Master agent.
+
+This module prefers tiktoken. tiktoken tokenizes locally but downloads each BPE
+encoding on first use (then caches it, see TIKTOKEN_CACHE_DIR); if it is not
+installed or the encoding cannot be fetched, counting falls back to a regex-based
+estimate that tracks the OpenAI tokenizers closely enough for budgeting purposes.
+TokenCounter.exact says which one is in use.
+
+Usage:
+    from TokenCounter import TokenCounter, PromptSection, fit_sections
+    counter = TokenCounter("gpt-3.5-turbo")
+    counter.count("You enter the tavern.")
+    prompt, trimmed = fit_sections(sections, budget=1500, counter=counter)
+"""
+
+import math
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+# Words and single punctuation marks; roughly how BPE tokenizers split English.
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Chat formatting overhead per message and per request (OpenAI cookbook numbers).
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REQUEST = 3
+
+_ENCODERS: Dict[str, object] = {}
+
+
+def _load_encoder(model: str):
+    """Return a cached tiktoken encoder for the model, or None if unavailable."""
+    if model in _ENCODERS:
+        return _ENCODERS[model]
+    encoder = None
+    try:
+        import tiktoken
+        try:
+            encoder = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoder = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Not fatal; we'll fall back to the regex estimate
+        encoder = None
+    _ENCODERS[model] = encoder
+    return encoder
+
+
+class TokenCounter:
+    """Counts and truncates text in model tokens"""
+
+    def __init__(self, model: str = "gpt-3.5-turbo"):
+        self.model = model
+        self._encoder = _load_encoder(model)
+
+    @property
+    def exact(self) -> bool:
+        """True when counts come from the model's real tokenizer"""
+        return self._encoder is not None
+
+    @staticmethod
+    def _estimate_word(word: str) -> int:
+        return max(1, math.ceil(len(word) / 4))
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoder is not None:
+            return len(self._encoder.encode(text))
+        return sum(self._estimate_word(m.group()) for m in _WORD_PATTERN.finditer(text))
+
+    def count_messages(self, messages: Sequence) -> int:
+        """Count a chat request (list of SystemMessage/HumanMessage)"""
+        total = TOKENS_PER_REQUEST
+        for message in messages:
+            total += TOKENS_PER_MESSAGE + self.count(message.content)
+        return total
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens"""
+        if max_tokens <= 0:
+            return ""
+        if self._encoder is not None:
+            tokens = self._encoder.encode(text)
+            if len(tokens) <= max_tokens:
+                return text
+            return self._encoder.decode(tokens[:max_tokens])
+
+        used = 0
+        end = 0
+        for match in _WORD_PATTERN.finditer(text):
+            used += self._estimate_word(match.group())
+            if used > max_tokens:
+                break
+            end = match.end()
+        else:
+            return text
+        return text[:end]
+
+
+@dataclass
+class PromptSection:
+    """A named chunk of a prompt. Higher priority sections are trimmed last."""
+    name: str
+    text: str
+    priority: int = 50
+    required: bool = False
+
+
+def fit_sections(sections: List[PromptSection], budget: Optional[int],
+                 counter: TokenCounter, separator: str = "\n\n") -> Tuple[str, List[str]]:
+    """
+    Join prompt sections, dropping the lowest-priority ones until the prompt fits.
+
+    Optional sections are dropped whole. If only required sections remain and the
+    prompt is still over budget, the lowest-priority required section is truncated.
+
+    Returns:
+        Tuple of (prompt, names of trimmed sections)
+    """
+    kept = [s for s in sections if s.text]
+    costs = {id(s): counter.count(s.text) for s in kept}
+    sep_cost = counter.count(separator)
+
+    def total() -> int:
+        return sum(costs[id(s)] for s in kept) + sep_cost * max(len(kept) - 1, 0)
+
+    trimmed = []
+    if budget is not None:
+        for section in sorted(kept, key=lambda s: s.priority):
+            if total() <= budget:
+                break
+            if section.required:
+                continue
+            kept.remove(section)
+            trimmed.append(section.name)
+
+        overflow = total() - budget
+        if overflow > 0:
+            for section in sorted(kept, key=lambda s: s.priority):
+                allowed = max(costs[id(section)] - overflow, 0)
+                idx = kept.index(section)
+                kept[idx] = PromptSection(section.name, counter.truncate(section.text, allowed),
+                                          section.priority, section.required)
+                costs[id(kept[idx])] = counter.count(kept[idx].text)
+                trimmed.append(section.name)
+                overflow = total() - budget
+                if overflow <= 0:
+                    break
+
+    return separator.join(s.text for s in kept), trimmed
+
+
+@dataclass
+class TurnUsage:
+    """Token and latency counters for a single turn"""
+    turn: int
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    calls_by_type: Dict[str, int] = field(default_factory=dict)
+    seconds_by_type: Dict[str, float] = field(default_factory=dict)
+    trimmed_sections: List[str] = field(default_factory=list)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class SessionUsage:
+    """Per-session token and latency counters exposed by DungeonMasterAgent"""
+
+    def __init__(self, history: int = 1000):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_seconds = 0.0
+        self.turn_seconds = 0.0
+        self.turns: Deque[TurnUsage] = deque(maxlen=history)
+        self.current: Optional[TurnUsage] = None
+        # Speculative and background calls, which belong to no player turn
+        self.off_turn = TurnUsage(turn=-1)
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def last_turn(self) -> Optional[TurnUsage]:
+        return self.turns[-1] if self.turns else None
+
+    def start_turn(self, turn: int):
+        self.current = TurnUsage(turn=turn)
+
+    def end_turn(self, wall_seconds: float):
+        if self.current is None:
+            return
+        self.current.wall_seconds = wall_seconds
+        self.turn_seconds += wall_seconds
+        self.turns.append(self.current)
+        self.current = None
+
+    def record_trim(self, trimmed: List[str]):
+        if self.current is not None and trimmed:
+            self.current.trimmed_sections.extend(trimmed)
+
+    def record_call(self, call_type: str, prompt_tokens: int, completion_tokens: int, seconds: float,
+                    in_turn: bool = True):
+        """Count a call in the session totals and in the current turn (or off_turn if not in_turn)"""
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.llm_seconds += seconds
+            turn = self.current if in_turn else self.off_turn
+            if turn is not None:
+                turn.calls += 1
+                turn.prompt_tokens += prompt_tokens
+                turn.completion_tokens += completion_tokens
+                turn.llm_seconds += seconds
+                turn.calls_by_type[call_type] = turn.calls_by_type.get(call_type, 0) + 1
+                turn.seconds_by_type[call_type] = turn.seconds_by_type.get(call_type, 0.0) + seconds
+
+    def summary(self) -> Dict:
+        turns = len(self.turns)
+        return {
+            'calls': self.calls,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.total_tokens,
+            'llm_seconds': round(self.llm_seconds, 4),
+            'turn_seconds': round(self.turn_seconds, 4),
+            'avg_tokens_per_turn': round(sum(t.total_tokens for t in self.turns) / turns, 1) if turns else 0.0,
+            'avg_seconds_per_turn': round(sum(t.wall_seconds for t in self.turns) / turns, 4) if turns else 0.0,
+            'off_turn_calls': self.off_turn.calls,
+            'off_turn_tokens': self.off_turn.total_tokens,
+        }
@@ -1,7 +1,9 @@
-
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 from enum import Enum
 
+from RuleTables import current as rule_tables
+
 
 class ToneType(Enum):
     """Player communication tone"""
@@ -10,52 +12,170 @@ class ToneType(Enum):
     HUMOROUS = "humorous"
     DRAMATIC = "dramatic"
     NEUTRAL = "neutral"
-    
+
 class ToneAnalyzer:
     """Analyzes player input to determine communication tone"""
-    
-    TONE_KEYWORDS = {
-        ToneType.SERIOUS: [
-            'oath', 'honor', 'duty', 'swear', 'justice', 'investigate',
-            'carefully', 'vigilant', 'pledge', 'vow', 'sacred'
-        ],
-        ToneType.HUMOROUS: [
-            'lol', 'haha', 'lmao', 'joke', 'funny', 'ridiculous',
-            'absurd', 'ironic', 'sarcastic', 'meme'
-        ],
-        ToneType.CASUAL: [
-            'yo', 'hey', 'sup', 'cool', 'chill', 'yeah', 'gonna',
-            'wanna', 'kinda', 'sorta', 'nah'
-        ],
-        ToneType.DRAMATIC: [
-            'fate', 'destiny', 'doom', 'glory', 'epic', 'legendary',
-            'heroic', 'sacrifice', 'prophecy', 'ancient'
-        ]
-    }
-    
+
+    # rules/tone.json, as loaded at import (score() always reads the current rules)
+    TONE_KEYWORDS = {ToneType(tone): keywords for tone, keywords in rule_tables().tones.items()}
+
     @staticmethod
-    def analyze(text: str, history: List[str] = None) -> ToneType:
-        """Analyze text to determine tone"""
-        text_lower = text.lower()
-        
-        # Count keyword matches
-        scores = {tone: 0 for tone in ToneType}
-        
-        for tone, keywords in ToneAnalyzer.TONE_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    scores[tone] += 1
-        
+    def score(text: str) -> Dict[ToneType, int]:
+        """Keyword and structure evidence for each tone in a single message"""
+        # Count keyword matches (one typo-tolerant automaton pass, shared with intent/DC lookups)
+        rules = rule_tables()
+        counts = rules.counts(rules.scan_for(text.lower(), 'tone'), 'tone')
+        scores = {tone: counts.get(tone.value, 0) for tone in ToneType}
+
         # Check formality through sentence structure
         if '.' in text and len(text.split('.')) > 2:
             scores[ToneType.SERIOUS] += 1
-            
+
         if '!' in text or '?' in text:
             scores[ToneType.DRAMATIC] += 1
-            
+
+        return scores
+
+    @staticmethod
+    def analyze(text: str, history: List[str] = None) -> ToneType:
+        """Analyze text to determine tone (replaying history through a ToneTracker if given)"""
+        if history:
+            tracker = ToneTracker()
+            tone_state = ToneState()
+            for line in history:
+                tracker.update(tone_state, line)
+            return tracker.update(tone_state, text)
+
+        scores = ToneAnalyzer.score(text)
+
         # Return highest scoring tone, default to neutral
         max_score = max(scores.values())
         if max_score == 0:
             return ToneType.NEUTRAL
-            
-        return max(scores, key=scores.get)
\ No newline at end of file
+
+        return max(scores, key=scores.get)
+
+
+@dataclass
+class ToneState:
+    """Running tone evidence for a campaign (kept in CampaignState)"""
+    scores: Dict[str, float] = field(default_factory=lambda: {tone.value: 0.0 for tone in ToneType})
+    current: ToneType = ToneType.NEUTRAL
+    challenger: Optional[ToneType] = None
+    streak: int = 0
+    messages: int = 0
+
+
+class ToneTracker:
+    """
+    Incremental tone model: exponentially decayed per-tone scores with hysteresis.
+
+    Each message costs O(number of tones). The reported tone only changes when a
+    challenger leads the current tone by `margin` for `confirm` messages in a row.
+    """
+
+    def __init__(self, decay: float = 0.75, margin: float = 0.75, confirm: int = 2,
+                 min_evidence: float = 1.0):
+        self.decay = decay
+        self.margin = margin
+        self.confirm = confirm
+        self.min_evidence = min_evidence
+
+    def leader(self, tone_state: ToneState) -> ToneType:
+        """Tone with the most decayed evidence, or neutral if nothing is strong enough"""
+        best, best_score = ToneType.NEUTRAL, self.min_evidence
+        for tone in ToneType:
+            if tone is ToneType.NEUTRAL:
+                continue
+            value = tone_state.scores[tone.value]
+            if value >= best_score and (best is ToneType.NEUTRAL or value > best_score):
+                best, best_score = tone, value
+        return best
+
+    def update(self, tone_state: ToneState, text: str, scores: Optional[Dict[ToneType, int]] = None) -> ToneType:
+        """Fold one message into the running state and return the (stable) tone"""
+        scores = scores if scores is not None else ToneAnalyzer.score(text)
+        for tone, value in scores.items():
+            tone_state.scores[tone.value] = tone_state.scores[tone.value] * self.decay + value
+        tone_state.messages += 1
+
+        candidate = self.leader(tone_state)
+        current = tone_state.current
+        if candidate is current:
+            tone_state.challenger, tone_state.streak = None, 0
+            return current
+
+        current_score = 0.0 if current is ToneType.NEUTRAL else tone_state.scores[current.value]
+        candidate_score = self.min_evidence if candidate is ToneType.NEUTRAL else tone_state.scores[candidate.value]
+        if candidate is not ToneType.NEUTRAL and candidate_score < current_score + self.margin:
+            tone_state.challenger, tone_state.streak = None, 0
+            return current
+
+        tone_state.streak = tone_state.streak + 1 if tone_state.challenger is candidate else 1
+        tone_state.challenger = candidate
+        if tone_state.streak >= self.confirm:
+            tone_state.current, tone_state.challenger, tone_state.streak = candidate, None, 0
+        return tone_state.current
+
+
+def replay_session(inputs: List[str], tracker: Optional[ToneTracker] = None) -> Dict[str, int]:
+    """Replay recorded player inputs and count tone flips, stateless vs tracked"""
+    tracker = tracker or ToneTracker()
+    tone_state = ToneState()
+    stateless_flips = tracked_flips = 0
+    last_stateless = last_tracked = ToneType.NEUTRAL
+    for text in inputs:
+        stateless = ToneAnalyzer.analyze(text)
+        tracked = tracker.update(tone_state, text)
+        stateless_flips += stateless is not last_stateless
+        tracked_flips += tracked is not last_tracked
+        last_stateless, last_tracked = stateless, tracked
+    return {'messages': len(inputs), 'stateless_flips': stateless_flips,
+            'tracked_flips': tracked_flips, 'final_tone': last_tracked.value}
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Recorded session: a casual player with the odd dramatic or joking line
+    recorded = [
+        "hey, I wanna check out the tavern",
+        "yeah I ask the barkeep about the caravans",
+        "What?! The caravans vanished?",
+        "cool, I'm gonna head north then",
+        "lol I trip over the goblin",
+        "nah, I kinda just keep walking",
+        "I search the wagon.",
+        "yo what's in the chest?",
+        "sure, I grab the coins",
+        "hey Lyra, you coming?",
+    ]
+    sessions = [recorded]
+
+    # Optional: replay recorded campaigns from TranscriptStore paths
+    if len(sys.argv) > 1:
+        from TranscriptStore import TranscriptStore
+        sessions = []
+        for path in sys.argv[1:]:
+            store = TranscriptStore(path)
+            sessions.append([r['input'] for r in store.scan() if r.get('input')])
+            store.close()
+
+    for inputs in sessions:
+        result = replay_session(inputs)
+        print(f"Replay: {result}")
+        assert result['tracked_flips'] <= result['stateless_flips'], "tracker should never flip more"
+
+    result = replay_session(recorded)
+    assert result['final_tone'] == ToneType.CASUAL.value, result
+
+    tracker = ToneTracker()
+    tone_state = ToneState()
+    n = 20000
+    start = time.perf_counter()
+    for i in range(n):
+        tracker.update(tone_state, recorded[i % len(recorded)])
+    elapsed = time.perf_counter() - start
+    print(f"ToneTracker.update: {elapsed / n * 1e6:.1f} us/message")
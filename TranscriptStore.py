@@ -0,0 +1,205 @@
+"""Append-only campaign transcript store.
+
+Every turn (player input, DM response, roll and scene) is appended as one JSON
+record. Records are buffered into blocks that are zlib-compressed and appended to
+a data file; a fixed-width index file maps each turn to its block and slot:
+
+    <path>.log  | block | block | ...            (compressed JSON lines)
+    <path>.idx  | offset u64, length u32, slot u32 | ... (one entry per turn)
+
+Both files are read through mmap, so random access to one turn or a range scan
+only decompresses the blocks it touches, never the whole campaign.
+
+Usage:
+    store = TranscriptStore("transcripts/campaign_123")
+    store.append({'input': 'I open the door', 'response': '...'})
+    store.get(0)
+    for record in store.scan(10, 20): ...
+    export_markdown(store, open("campaign.md", "w"))
+"""
+
+import html
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, TextIO
+
+_INDEX_ENTRY = struct.Struct("<QII")  # block offset, compressed length, slot within block
+
+
+class TranscriptStore:
+    """Compressed, indexed, append-only log of turns for one campaign"""
+
+    def __init__(self, path: str, block_turns: int = 32, cached_blocks: int = 4):
+        self.path = path
+        self.block_turns = block_turns
+        self.cached_blocks = cached_blocks
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._data = open(path + ".log", "a+b")
+        self._index = open(path + ".idx", "a+b")
+        self._pending: List[bytes] = []
+        self._data_map: Optional[mmap.mmap] = None
+        self._index_map: Optional[mmap.mmap] = None
+        self._blocks: "OrderedDict[int, List[bytes]]" = OrderedDict()
+
+    # ------------------------------------------------------------------ writing
+
+    def append(self, record: Dict) -> int:
+        """Append a turn record; returns its position in the transcript"""
+        position = len(self)
+        self._pending.append(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        if len(self._pending) >= self.block_turns:
+            self.flush()
+        return position
+
+    def flush(self):
+        """Compress buffered turns into a block and index them"""
+        if not self._pending:
+            return
+        block = zlib.compress(b"\n".join(self._pending), 6)
+        offset = self._data.tell()
+        self._data.write(block)
+        self._data.flush()
+        self._index.write(b"".join(_INDEX_ENTRY.pack(offset, len(block), slot)
+                                   for slot in range(len(self._pending))))
+        self._index.flush()
+        self._pending = []
+
+    def close(self):
+        """Flush the partial block and release the files (safe to call twice)"""
+        if self._data.closed:
+            return
+        self.flush()
+        for m in (self._data_map, self._index_map):
+            if m is not None:
+                m.close()
+        self._data_map = self._index_map = None
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------ reading
+
+    @property
+    def _stored(self) -> int:
+        return self._index.tell() // _INDEX_ENTRY.size
+
+    def __len__(self) -> int:
+        return self._stored + len(self._pending)
+
+    @staticmethod
+    def _remap(current: Optional[mmap.mmap], f, size: int) -> Optional[mmap.mmap]:
+        """(Re)map a file once it has grown past the current mapping"""
+        if current is not None and current.size() >= size:
+            return current
+        if current is not None:
+            current.close()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def _entry(self, position: int):
+        self._index_map = self._remap(self._index_map, self._index, self._index.tell())
+        return _INDEX_ENTRY.unpack_from(self._index_map, position * _INDEX_ENTRY.size)
+
+    def _block(self, offset: int, length: int) -> List[bytes]:
+        lines = self._blocks.get(offset)
+        if lines is not None:
+            self._blocks.move_to_end(offset)
+            return lines
+        self._data_map = self._remap(self._data_map, self._data, offset + length)
+        lines = zlib.decompress(self._data_map[offset:offset + length]).split(b"\n")
+        self._blocks[offset] = lines
+        if len(self._blocks) > self.cached_blocks:
+            self._blocks.popitem(last=False)
+        return lines
+
+    def get(self, position: int) -> Dict:
+        """Random access to one turn"""
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        stored = self._stored
+        if position >= stored:
+            return json.loads(self._pending[position - stored])
+        offset, length, slot = self._entry(position)
+        return json.loads(self._block(offset, length)[slot])
+
+    __getitem__ = get
+
+    def scan(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+        """Iterate turns [start, stop) decompressing each block once"""
+        total = len(self)
+        stop = total if stop is None else min(stop, total)
+        stored = self._stored
+        for position in range(max(start, 0), min(stop, stored)):
+            offset, length, slot = self._entry(position)
+            yield json.loads(self._block(offset, length)[slot])
+        for position in range(max(start, stored), stop):
+            yield json.loads(self._pending[position - stored])
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.scan()
+
+
+# ============================================================================
+# STREAMING EXPORTERS: one turn at a time, constant memory
+# ============================================================================
+
+def _roll_line(roll: Optional[Dict]) -> Optional[str]:
+    if not roll:
+        return None
+    outcome = "success" if roll.get('success') else "failure"
+    return (f"{roll.get('ability', '').upper()} check: rolled {roll.get('roll')} "
+            f"{roll.get('modifier', 0):+d} vs DC {roll.get('dc')} ({outcome})")
+
+
+def export_markdown(store: TranscriptStore, out: TextIO, title: Optional[str] = None):
+    """Write the campaign as Markdown, turn by turn"""
+    out.write(f"# {title or 'Campaign Transcript'}\n\n")
+    last_scene = None
+    for record in store.scan():
+        scene = record.get('scene') or {}
+        if scene.get('id') != last_scene:
+            out.write(f"## {scene.get('title', 'Unknown')} — {scene.get('location', '')}\n\n")
+            last_scene = scene.get('id')
+        if record.get('input'):
+            out.write(f"**Turn {record.get('turn', '')} — You:** {record['input']}\n\n")
+        roll = _roll_line(record.get('roll'))
+        if roll:
+            out.write(f"> 🎲 {roll}\n\n")
+        out.write(f"{record.get('response', '')}\n\n")
+
+
+def export_html(store: TranscriptStore, out: TextIO, title: Optional[str] = None):
+    """Write the campaign as a standalone HTML page, turn by turn"""
+    heading = html.escape(title or "Campaign Transcript")
+    out.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{heading}</title></head>\n"
+              f"<body>\n<h1>{heading}</h1>\n")
+    last_scene = None
+    for record in store.scan():
+        scene = record.get('scene') or {}
+        if scene.get('id') != last_scene:
+            out.write(f"<h2>{html.escape(scene.get('title', 'Unknown'))}</h2>\n")
+            last_scene = scene.get('id')
+        out.write("<section class=\"turn\">\n")
+        if record.get('input'):
+            out.write(f"<p class=\"player\"><strong>You:</strong> {html.escape(record['input'])}</p>\n")
+        roll = _roll_line(record.get('roll'))
+        if roll:
+            out.write(f"<p class=\"roll\">{html.escape(roll)}</p>\n")
+        for paragraph in record.get('response', '').split("\n\n"):
+            if paragraph.strip():
+                out.write(f"<p class=\"dm\">{html.escape(paragraph)}</p>\n")
+        out.write("</section>\n")
+    out.write("</body></html>\n")
@@ -0,0 +1,344 @@
+"""Columnar, append-only analytics over every turn played.
+
+Each turn becomes one row across typed NumPy columns: categorical columns
+(campaign, intent, ability, tone) are dictionary-encoded to integer codes,
+numeric ones are fixed-width. A missing value is a sentinel outside every
+column's domain: the dtype's minimum for integers (modifiers are legitimately
+negative), NaN for floats, and code -1 for categories.
+Queries are vectorized over whole columns (np.bincount, boolean masks), so
+aggregating millions of turns never builds a Python object per row.
+
+On disk the store is a directory of immutable segments, one .npy file per
+column, plus vocab.json for the category codes. flush() writes the rows added
+since the last flush as a new segment; opening a store reads the segments
+back column by column.
+
+Usage:
+    analytics = TurnAnalytics("analytics/")
+    analytics.append({'campaign': 'c1', 'intent': 'persuade', 'dc': 15, 'roll': 12, 'success': 0, ...})
+    analytics.success_rate(by='intent')          # {'persuade': (checks, rate), ...}
+    analytics.distribution('suggested_dc')       # {10: n, 15: n, ...}
+    analytics.flush()
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+CATEGORY = "category"
+
+# column -> dtype (CATEGORY: int32 codes into the store's vocabulary for that column)
+COLUMNS = {
+    'campaign': CATEGORY,
+    'turn': np.int32,
+    'timestamp': np.float64,
+    'intent': CATEGORY,
+    'ability': CATEGORY,
+    'suggested_dc': np.int16,      # local DCAnalyzer suggestion for the input
+    'dc': np.int16,                # DC of the check requested or resolved this turn
+    'check_requested': np.int8,    # this turn's input set up a pending check
+    'roll': np.int16,
+    'modifier': np.int16,
+    'success': np.int8,
+    'critical': np.int8,
+    'tone': CATEGORY,
+    'new_scene': np.int8,
+    'wall_seconds': np.float32,
+    'llm_seconds': np.float32,
+    'roll_check_seconds': np.float32,
+    'narration_seconds': np.float32,
+    'consequence_seconds': np.float32,
+    'llm_calls': np.int16,
+    'prompt_tokens': np.int32,
+    'completion_tokens': np.int32,
+}
+
+_SEGMENT_PREFIX = "segment-"
+
+
+def _storage_dtype(dtype) -> np.dtype:
+    return np.dtype(np.int32) if dtype == CATEGORY else np.dtype(dtype)
+
+
+def _missing(dtype: np.dtype):
+    return np.nan if dtype.kind == 'f' else np.iinfo(dtype).min
+
+
+def _present(values: np.ndarray) -> np.ndarray:
+    """Mask of recorded (non-missing) values in a numeric column"""
+    return ~np.isnan(values) if values.dtype.kind == 'f' else values != _missing(values.dtype)
+
+
+class _Column:
+    """Growable typed array (capacity doubles, like a list)"""
+
+    def __init__(self, dtype: np.dtype, missing, capacity: int = 1024):
+        self.dtype = dtype
+        self.missing = missing
+        self.data = np.full(capacity, missing, dtype=dtype)
+        self.size = 0
+
+    def reserve(self, n: int):
+        if self.size + n > len(self.data):
+            grown = np.full(max(2 * len(self.data), self.size + n), self.missing, dtype=self.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+
+    def extend(self, values: np.ndarray):
+        self.reserve(len(values))
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class TurnAnalytics:
+    """Append-only columnar turn store with vectorized group-by queries"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self.columns = {name: _Column(_storage_dtype(dtype), -1 if dtype == CATEGORY else _missing(np.dtype(dtype)))
+                        for name, dtype in COLUMNS.items()}
+        self.vocab: Dict[str, List[str]] = {name: [] for name, dtype in COLUMNS.items() if dtype == CATEGORY}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in self.vocab}
+        self._flushed = 0
+        self._segments = 0
+        if directory is not None and os.path.isdir(directory):
+            self._load()
+
+    def __len__(self) -> int:
+        return self.columns['turn'].size
+
+    # ========================================================================
+    # WRITING
+    # ========================================================================
+
+    def code(self, column: str, label: Optional[str]) -> int:
+        """Integer code for a category label (assigned on first sight); -1 for None"""
+        if label is None:
+            return -1
+        codes = self._codes[column]
+        code = codes.get(label)
+        if code is None:
+            code = codes[label] = len(self.vocab[column])
+            self.vocab[column].append(str(label))
+        return code
+
+    def encode(self, column: str, labels: Iterable) -> np.ndarray:
+        """Category codes for many labels at once (None -> -1)"""
+        labels = np.asarray(labels, dtype=object)
+        codes = np.full(len(labels), -1, dtype=np.int32)
+        present = labels != None  # noqa: E711 (elementwise)
+        if present.any():
+            unique, inverse = np.unique(labels[present].astype(str), return_inverse=True)
+            lookup = np.array([self.code(column, label) for label in unique], dtype=np.int32)
+            codes[present] = lookup[inverse]
+        return codes
+
+    def append(self, row: Dict):
+        """Add one turn; absent columns are recorded as missing"""
+        self.extend({name: [value] for name, value in row.items()}, 1)
+
+    def extend(self, rows: Dict[str, Iterable], n: Optional[int] = None):
+        """Bulk append: column name -> n values (labels for category columns, numbers otherwise)"""
+        if n is None:
+            n = len(next(iter(rows.values())))
+        for name, column in self.columns.items():
+            values = rows.get(name)
+            if values is None:
+                values = np.full(n, column.missing, dtype=column.dtype)
+            elif COLUMNS[name] == CATEGORY:
+                values = self.encode(name, values)
+            else:
+                values = np.asarray([column.missing if v is None else v for v in values]
+                                    if not isinstance(values, np.ndarray) else values, dtype=column.dtype)
+            column.extend(values)
+
+    def flush(self) -> Optional[str]:
+        """Write rows added since the last flush as a new immutable segment"""
+        if self.directory is None or len(self) == self._flushed:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        # Vocabulary first (codes are only ever appended), so a segment never holds unknown codes
+        vocab_path = os.path.join(self.directory, "vocab.json")
+        with open(vocab_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f)
+        os.replace(vocab_path + ".tmp", vocab_path)
+
+        path = os.path.join(self.directory, f"{_SEGMENT_PREFIX}{self._segments:06d}")
+        tmp_path = path + ".tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name, column in self.columns.items():
+            np.save(os.path.join(tmp_path, name + ".npy"), column.view()[self._flushed:])
+        os.replace(tmp_path, path)
+
+        self._flushed = len(self)
+        self._segments += 1
+        return path
+
+    def _load(self):
+        vocab_path = os.path.join(self.directory, "vocab.json")
+        if os.path.exists(vocab_path):
+            with open(vocab_path, encoding="utf-8") as f:
+                for name, labels in json.load(f).items():
+                    if name in self.vocab:
+                        self.vocab[name] = labels
+                        self._codes[name] = {label: i for i, label in enumerate(labels)}
+        segments = sorted(entry for entry in os.listdir(self.directory)
+                          if entry.startswith(_SEGMENT_PREFIX) and not entry.endswith(".tmp"))
+        for segment in segments:
+            parts = {name: np.load(os.path.join(self.directory, segment, name + ".npy"), mmap_mode='r')
+                     for name in self.columns
+                     if os.path.exists(os.path.join(self.directory, segment, name + ".npy"))}
+            n = len(next(iter(parts.values()))) if parts else 0
+            for name, column in self.columns.items():
+                column.extend(parts[name] if name in parts
+                              else np.full(n, column.missing, dtype=column.dtype))
+        self._segments = len(segments)
+        self._flushed = len(self)
+
+    # ========================================================================
+    # QUERIES
+    # ========================================================================
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name].view()
+
+    def where(self, **equals) -> np.ndarray:
+        """Boolean row mask: column == value for each keyword (labels for category columns)"""
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in equals.items():
+            if COLUMNS[name] == CATEGORY:
+                value = self._codes[name].get(value, -2)
+            mask &= self.column(name) == value
+        return mask
+
+    def group(self, by: str, values: Optional[np.ndarray] = None,
+              mask: Optional[np.ndarray] = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(labels, row counts, value sums) per category of `by`, over masked rows"""
+        codes = self.column(by)
+        keep = codes >= 0 if mask is None else (codes >= 0) & mask
+        if values is not None:
+            keep &= _present(values)
+        size = len(self.vocab[by])
+        counts = np.bincount(codes[keep], minlength=size)
+        sums = (np.bincount(codes[keep], weights=values[keep], minlength=size)
+                if values is not None else counts.astype(np.float64))
+        return self.vocab[by], counts, sums
+
+    def rate(self, flag: str, by: str = 'intent', mask: Optional[np.ndarray] = None) -> Dict[str, Tuple[int, float]]:
+        """label -> (rows where the 0/1 column `flag` is recorded, fraction where it is set)"""
+        labels, counts, sums = self.group(by, self.column(flag), mask)
+        return {labels[i]: (int(counts[i]), float(sums[i] / counts[i])) for i in np.flatnonzero(counts)}
+
+    def success_rate(self, by: str = 'intent', mask: Optional[np.ndarray] = None) -> Dict[str, Tuple[int, float]]:
+        """label -> (resolved checks, fraction that succeeded)"""
+        return self.rate('success', by, mask)
+
+    def mean(self, column: str, by: str, mask: Optional[np.ndarray] = None) -> Dict[str, float]:
+        labels, counts, sums = self.group(by, self.column(column), mask)
+        return {labels[i]: float(sums[i] / counts[i]) for i in np.flatnonzero(counts)}
+
+    def distribution(self, column: str, mask: Optional[np.ndarray] = None) -> Dict:
+        """value (or label) -> row count, over non-missing rows"""
+        values = self.column(column)
+        if mask is not None:
+            values = values[mask]
+        if COLUMNS[column] == CATEGORY:
+            counts = np.bincount(values[values >= 0], minlength=len(self.vocab[column]))
+            return {self.vocab[column][i]: int(counts[i]) for i in np.flatnonzero(counts)}
+        values = values[_present(values)]
+        unique, counts = np.unique(values, return_counts=True)
+        return {unique[i].item(): int(counts[i]) for i in range(len(unique))}
+
+    def percentiles(self, column: str, qs=(50, 95, 99), mask: Optional[np.ndarray] = None) -> Dict[int, float]:
+        values = self.column(column)
+        if mask is not None:
+            values = values[mask]
+        values = values[_present(values)].astype(np.float64)
+        if not len(values):
+            return {}
+        return {q: float(v) for q, v in zip(qs, np.percentile(values, qs))}
+
+
+# Example usage / benchmark
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    import time
+
+    # Synthetic history: a few million turns, generated column-wise
+    n = 2_000_000
+    rng = np.random.default_rng(11)
+    intents = np.array(['attack', 'persuade', 'sneak', 'search', 'move', 'talk', 'investigate', 'climb'])
+    abilities = np.array(['str', 'cha', 'dex', 'wis', 'dex', 'cha', 'int', 'str'])
+    rolls_for = np.array([1, 1, 1, 0, 0, 0, 1, 1], dtype=bool)
+    which = rng.integers(0, len(intents), n)
+    checked = rolls_for[which] & (rng.random(n) < 0.6)
+    def absent(column: str):
+        return _missing(np.dtype(COLUMNS[column]))
+
+    dc = np.where(checked, rng.choice([10, 12, 15, 18, 20], n), absent('dc'))
+    roll = np.where(checked, rng.integers(1, 21, n), absent('roll'))
+    modifier = np.where(checked, rng.integers(-2, 5, n), absent('modifier'))
+    success = np.where(checked, (roll + modifier >= dc).astype(np.int8), absent('success'))
+
+    analytics = TurnAnalytics()
+    start = time.perf_counter()
+    analytics.extend({
+        'campaign': [f"c{i}" for i in rng.integers(0, 500, n)],
+        'turn': np.arange(n) % 400,
+        'intent': intents[which],
+        'ability': np.where(checked, abilities[which], None),
+        'suggested_dc': rng.choice([10, 15, 20], n),
+        'dc': dc, 'roll': roll, 'modifier': modifier, 'success': success,
+        'check_requested': checked.astype(np.int8),
+        'tone': rng.choice(['neutral', 'casual', 'serious'], n),
+        'wall_seconds': rng.gamma(2.0, 1.5, n).astype(np.float32),
+    }, n)
+    print(f"ingested {n:,} turns in {time.perf_counter() - start:.2f}s")
+
+    queries = {
+        "persuasion success rate": lambda: analytics.success_rate(by='intent')['persuade'],
+        "suggested DC distribution": lambda: analytics.distribution('suggested_dc'),
+        "which intents trigger rolls": lambda: analytics.rate('check_requested', by='intent'),
+        "p95 turn latency (dex checks)": lambda: analytics.percentiles('wall_seconds', (95,),
+                                                                       analytics.where(ability='dex')),
+    }
+    for label, query in queries.items():
+        start = time.perf_counter()
+        result = query()
+        elapsed = (time.perf_counter() - start) * 1000
+        shown = result if not isinstance(result, dict) or len(result) < 5 else dict(list(result.items())[:3])
+        print(f"{label:<30} {elapsed:7.1f} ms  {shown}")
+
+    # The same question answered row by row, as with per-turn dicts
+    rows = [{'intent': intents[which[i]], 'success': int(success[i])} for i in range(200_000)]
+    start = time.perf_counter()
+    tried = [r for r in rows if r['intent'] == 'persuade' and r['success'] != absent('success')]
+    sum(r['success'] for r in tried) / len(tried)
+    print(f"row dicts (200k rows only): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Segments round-trip through disk
+    directory = tempfile.mkdtemp()
+    try:
+        store = TurnAnalytics(directory)
+        store.extend({name: analytics.column(name)[:100_000] for name in ('turn', 'dc', 'roll', 'success')}, 100_000)
+        store.append({'campaign': 'c1', 'intent': 'persuade', 'dc': 15, 'roll': 17, 'modifier': 2, 'success': 1})
+        store.flush()
+        reopened = TurnAnalytics(directory)
+        assert len(reopened) == len(store) and reopened.success_rate()['persuade'] == (1, 1.0)
+        print(f"flushed and reopened {len(reopened):,} rows")
+
+        # Negative modifiers (stat 8 or 6) are values, not missing ones
+        signed = TurnAnalytics()
+        for modifier in (-1, -2, 3):
+            signed.append({'ability': 'dex', 'modifier': modifier})
+        signed.append({'ability': 'dex'})
+        assert signed.mean('modifier', by='ability') == {'dex': 0.0}
+        assert signed.distribution('modifier') == {-2: 1, -1: 1, 3: 1}
+    finally:
+        shutil.rmtree(directory)
@@ -1,4 +1,5 @@
 import random
+import re
 from typing import Tuple
 
 
@@ -40,3 +41,23 @@ def resolve_check(ability_score: int, dc: int, roll_override: int = None) -> Tup
         success = False
 
     return roll, mod, success, critical
+
+
+def parse_dc(value, default: int = 10) -> int:
+    """DC from a model's answer: 15, "15", "DC 15" or "15 (moderate)"; default if there is no number"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    match = re.search(r"\d+", str(value)) if value is not None else None
+    return int(match.group()) if match else default
+
+
+def roll(notation: str) -> int:
+    """Roll dice notation like '2d6+3', 'd8' or '4' and return the total."""
+    total = 0
+    for sign, count, sides, flat in re.findall(r"([+-]?)\s*(?:(\d*)d(\d+)|(\d+))", notation.replace(" ", "")):
+        if sides:
+            value = sum(random.randint(1, int(sides)) for _ in range(int(count or 1)))
+        else:
+            value = int(flat)
+        total += -value if sign == '-' else value
+    return total